@@ -48,6 +48,16 @@ class ArtifactFormat(Enum):  # TODO: ArtifactType, ArtifactKind?
     ARCHIVE = 13
 
 
+TEXT_FMTS = [ArtifactFormat.TEXT, ArtifactFormat.SOURCE]
+RAW_FMTS = [
+    ArtifactFormat.RAW,
+    ArtifactFormat.BIN,
+    ArtifactFormat.MLF,
+    ArtifactFormat.SHARED_OBJECT,
+    ArtifactFormat.ARCHIVE,
+]
+
+
 def lookup_artifacts(artifacts, name=None, fmt=None, flags=None, first_only=False):
     """Utility to get a matching artifact for a given set of properties."""
     if isinstance(name, Path):
@@ -86,14 +96,17 @@ class Artifact:
         flags=None,
         archive=False,
         optional=False,
+        source=None,
+        extracted=None,
     ):
-        # TODO: Allow to store filenames as well as raw data
         self.name = name
         # TODO: too many attributes...
         self.content = content
         self.path = path
         self.data = data
         self.raw = raw
+        self.source = Path(source) if source is not None else None  # Backing file of lazy artifacts
+        self.extracted = Path(extracted) if extracted is not None else None  # Location of already unpacked archives
         self.fmt = fmt
         self.flags = flags if flags is not None else {}
         self.archive = archive
@@ -103,6 +116,50 @@ class Artifact:
     def __repr__(self):
         return f"Artifact({self.name}, fmt={self.fmt}, flags={self.flags})"
 
+    @classmethod
+    def from_file(cls, name, path, fmt=ArtifactFormat.RAW, lazy=True, **kwargs):
+        """Create an artifact for an existing file.
+
+        Lazy artifacts only keep a reference to the file, which is read on demand when accessing .content or
+        .raw and cloned (reflink/hardlink) instead of being rewritten on export. For archives, the directory
+        where the contents were already unpacked can be passed via extracted=... to avoid extracting it again.
+        """
+        assert fmt in TEXT_FMTS + RAW_FMTS, f"Unsupported format for file-based artifacts: {fmt}"
+        if lazy:
+            return cls(name, source=path, fmt=fmt, **kwargs)
+        if fmt in TEXT_FMTS:
+            with open(path, "r", encoding="utf-8") as handle:
+                return cls(name, content=handle.read(), fmt=fmt, **kwargs)
+        with open(path, "rb") as handle:
+            return cls(name, raw=handle.read(), fmt=fmt, **kwargs)
+
+    @property
+    def lazy(self):
+        """Returns true if the contents of the artifact are not held in memory."""
+        return self.source is not None and self._content is None and self._raw is None
+
+    @property
+    def content(self):
+        if self._content is None and self.source is not None and self.fmt in TEXT_FMTS:
+            with open(self.source, "r", encoding="utf-8") as handle:
+                return handle.read()
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+
+    @property
+    def raw(self):
+        if self._raw is None and self.source is not None and self.fmt in RAW_FMTS:
+            with open(self.source, "rb") as handle:
+                return handle.read()
+        return self._raw
+
+    @raw.setter
+    def raw(self, value):
+        self._raw = value
+
     @property
     def exported(self):
         """Returns true if the artifact was writtem to disk."""
@@ -111,28 +168,34 @@ class Artifact:
     def validate(self):
         """Checker for artifact attributes for the given format."""
         if self.fmt in [ArtifactFormat.TEXT, ArtifactFormat.SOURCE]:
-            assert self.content is not None
+            assert self._content is not None or self.source is not None
         elif self.fmt in [ArtifactFormat.RAW, ArtifactFormat.BIN]:
-            assert self.raw is not None
+            assert self._raw is not None or self.source is not None
         elif self.fmt in [ArtifactFormat.MLF, ArtifactFormat.SHARED_OBJECT, ArtifactFormat.ARCHIVE]:
-            assert self.raw is not None
+            assert self._raw is not None or self.source is not None
         elif self.fmt in [ArtifactFormat.PATH]:
             assert self.path is not None
         else:
             raise NotImplementedError
 
     def cache(self):
-        raise NotImplementedError
+        """Load the contents of a lazy artifact into memory."""
+        if not self.lazy:
+            return
+        if self.fmt in TEXT_FMTS:
+            self.content = self.content
+        else:
+            self.raw = self.raw
 
     def uncache(self):
-        assert self.path is not None, "Can only uncache artifacts written to disk"
-        assert self.path.is_file(), f"Missing file: {self.path}"
-        if self.content:
-            self.content = None
-        if self.data:
-            self.data = None
-        if self.raw:
-            self.raw = None
+        """Drop the in-memory contents of an artifact which was written to disk (turns it into a lazy artifact)."""
+        if self.source is None or not self.source.is_file():
+            assert self.path is not None, "Can only uncache artifacts written to disk"
+            assert self.path.is_file(), f"Missing file: {self.path}"
+            self.source = self.path
+        self.content = None
+        self.data = None
+        self.raw = None
         # TODO: logging msg
 
     def export(self, dest, extract=False, skip_exported: bool = True):
@@ -158,7 +221,20 @@ class Artifact:
                 if self.path.is_file() or self.path.is_dir():
                     if skip_exported:
                         return
-        if self.fmt in [ArtifactFormat.TEXT, ArtifactFormat.SOURCE]:
+        if extract and self.extracted is not None and self.extracted.resolve() == Path(dest).resolve():
+            # Archive was already unpacked at the destination (i.e. by the backend)
+            if self.lazy:
+                utils.clone_file(self.source, filename)
+            elif not filename.is_file():
+                with open(filename, "wb") as handle:
+                    handle.write(self.raw)
+        elif self.lazy:
+            # No need to load the file into memory
+            utils.clone_file(self.source, filename)
+            if extract:
+                assert self.fmt in [ArtifactFormat.MLF, ArtifactFormat.SHARED_OBJECT, ArtifactFormat.ARCHIVE]
+                utils.extract(filename, dest)
+        elif self.fmt in [ArtifactFormat.TEXT, ArtifactFormat.SOURCE]:
             assert not extract, "extract option is only available for ArtifactFormat.MLF"
             with open(filename, "w", encoding="utf-8") as handle:
                 handle.write(self.content)
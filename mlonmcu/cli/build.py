@@ -61,6 +61,8 @@ def get_parser(subparsers, parent=None):
 
 def _handle(args, context, require_target=False):
     handle_load(args, ctx=context)
+    if args.resume:
+        return  # The restored runs are already configured
     backends = extract_backend_names(args, context=context)
     targets = extract_target_names(args, context=context if require_target else None)
     platforms = extract_platform_names(args, context=context)
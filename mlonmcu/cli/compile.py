@@ -44,6 +44,8 @@ def get_parser(subparsers):
 
 def _handle(args, context):
     handle_build(args, ctx=context)
+    if args.resume:
+        return  # The restored runs are already configured
     targets = extract_target_names(args, context=context)  # This will eventually be ignored below
     platforms = extract_platform_names(args, context=context)
 
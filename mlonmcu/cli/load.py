@@ -65,6 +65,9 @@ def _handle(args, context):
     frontends = extract_frontend_names(args, context=context)
     postprocesses = extract_postprocess_names(args, context=context)
     session = context.get_session(label=args.label, resume=args.resume, config=config)
+    if args.resume:
+        assert len(session.runs) > 0, "Unable to restore any run of the latest session (see session.checkpoint)"
+        return
     models = apply_modelgroups(args.models, context=context)
     for model in models:
         for f in gen_features:
@@ -0,0 +1,239 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Persistent index of the sessions and runs stored in an environments temp directory."""
+import os
+import time
+import sqlite3
+from collections import namedtuple
+from pathlib import Path
+
+from mlonmcu.logging import get_logger
+
+logger = get_logger()
+
+CATALOG_VERSION = 1
+CATALOG_FILE = "catalog.db"
+
+SessionEntry = namedtuple("SessionEntry", ["idx", "label", "status", "dir", "report", "created_at", "closed_at"])
+RunEntry = namedtuple("RunEntry", ["session", "idx", "dir", "failing"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    idx INTEGER PRIMARY KEY,
+    label TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    dir TEXT NOT NULL,
+    report TEXT,
+    created_at REAL,
+    closed_at REAL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    session INTEGER NOT NULL REFERENCES sessions(idx) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    dir TEXT NOT NULL,
+    failing INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (session, idx)
+);
+"""
+
+
+def _get_ids(directory):
+    if not directory.is_dir():
+        return []
+    ids = []
+    for name in os.listdir(directory):
+        path = directory / name
+        if name.isdigit() and path.is_dir() and not path.is_symlink():
+            ids.append(int(name))
+    return sorted(ids)
+
+
+class SessionCatalog:
+    """SQLite-backed catalog of the sessions and runs of an environment.
+
+    The catalog replaces the scanning of the session and run directories whenever a context is created. It is
+    updated transactionally when sessions are created, opened, closed and removed. If no catalog exists yet
+    (i.e. for environments created with older versions of MLonMCU) it is populated from the existing
+    directories once.
+
+    Attributes
+    ----------
+    directory : Path
+        The directory containing the session directories (usually located in the environments temp directory).
+    path : Path
+        The location of the database file.
+    timeout : float
+        Maximum number of seconds to wait for concurrent writers.
+    """
+
+    def __init__(self, directory, timeout=60):
+        self.directory = Path(directory)
+        self.path = self.directory / CATALOG_FILE
+        self.timeout = timeout
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.executescript(SCHEMA)
+            version = con.execute("PRAGMA user_version").fetchone()[0]
+        if version < CATALOG_VERSION:
+            self.rebuild()
+
+    def __repr__(self):
+        return f"SessionCatalog({self.path})"
+
+    def _connect(self):
+        con = sqlite3.connect(str(self.path), timeout=self.timeout, isolation_level="IMMEDIATE")
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA foreign_keys=ON")
+        return con
+
+    def _run(self, func):
+        # The connection context manager only handles the transaction, hence it needs to be closed explicitly
+        con = self._connect()
+        try:
+            with con:
+                return func(con)
+        finally:
+            con.close()
+
+    def rebuild(self):
+        """Replace the contents of the catalog by scanning the session directories.
+
+        Returns
+        -------
+        int
+            The number of indexed sessions.
+        """
+
+        def _rebuild(con):
+            con.execute("DELETE FROM runs")
+            con.execute("DELETE FROM sessions")
+            session_ids = _get_ids(self.directory)
+            for sid in session_ids:
+                session_dir = self.directory / str(sid)
+                report = next(iter(sorted(session_dir.glob("report.*"))), None)
+                status = "error" if (session_dir / ".lock").is_file() else "closed"
+                mtime = session_dir.stat().st_mtime
+                con.execute(
+                    "INSERT INTO sessions (idx, label, status, dir, report, created_at, closed_at) "
+                    "VALUES (?, '', ?, ?, ?, ?, ?)",
+                    (sid, status, str(session_dir), None if report is None else str(report), mtime, mtime),
+                )
+                runs_dir = session_dir / "runs"
+                con.executemany(
+                    "INSERT INTO runs (session, idx, dir) VALUES (?, ?, ?)",
+                    [(sid, rid, str(runs_dir / str(rid))) for rid in _get_ids(runs_dir)],
+                )
+            con.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+            return len(session_ids)
+
+        count = self._run(_rebuild)
+        logger.debug("Indexed %d existing sessions in %s", count, self.path)
+        return count
+
+    def add_session(self, idx, label="", dir=None, status="created"):
+        """Register a new session."""
+        dir = self.directory / str(idx) if dir is None else dir
+        self._run(
+            lambda con: con.execute(
+                "INSERT OR REPLACE INTO sessions (idx, label, status, dir, created_at) VALUES (?, ?, ?, ?, ?)",
+                (idx, label, status, str(dir), time.time()),
+            )
+        )
+
+    def update_session(self, idx, status, report=None, runs=None):
+        """Update the status of a session and (optionally) replace its list of runs.
+
+        Parameters
+        ----------
+        idx : int
+            The session index.
+        status : str
+            The new status of the session.
+        report : Path
+            Location of the session report (if available).
+        runs : list
+            List of (idx, dir, failing) tuples.
+        """
+
+        def _update(con):
+            closed_at = time.time() if status in ["closed", "error"] else None
+            con.execute(
+                "UPDATE sessions SET status = ?, report = COALESCE(?, report), closed_at = ? WHERE idx = ?",
+                (status, None if report is None else str(report), closed_at, idx),
+            )
+            if runs is not None:
+                con.execute("DELETE FROM runs WHERE session = ?", (idx,))
+                con.executemany(
+                    "INSERT INTO runs (session, idx, dir, failing) VALUES (?, ?, ?, ?)",
+                    [(idx, rid, str(run_dir), int(bool(failing))) for rid, run_dir, failing in runs],
+                )
+
+        self._run(_update)
+
+    def remove_sessions(self, ids):
+        """Drop the given sessions (and their runs) from the catalog."""
+        ids = list(ids)
+        self._run(lambda con: con.executemany("DELETE FROM sessions WHERE idx = ?", [(sid,) for sid in ids]))
+
+    def last_idx(self):
+        """Return the highest session index in use or -1 if there is no session."""
+        row = self._run(lambda con: con.execute("SELECT MAX(idx) FROM sessions").fetchone())
+        return -1 if row[0] is None else row[0]
+
+    def sessions(self):
+        """Return the entries for all sessions sorted by their index."""
+        rows = self._run(
+            lambda con: con.execute(
+                "SELECT idx, label, status, dir, report, created_at, closed_at FROM sessions ORDER BY idx"
+            ).fetchall()
+        )
+        return [SessionEntry(*row) for row in rows]
+
+    def get_session(self, idx):
+        """Return the entry of a single session or None if it is unknown."""
+        row = self._run(
+            lambda con: con.execute(
+                "SELECT idx, label, status, dir, report, created_at, closed_at FROM sessions WHERE idx = ?", (idx,)
+            ).fetchone()
+        )
+        return None if row is None else SessionEntry(*row)
+
+    def runs(self, session):
+        """Return the entries for all runs of the given session sorted by their index."""
+        rows = self._run(
+            lambda con: con.execute(
+                "SELECT session, idx, dir, failing FROM runs WHERE session = ? ORDER BY idx", (session,)
+            ).fetchall()
+        )
+        return [RunEntry(sid, rid, run_dir, bool(failing)) for sid, rid, run_dir, failing in rows]
+
+    def run_ids(self):
+        """Return a dict mapping every session index to the list of its run indices."""
+        ret = {}
+        rows = self._run(
+            lambda con: con.execute(
+                "SELECT sessions.idx, runs.idx FROM sessions LEFT JOIN runs ON runs.session = sessions.idx "
+                "ORDER BY sessions.idx, runs.idx"
+            ).fetchall()
+        )
+        for sid, rid in rows:
+            ids = ret.setdefault(sid, [])
+            if rid is not None:
+                ids.append(rid)
+        return ret
@@ -28,8 +28,8 @@ import filelock
 
 from mlonmcu.utils import ask_user
 from mlonmcu.logging import get_logger, set_log_file
-from mlonmcu.session.run import Run
 from mlonmcu.session.session import Session
+from mlonmcu.context.catalog import SessionCatalog
 from mlonmcu.setup.cache import TaskCache
 import mlonmcu.setup.utils as utils
 from mlonmcu.plugins import process_extensions
@@ -149,50 +149,35 @@ def get_ids(directory: Path) -> List[int]:
     return sorted(ids)  # TODO: sort by session datetime?
 
 
-def load_recent_sessions(env: Environment, count: int = None) -> List[Session]:
+def load_recent_sessions(env: Environment, count: int = None, catalog: SessionCatalog = None) -> List[Session]:
     """Get a list of recent sessions for the environment.
 
+    The sessions are looked up in the session catalog of the environment instead of scanning the session
+    directories. The runs of archived sessions are not restored (see `MlonMcuContext.get_runs`).
+
     Parameters
     ----------
     env : Environment
         MLonMCU environment which should be used.
     count : int
         Maximum number of sessions to return. Collect all if None.
+    catalog : SessionCatalog
+        The catalog to use. Opened from the environments temp directory if None.
 
     Returns
     -------
     list:
         The resulting list of session objects.
     """
-
+    if catalog is None:
+        catalog = SessionCatalog(env.paths["temp"].path / "sessions")
+    entries = catalog.sessions()
     if count is not None:
-        raise NotImplementedError()
+        entries = entries[-count:] if count > 0 else []
     sessions = []
-
-    sessions_directory = env.paths["temp"].path / "sessions"
-
-    # TODO: in the future also strs (custom or hash) should be allowed
-    session_ids = get_ids(sessions_directory)
-
-    for sid in session_ids:
-        session_directory = sessions_directory / str(sid)
-        # session_file = sessions_directory / str(sid) / "session.txt"
-        # if not session_file.is_file():
-        #     continue
-        runs_directory = session_directory / "runs"
-        run_ids = get_ids(runs_directory)
-        runs = []
-        for rid in run_ids:
-            run_directory = runs_directory / str(rid)
-            # run_file = run_directory / "run.txt"
-            # run = Run.from_file(run_file)  # TODO: actually implement run restore
-            run = Run()  # TODO: fix
-            run.archived = True
-            run.dir = run_directory
-            runs.append(run)
-        session = Session(idx=sid, archived=True, dir=session_directory)
-        session.runs = runs
-        session.dir = session_directory
+    for entry in entries:
+        session = Session(label=entry.label, idx=entry.idx, archived=True, dir=Path(entry.dir))
+        session.report_file = None if entry.report is None else Path(entry.report)
         sessions.append(session)
     return sessions
 
@@ -298,16 +283,27 @@ class MlonMcuContext:
             raise RuntimeError("Lock on current context could not be aquired.") from err
         else:
             with lock:
-                self.sessions = load_recent_sessions(self.environment)
+                self.catalog = SessionCatalog(self.environment.paths["temp"].path / "sessions")
+                self._sessions = None  # Loaded lazily from the catalog
                 if self.environment.defaults.cleanup_auto:
                     logger.debug("Cleaning up old sessions automaticaly")
                     self.cleanup_sessions(keep=self.environment.defaults.cleanup_keep, interactive=False)
-                    self.sessions = load_recent_sessions(self.environment)
-                self.session_idx = self.sessions[-1].idx if len(self.sessions) > 0 else -1
-                logger.debug(f"Restored {len(self.sessions)} recent sessions")
+                self.session_idx = self.catalog.last_idx()
         self.cache = TaskCache()
         self.export_paths = set()
 
+    @property
+    def sessions(self):
+        """List of sessions for the current environment (loaded on first access)."""
+        if self._sessions is None:
+            self._sessions = load_recent_sessions(self.environment, catalog=self.catalog)
+            logger.debug(f"Restored {len(self._sessions)} recent sessions")
+        return self._sessions
+
+    @sessions.setter
+    def sessions(self, value):
+        self._sessions = value
+
     def create_session(self, label="", config=None):
         try:
             lock = self.latest_session_link_lock.acquire(timeout=10)
@@ -316,14 +312,20 @@ class MlonMcuContext:
         else:
             with lock:
                 """Create a new session in the current context."""
-                self.sessions = load_recent_sessions(self.environment)
-                idx = self.session_idx + 1
+                # Sessions might have been created by other processes in the meantime
+                live = {session.idx: session for session in (self._sessions or []) if not session.archived}
+                self.sessions = [
+                    live.get(session.idx, session)
+                    for session in load_recent_sessions(self.environment, catalog=self.catalog)
+                ]
+                idx = max(self.session_idx, self.catalog.last_idx()) + 1
                 logger.debug("Creating a new session with idx %s", idx)
                 temp_directory = self.environment.paths["temp"].path
                 sessions_directory = temp_directory / "sessions"
                 sessions_directory.mkdir(exist_ok=True, parents=True)
                 session_dir = sessions_directory / str(idx)
-                session = Session(idx=idx, label=label, dir=session_dir, config=config)
+                session = Session(idx=idx, label=label, dir=session_dir, config=config, catalog=self.catalog)
+                self.catalog.add_session(idx, label=session.label, dir=session_dir)
                 self.sessions.append(session)
                 self.session_idx = idx
                 # TODO: move this to a helper function
@@ -380,14 +382,34 @@ class MlonMcuContext:
         """
         if resume:
             assert len(self.sessions) > 0, "There is no recent session available"
-            # session = self.sessions[-1]
-            assert False, "The latest session can not be resumed"
-            raise NotImplementedError
+            session = self.sessions[-1]
+            if session.active:
+                return session
+            return self.resume_session(session.idx, config=config)
 
         if self.session_idx < 0 or not self.sessions[-1].active:
             self.create_session(label=label, config=config)
         return self.sessions[-1]
 
+    def resume_session(self, idx, config=None) -> Session:
+        """Reopen an archived session and restore its runs from their checkpoints.
+
+        Returns
+        -------
+        Session:
+            The resumed session (moved to the end of the list of sessions)
+        """
+        matches = [i for i, session in enumerate(self.sessions) if session.idx == idx]
+        assert len(matches) > 0, f"Lookup for session id {idx} failed"
+        archived = self.sessions.pop(matches[0])
+        config = dict(config) if config else {}
+        config.setdefault("session.checkpoint", True)  # Keep saving checkpoints for further interruptions
+        session = Session(idx=idx, label=archived.label, dir=archived.dir, config=config, catalog=self.catalog)
+        num_runs = session.restore_runs()
+        logger.info("Resuming session %s with %d restored runs", idx, num_runs)
+        self.sessions.append(session)
+        return session
+
     def __enter__(self):
         logger.debug("Enter MlonMcuContext")
         if self.deps_lock.is_locked:
@@ -411,14 +433,14 @@ class MlonMcuContext:
     def cleanup(self):
         """Clean up the context before leaving the context by closing all active sessions"""
         logger.debug("Cleaning up active sessions")
-        for session in self.sessions:
+        for session in self._sessions or []:
             if session.active:
                 session.close()
 
     @property
     def is_clean(self):
         """Return true if all sessions in the context are inactive"""
-        return not any(sess.active for sess in self.sessions)
+        return not any(sess.active for sess in self._sessions or [])
 
     # WARNING: this will remove the actual session directories!
     def cleanup_sessions(self, keep=10, interactive=True):
@@ -438,16 +460,20 @@ class MlonMcuContext:
                 print(" ".join([str(session.idx) for session in to_remove]))
 
             if ask_user("Are your sure?", default=not interactive, interactive=interactive):
+                removed = []
                 for session in to_remove:
                     session_dir = sessions_dir / str(session.idx)
                     if not session_dir.is_dir():
                         # Skip / Dir does not exist
+                        removed.append(session.idx)
                         continue
                     session_lock = session_dir / ".lock"
                     if session_lock.is_file():
                         # Skip / Session locked (unclean or in progress)
                         continue
                     shutil.rmtree(session_dir)
+                    removed.append(session.idx)
+                self.catalog.remove_sessions(removed)
                 self.sessions = to_keep
                 self.session_idx = self.sessions[-1].idx if len(self.sessions) > 0 else -1
                 if interactive:
@@ -461,12 +487,24 @@ class MlonMcuContext:
         # We currently do not support rewirting the indices to start from scratch again as this
         # would lead to inconsitencies with the path in the report/cmake build dirtectory
 
+    def get_runs(self, session):
+        """Return a list of (idx, dir) tuples for the runs of the given session.
+
+        The runs of archived sessions are looked up in the session catalog.
+        """
+        if session.archived:
+            return [(entry.idx, Path(entry.dir)) for entry in self.catalog.runs(session.idx)]
+        return [
+            (run.idx if run.idx is not None else i, getattr(run, "dir", None) or session.runs_dir / str(i))
+            for i, run in enumerate(session.runs)
+        ]
+
     def get_sessions_runs_idx(self):
-        sessions_dict = {}
-        for session in self.sessions:
-            session_runs_idx = [run.idx if run.idx is not None else i for i, run in enumerate(session.runs)]
-            sessions_dict[session.idx] = session_runs_idx
-        return sessions_dict
+        sessions_dict = self.catalog.run_ids()
+        for session in self._sessions or []:
+            if not session.archived:
+                sessions_dict[session.idx] = [idx for idx, _ in self.get_runs(session)]
+        return {session.idx: sessions_dict.get(session.idx, []) for session in self.sessions}
 
     def print_summary(self, sessions=True, runs=False, labels=True):
         def print_sessions(sessions_runs, with_runs=False, with_labels=True):
@@ -532,28 +570,30 @@ class MlonMcuContext:
                     base = tmpdir / str(sid)
                 if run_ids is None:
                     src = session.dir / "runs"
-                    report_path = session.dir / "report.csv"  # TODO: only works for csv
+                    report_path = session.report_file
+                    if report_path is None:
+                        report_path = session.dir / "report.csv"
                     # TODO: use artifacts from restored session instead
                     shutil.copytree(
                         src, base, dirs_exist_ok=True, symlinks=True
                     )  # Warning: dirs_exist_ok=True requires python 3.8+
                     if report_path.is_file():
-                        shutil.copyfile(report_path, base / "report.csv")
+                        shutil.copyfile(report_path, base / report_path.name)
                 else:
                     base = base / "runs"
+                    runs = dict(self.get_runs(session))
                     for rid in run_ids:
-                        if rid >= len(session.runs):
+                        if rid not in runs:
                             print(
                                 f"Lookup for run id {rid} failed in session {sid}. Available:",
-                                " ".join([str(i) for i in range(len(session.runs))]),
+                                " ".join([str(i) for i in runs]),
                             )
                             sys.exit(1)
-                        run = session.runs[rid]  # TODO: We currently do not check if the index actually exists
                         if len(run_ids) == 1 and len(session_ids) == 1:
                             run_base = tmpdir
                         else:
                             run_base = base / str(rid)
-                        src = run.dir
+                        src = runs[rid]
                         shutil.copytree(
                             src, run_base, dirs_exist_ok=True
                         )  # Warning: dirs_exist_ok=True requires python 3.8+
@@ -19,13 +19,16 @@
 """Definition of MLonMCU features and the feature registry."""
 
 import re
-import pandas as pd
+import json
 from typing import Union
 from pathlib import Path
 
 from mlonmcu.utils import is_power_of_two, filter_none
 from mlonmcu.config import str2bool, str2list
 from mlonmcu.artifact import Artifact, ArtifactFormat
+from mlonmcu.trace import convert_text_trace, get_symbol_address, TEXT_TRACE_FORMATS, TRACE_FORMAT_ALIASES
+from mlonmcu.stream import LogStream, InstructionSampler, COMPRESSION_SUFFIXES, open_log
+from mlonmcu.stats import is_bench_metric, summarize
 from .feature import (
     BackendFeature,
     FrameworkFeature,
@@ -50,6 +53,8 @@ SUPPORTED_TVM_BACKENDS = [
 REGISTERED_FEATURES = {}
 FEATURE_DEPS = {}
 
+ETISS_INSTR_REGEX = re.compile(r"0x[a-fA-F0-9]+: .* \[.*\]")
+
 
 def register_feature(name, depends=None):
     """Decorator for adding a feature to the global registry."""
@@ -59,6 +64,7 @@ def register_feature(name, depends=None):
     def real_decorator(obj):
         REGISTERED_FEATURES[name] = obj
         FEATURE_DEPS[name] = depends
+        return obj  # Keep the class accessible by its name (required for pickling)
 
     return real_decorator
 
@@ -984,6 +990,8 @@ class TVMTuneBase(PlatformFeature):
         "visualize_file": None,
         "visualize_live": None,
         "tasks": None,
+        "database": None,
+        "database_seed": None,
         # All None to use the defaults defined in the backend instead
     }
 
@@ -1039,6 +1047,14 @@ class TVMTuneBase(PlatformFeature):
     def tasks(self):
         return self.config["tasks"]
 
+    @property
+    def database(self):
+        return self.config["database"]
+
+    @property
+    def database_seed(self):
+        return self.config["database_seed"]
+
     def get_platform_config(self, platform):
         assert platform in ["tvm", "microtvm"]
         # TODO: figure out a default path automatically
@@ -1056,6 +1072,8 @@ class TVMTuneBase(PlatformFeature):
                 f"{platform}.autotuning_visualize_file": self.visualize_file,
                 f"{platform}.autotuning_visualize_live": self.visualize_live,
                 f"{platform}.autotuning_tasks": self.tasks,
+                f"{platform}.autotuning_database": self.database,
+                f"{platform}.autotuning_database_seed": self.database_seed,
             }
         )
 
@@ -1367,7 +1385,17 @@ class CacheSim(TargetFeature):
 class LogInstructions(TargetFeature):
     """Enable logging of the executed instructions of a simulator-based target."""
 
-    DEFAULTS = {**FeatureBase.DEFAULTS, "to_file": False}
+    DEFAULTS = {
+        **FeatureBase.DEFAULTS,
+        "to_file": False,
+        "binary": False,
+        "compress": None,  # Allowed: gzip, zstd (only used with to_file)
+        "sample_start": None,  # PC or symbol which enables the tracing (i.e. mlonmcu_run)
+        "sample_stop": None,  # PC or symbol which disables the tracing
+        "sample_window": None,  # Number of consecutive instructions per sampling window
+        "sample_period": None,  # Only trace every n-th window (default: only the first window)
+        "sample_skip": None,  # Number of executed instructions before looking for the sample_start PC
+    }
 
     OPTIONAL = {"etiss.experimental_print_to_file"}
 
@@ -1379,6 +1407,96 @@ class LogInstructions(TargetFeature):
         value = self.config["to_file"]
         return str2bool(value, allow_none=True)
 
+    @property
+    def binary(self):
+        """Convert the textual instruction log to the compact binary trace format (see mlonmcu.trace)."""
+        value = self.config["binary"]
+        return str2bool(value)
+
+    @property
+    def compress(self):
+        """Compress the instruction log while it is written by the simulator."""
+        value = self.config["compress"]
+        if value in [None, "", "none"]:
+            return None
+        assert value in COMPRESSION_SUFFIXES, f"Unsupported compression: {value}"
+        return value
+
+    @staticmethod
+    def _parse_pc(value):
+        if value is None or isinstance(value, int):
+            return value
+        try:
+            return int(value, 0)
+        except ValueError:
+            return value  # Symbol, resolved using the ELF
+
+    @property
+    def sample_start(self):
+        return self._parse_pc(self.config["sample_start"])
+
+    @property
+    def sample_stop(self):
+        return self._parse_pc(self.config["sample_stop"])
+
+    @property
+    def sample_window(self):
+        value = self.config["sample_window"]
+        return int(value) if value is not None else None
+
+    @property
+    def sample_period(self):
+        value = self.config["sample_period"]
+        return int(value) if value is not None else None
+
+    @property
+    def sample_skip(self):
+        value = self.config["sample_skip"]
+        return int(value) if value is not None else 0
+
+    def get_native_sampling(self, target):
+        """Sampling options which are handled by the simulator instead of filtering the log afterwards."""
+        ret = {}
+        if target in ["ovpsim", "corev_ovpsim"]:
+            # riscvOVPsim can only start and stop tracing based on the number of executed instructions
+            if self.sample_skip > 0:
+                ret["skip"] = self.sample_skip
+            single_window = self.sample_window is not None and self.sample_period is None
+            if single_window and self.sample_start is None and self.sample_stop is None:
+                ret["window"] = self.sample_window
+        return ret
+
+    def get_sampling(self, target):
+        """Check if the instruction log of the given target needs to be filtered by an InstructionSampler."""
+        native = self.get_native_sampling(target)
+        return (
+            self.sample_start is not None
+            or self.sample_stop is not None
+            or (self.sample_window is not None and "window" not in native)
+            or (self.sample_skip > 0 and "skip" not in native)
+        )
+
+    def get_sampler(self, target, elf=None):
+        """Create a sampler for the instruction log of the given target (if sampling is used)."""
+        if not self.get_sampling(target):
+            return None
+        native = self.get_native_sampling(target)
+        pcs = []
+        for pc in [self.sample_start, self.sample_stop]:
+            if isinstance(pc, str):
+                assert elf is not None, "Sampling between symbols requires an ELF file"
+                pc = get_symbol_address(elf, pc)
+            pcs.append(pc)
+        regex, _ = TEXT_TRACE_FORMATS[TRACE_FORMAT_ALIASES.get(target, target)]
+        return InstructionSampler(
+            regex,
+            start=pcs[0],
+            stop=pcs[1],
+            window=self.sample_window,
+            period=self.sample_period,
+            skip=0 if "skip" in native else self.sample_skip,
+        )
+
     @property
     def etiss_experimental_print_to_file(self):
         value = self.config["etiss.experimental_print_to_file"]
@@ -1410,6 +1528,11 @@ class LogInstructions(TargetFeature):
         elif target in ["ovpsim", "corev_ovpsim"]:
             extra_args_new = config.get("extra_args", [])
             extra_args_new.append("--trace")
+            native = self.get_native_sampling(target)
+            if "skip" in native:
+                extra_args_new.extend(["--traceafter", str(native["skip"])])
+            if "window" in native:
+                extra_args_new.extend(["--tracecount", str(native["window"])])
             if self.to_file:
                 # assert directory is not None
                 directory = Path(".")  # Need to use relative path because target.dir not available here
@@ -1439,41 +1562,108 @@ class LogInstructions(TargetFeature):
         ], f"Unsupported feature '{self.name}' for target '{target}'"
         if self.enabled:
             if not target == "gvsoc_pulp":
+                # Instruction logs are only compressed/sampled on the fly if written to a file by the simulator
+                etiss_stdout = target in ["etiss_pulpino", "etiss"] and not self.etiss_experimental_print_to_file
+                compress = self.compress if self.to_file and not self.binary else None
+                sampling = self.get_sampling(target)
+                assert not sampling or self.to_file, "Sampling of instruction logs requires log_instrs.to_file"
+                log_name = "instr_trace.csv" if target in ["etiss_pulpino", "etiss"] else "instrs.txt"
+                trace_fmt = TRACE_FORMAT_ALIASES.get(target, target)
+                streams = {}
+                samplers = {}
+                handles = {}
+
+                def log_instrs_pre_callback(cwd, args, directory=None, elf=None):
+                    """Callback which redirects the instruction log of the simulator into a processing pipe."""
+                    sampler = self.get_sampler(target, elf=elf)
+                    if not etiss_stdout:
+                        streams[str(directory)] = LogStream(Path(directory) / log_name, compress, sampler=sampler)
+                        return None
+                    samplers[str(directory)] = sampler
+                    log_file = Path(directory) / "instrs.txt"
+                    if compress is not None:
+                        log_file = log_file.with_name(log_file.name + COMPRESSION_SUFFIXES[compress])
+                    handle = open_log(log_file, compress=compress)
+                    handles[str(directory)] = (handle, log_file)
+
+                    def write_instr(line):
+                        """Move instructions printed by ETISS from the output to the log file."""
+                        if ETISS_INSTR_REGEX.match(line) is None:
+                            return False
+                        if sampler is None:
+                            handle.write(line)
+                        else:
+                            handle.writelines(sampler.filter([line]))
+                        return True
+
+                    return write_instr
 
                 def log_instrs_callback(stdout, metrics, artifacts, directory=None):
                     """Callback which parses the targets output and updates the generated metrics and artifacts."""
-                    new_lines = []
-                    if self.to_file:
-                        if target in ["etiss_pulpino", "etiss"]:
-                            if self.etiss_experimental_print_to_file:
-                                log_file = Path(directory) / "instr_trace.csv"
-                            else:
-                                # TODO: update stdout and remove log_instrs lines
-                                instrs = []
-                                for line in stdout.split("\n"):
-                                    if target in ["etiss_pulpino", "etiss"]:
-                                        expr = re.compile(r"0x[a-fA-F0-9]+: .* \[.*\]")
-                                    match = expr.match(line)
-                                    if match is not None:
-                                        instrs.append(line)
-                                    else:
-                                        new_lines.append(line)
-                                content = "\n".join(instrs)
-                                stdout = "\n".join(new_lines)
-                        else:
-                            assert target in ["spike", "ovpsim", "corev_ovpsim"]
-                            log_file = Path(directory) / "instrs.txt"
-                            with open(log_file, "r") as f:
-                                content = f.read()
-                        instrs_artifact = Artifact(
+                    # Logs of previous repetitions are discarded
+                    finished = {}
+                    for key in list(streams):
+                        stream = streams.pop(key)
+                        finished[key] = stream.finish()
+                        samplers[key] = stream.sampler
+                    for key in list(handles):
+                        handle, log_file = handles.pop(key)
+                        handle.close()
+                        finished[key] = log_file
+                    sampler = samplers.pop(str(directory), None)
+                    samplers.clear()
+                    if not self.to_file:
+                        return stdout
+                    if etiss_stdout:
+                        # The instructions were already removed from the output while the simulation was running
+                        log_file = finished[str(directory)]
+                    elif compress is None and not sampling:
+                        log_file = Path(directory) / log_name
+                    else:
+                        log_file = finished[str(directory)]
+                    if self.binary:
+                        trace_file = Path(directory) / "instrs.trace"
+                        convert_text_trace(log_file, trace_file, trace_fmt)
+                        log_file.unlink()  # Not needed anymore
+                        instrs_artifact = Artifact.from_file(
+                            f"{target}_instrs.trace",
+                            trace_file,
+                            fmt=ArtifactFormat.RAW,
+                            flags=(self.name, target, "binary"),
+                        )
+                    elif compress is not None:
+                        instrs_artifact = Artifact.from_file(
+                            f"{target}_instrs.log{COMPRESSION_SUFFIXES[compress]}",
+                            log_file,
+                            fmt=ArtifactFormat.RAW,
+                            flags=(self.name, target, compress),
+                        )
+                    else:
+                        # The log is only referenced, the target moves it to the run directory
+                        instrs_artifact = Artifact.from_file(
                             f"{target}_instrs.log",
-                            content=content,
+                            log_file,
                             fmt=ArtifactFormat.TEXT,
                             flags=(self.name, target),
                         )
-                        artifacts.append(instrs_artifact)
+                    artifacts.append(instrs_artifact)
+                    if sampler is not None:
+                        # Required for extrapolating the statistics of the sampled instructions
+                        summary = sampler.summary()
+                        sampling_artifact = Artifact(
+                            f"{target}_instrs_sampling.json",
+                            content=json.dumps(summary, indent=2),
+                            fmt=ArtifactFormat.TEXT,
+                            flags=("log_instrs_sampling", target),
+                        )
+                        artifacts.append(sampling_artifact)
+                        for m in metrics:
+                            m.add("Traced Instructions", summary["considered"])
+                            m.add("Sampled Instructions", summary["sampled"])
                     return stdout
 
+                if sampling or (self.to_file and etiss_stdout) or compress is not None:
+                    return log_instrs_pre_callback, log_instrs_callback
                 return None, log_instrs_callback
         return None, None
 
@@ -1654,7 +1844,23 @@ class Benchmark(PlatformFeature, TargetFeature):
         "num_runs": 1,
         "num_repeat": 1,
         "total": False,
-        "aggregate": "avg",  # Allowed: avg, max, min, none, all
+        "aggregate": "avg",  # Allowed: avg, median, max, min, none, all, stats (tvm/microtvm: median, stats -> all)
+        "percentiles": [5, 95],  # Only used for aggregate=stats
+        "confidence": 0.95,
+        "adaptive": False,  # Repeat until the confidence intervals are narrow enough (num_repeat is the minimum)
+        "max_repeat": 20,
+        "max_ci_width": 0.05,  # Relative to the mean
+    }
+
+    AGGREGATES = {
+        "avg": ["Average"],
+        "mean": ["Average"],
+        "median": ["Median"],
+        "min": ["Min"],
+        "max": ["Max"],
+        "none": [],
+        "all": ["Average", "Min", "Max"],
+        "stats": ["Average", "Median", "Std", "Min", "Max", "CI Low", "CI High"],
     }
 
     def __init__(self, features=None, config=None):
@@ -1676,27 +1882,68 @@ class Benchmark(PlatformFeature, TargetFeature):
     @property
     def aggregate(self):
         value = self.config["aggregate"]
-        assert value in ["avg", "all", "max", "min", "none"]
+        assert value in self.AGGREGATES, f"Unsupported aggregate: {value}"
         return value
 
+    @property
+    def percentiles(self):
+        value = self.config["percentiles"]
+        return [float(p) for p in str2list(value)] if value is not None else []
+
+    @property
+    def confidence(self):
+        value = self.config["confidence"]
+        return float(value)
+
+    @property
+    def adaptive(self):
+        value = self.config["adaptive"]
+        return str2bool(value)
+
+    @property
+    def max_repeat(self):
+        value = self.config["max_repeat"]
+        return int(value)
+
+    @property
+    def max_ci_width(self):
+        value = self.config["max_ci_width"]
+        return float(value)
+
     def get_platform_config(self, platform):
+        """Forward the benchmark options to the platform.
+
+        The TVM platforms only aggregate the measurements using avg, min and max. As median and stats can not be
+        derived from these, all of them (all) are reported instead.
+        """
         supported = ["mlif", "tvm", "microtvm"]  # TODO: support espidf
         assert platform in supported, f"Unsupported feature '{self.name}' for platform '{platform}'"
 
         if platform in ["tvm", "microtvm"]:
+            aggregate = {"mean": "avg", "median": "all", "stats": "all"}.get(self.aggregate, self.aggregate)
             return {
                 f"{platform}.number": self.num_runs,
                 f"{platform}.repeat": self.num_repeat,
-                f"{platform}.aggregate": self.aggregate,
+                f"{platform}.aggregate": aggregate,
                 f"{platform}.total_time": self.total,
             }
         else:
             return {}
 
     def get_target_config(self, target):
-        return {
+        ret = {
             f"{target}.repeat": self.num_repeat,
         }
+        if self.adaptive:
+            ret.update(
+                {
+                    f"{target}.repeat": max(2, self.num_repeat),  # At least two samples are required for a CI
+                    f"{target}.max_repeat": max(self.max_repeat, self.num_repeat),
+                    f"{target}.repeat_ci_width": self.max_ci_width,
+                    f"{target}.repeat_confidence": self.confidence,
+                }
+            )
+        return ret
 
     def get_platform_defs(self, platform):
         supported = ["mlif", "espidf", "tvm", "microtvm", "zephyr"]  # TODO: support microtvm and espidf
@@ -1718,48 +1965,29 @@ class Benchmark(PlatformFeature, TargetFeature):
                 metrics_ = metrics[1:]  # drop first run (warmup)
 
                 # TODO: this currently processes all numeric metrics, should probably ignore stuff like MIPS etc.
-                candidates = ["cycle", "time", "instruction"]  # TODO: allow overriding via config
                 data_ = [
                     {
                         key: (float(value) / self.num_runs) if self.num_runs > 1 else value
                         for key, value in m.data.items()
-                        if any(x in key.lower() for x in candidates)
+                        if is_bench_metric(key)
                     }
                     for m in metrics_
                 ]
 
-                df = pd.DataFrame(data_)
-
-                if self.aggregate == "all":
-                    aggs = ["mean", "min", "max"]
-                elif self.aggregate in ["avg", "mean"]:
-                    aggs = ["mean"]
-                elif self.aggregate == "min":
-                    aggs = ["min"]
-                elif self.aggregate == "max":
-                    aggs = ["max"]
-                elif self.aggregate == "none":
-                    aggs = []
-
-                if len(df.columns) == 0:
-                    data = {}
-                elif len(aggs) == 0:
-                    data = {}
-                else:
-                    df_ = df.agg(aggs)
-
-                    # rename columns
-                    index_mapping = {
-                        "mean": "Average",
-                        "min": "Min",
-                        "max": "Max",
-                    }
-
-                    df_ = df_.rename(index=index_mapping)
-
-                    data = df_.to_dict()
-
-                    data = {f"{prefix} {key}": value for key, temp in data.items() for prefix, value in temp.items()}
+                labels = list(self.AGGREGATES[self.aggregate])
+                if self.aggregate == "stats":
+                    labels += [f"P{p:g}" for p in self.percentiles]
+                data = {}
+                if len(labels) > 0:
+                    samples = {}
+                    for d in data_:
+                        for key, value in d.items():
+                            samples.setdefault(key, []).append(value)
+                    for key, values in samples.items():
+                        stats = summarize(values, confidence=self.confidence, percentiles=self.percentiles)
+                        data.update({f"{label} {key}": stats[label] for label in labels})
+                if self.adaptive:
+                    data["Repetitions"] = len(metrics_)
                 if self.total:
                     data.update(
                         {
@@ -1792,7 +2020,7 @@ class Benchmark(PlatformFeature, TargetFeature):
 class TvmRpc(PlatformFeature):
     """Run TVM models on a RPC device."""
 
-    DEFAULTS = {**FeatureBase.DEFAULTS, "hostname": None, "port": None, "key": None}  # tracker
+    DEFAULTS = {**FeatureBase.DEFAULTS, "hostname": None, "port": None, "key": None, "hosts": None}  # tracker
 
     def __init__(self, features=None, config=None):
         super().__init__("tvm_rpc", features=features, config=config)
@@ -1813,14 +2041,21 @@ class TvmRpc(PlatformFeature):
     def key(self):
         return self.config["key"]
 
+    @property
+    def hosts(self):
+        return self.config["hosts"]
+
     def get_platform_config(self, platform):
         assert platform in ["tvm", "microtvm"]
+        # The microtvm platform does not schedule its executions on a device pool
+        assert self.hosts is None or platform == "tvm", f"{self.name}.hosts is not supported by platform '{platform}'"
         return filter_none(
             {
                 f"{platform}.use_rpc": self.enabled,
                 f"{platform}.rpc_hostname": self.hostname,
                 f"{platform}.rpc_port": self.port,
                 f"{platform}.rpc_key": self.key,
+                f"{platform}.rpc_hosts": self.hosts,
             }
         )
 
@@ -2296,11 +2531,16 @@ class GenRefData(FrontendFeature):  # TODO: use custom stage instead of LOAD
         "mode": "file",  # Allowed: file, model
         "file": "auto",  # Only relevant if mode=file
         "fmt": "npy",  # Allowed: npy, npz
+        "cache_dir": None,  # Only relevant if mode=model
     }
 
     def __init__(self, features=None, config=None):
         super().__init__("gen_ref_data", features=features, config=config)
 
+    @property
+    def cache_dir(self):
+        return self.config["cache_dir"]
+
     @property
     def mode(self):
         value = self.config["mode"]
@@ -2325,6 +2565,7 @@ class GenRefData(FrontendFeature):  # TODO: use custom stage instead of LOAD
             f"{frontend}.gen_ref_data_mode": self.mode,
             f"{frontend}.gen_ref_data_file": self.file,
             f"{frontend}.gen_ref_data_fmt": self.fmt,
+            **({f"{frontend}.ref_data_cache_dir": self.cache_dir} if self.cache_dir else {}),
         }
 
 
@@ -55,6 +55,7 @@ class Backend(ABC):
         self.artifacts = []
         self.supported_fmts = []
         self.tuner = None
+        self.output_dir = None  # Optional: directory where the default artifacts will be exported to (set by run)
 
     def __repr__(self):
         name = type(self).name
@@ -23,14 +23,7 @@ from .backend import TFLMBackend
 from mlonmcu.config import str2bool, str2list, str2dict
 from mlonmcu.flow.backend import main
 from mlonmcu.artifact import Artifact, ArtifactFormat
-
-
-# TODO: move to another place
-def make_hex_array(data):
-    out = ""
-    for x in data:
-        out += "0x{:02x}, ".format(x)
-    return out
+from mlonmcu.models.utils import bytes_to_hex_array
 
 
 class TFLMICodegen:
@@ -229,7 +222,7 @@ size_t {prefix}_outputs();
 
 """
         wrapper_content += """const unsigned char g_model_data[] ALIGN(16) = { """
-        wrapper_content += make_hex_array(model_data)
+        wrapper_content += bytes_to_hex_array(model_data)
         wrapper_content += """ };
 
 """
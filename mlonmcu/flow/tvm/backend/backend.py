@@ -16,6 +16,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import os
 import tempfile
 import tarfile
 from pathlib import Path
@@ -31,6 +32,7 @@ from .model_info import get_model_info, get_fallback_model_info, get_supported_f
 from mlonmcu.target.metrics import Metrics
 from mlonmcu.artifact import Artifact, ArtifactFormat
 from .python_utils import prepare_python_environment
+from . import tvmc_pool
 from .tvmc_utils import (
     get_target_tvmc_args,
     get_pass_config_tvmc_args,
@@ -73,6 +75,9 @@ class TVMBackend(Backend):
         "use_tuning_results": False,
         "tvmc_extra_args": [],  # Currently compile subcommand only!
         "tvmc_custom_script": None,
+        "tvmc_server": False,  # Reuse warm TVM worker processes instead of spawning a new interpreter
+        "tvmc_server_workers": None,  # Maximum number of warm TVM worker processes (per process)
+        "tvmc_server_timeout": None,  # Kill (and restart) a TVM worker if a request takes longer (in s)
         # See https://github.com/apache/tvm/blob/1115fd9bc261619ffa0539746ae0aebc46232dc6/python/tvm/autotvm/tophub.py
         "tophub_url": None,
         "num_threads": multiprocessing.cpu_count(),
@@ -288,6 +293,21 @@ class TVMBackend(Backend):
         value = self.config["print_outputs"]
         return str2bool(value)
 
+    @property
+    def tvmc_server(self):
+        value = self.config["tvmc_server"]
+        return str2bool(value)
+
+    @property
+    def tvmc_server_workers(self):
+        value = self.config["tvmc_server_workers"]
+        return int(value) if value is not None else None
+
+    @property
+    def tvmc_server_timeout(self):
+        value = self.config["tvmc_server_timeout"]
+        return float(value) if value is not None else None
+
     @property
     def use_tlcpack(self):
         value = self.config["tvm.use_tlcpack"]
@@ -404,6 +424,17 @@ class TVMBackend(Backend):
             return utils.execute(*pre, command, *args, live=self.print_outputs, env=env, cwd=cwd)
         else:
             if self.tvmc_custom_script is None:
+                if self.tvmc_server:
+                    return tvmc_pool.python_module(
+                        "tvm.driver.tvmc",
+                        command,
+                        *args,
+                        live=self.print_outputs,
+                        env=env,
+                        cwd=cwd,
+                        max_workers=self.tvmc_server_workers,
+                        timeout=self.tvmc_server_timeout,
+                    )
                 pre = ["-m", "tvm.driver.tvmc"]
             else:
                 pre = [self.tvmc_custom_script]
@@ -481,11 +512,16 @@ class TVMBackend(Backend):
         dump = self.dump
         if self.refresh_model_info or (self.generate_wrapper and not self.model_info) and "relay" not in dump:
             dump.append("relay")
-        with tempfile.TemporaryDirectory() as temp_dir:
+        # If the destination of the artifacts is known, the MLF is moved and unpacked there directly instead of
+        # passing the archive around in memory (which would have to be written and extracted again)
+        output_dir = Path(self.output_dir) if self.output_dir is not None and self.fmt == "mlf" else None
+        if output_dir is not None:
+            output_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=output_dir) as temp_dir:
             out_path = Path(temp_dir) / f"{self.prefix}.tar"
             out = self.invoke_tvmc_compile(out_path, dump=dump, cwd=temp_dir)
             if self.fmt == "mlf":
-                mlf_path = Path(temp_dir) / "mlf"
+                mlf_path = Path(temp_dir) / "mlf" if output_dir is None else output_dir
                 tarfile.open(out_path).extractall(mlf_path)
                 with open(mlf_path / "metadata.json", "r") as handle:
                     metadata_txt = handle.read()
@@ -496,16 +532,30 @@ class TVMBackend(Backend):
                         fmt=ArtifactFormat.TEXT,
                     )
                 )
-            with open(out_path, "rb") as handle:
-                data = handle.read()
+            if output_dir is not None:
+                tar_path = output_dir / f"{self.prefix}.tar"
+                os.replace(out_path, tar_path)
                 artifacts.append(
-                    Artifact(
+                    Artifact.from_file(
                         f"{self.prefix}.tar",
-                        raw=data,
-                        fmt=ArtifactFormat.SHARED_OBJECT if self.fmt == "so" else ArtifactFormat.MLF,
+                        tar_path,
+                        fmt=ArtifactFormat.MLF,
+                        lazy=True,
                         archive=True,
+                        extracted=output_dir,
                     )
                 )
+            else:
+                with open(out_path, "rb") as handle:
+                    data = handle.read()
+                    artifacts.append(
+                        Artifact(
+                            f"{self.prefix}.tar",
+                            raw=data,
+                            fmt=ArtifactFormat.SHARED_OBJECT if self.fmt == "so" else ArtifactFormat.MLF,
+                            archive=True,
+                        )
+                    )
             if "c" in dump:
                 with open(str(out_path) + ".c", "r") as handle:
                     mod_src = handle.read()
@@ -34,6 +34,8 @@ def get_autotuning_defaults():
         "visualize": False,
         "visualize_file": None,
         "visualize_live": False,
+        "database": None,  # Path to a shared tuning record database
+        "database_seed": True,  # Start tuning with the best known records from the database
     }
 
 
@@ -0,0 +1,175 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Persistent database for AutoTVM/AutoScheduler tuning records which is shared between runs and sessions."""
+import json
+import sqlite3
+import hashlib
+from pathlib import Path
+
+from mlonmcu.logging import get_logger
+
+logger = get_logger()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash TEXT UNIQUE NOT NULL,
+    mode TEXT NOT NULL,
+    context TEXT,
+    target TEXT NOT NULL,
+    workload TEXT NOT NULL,
+    cost REAL,
+    timestamp REAL,
+    line TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_lookup ON records (mode, context, target, workload, cost);
+"""
+
+
+def _hash(data):
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def parse_record(line):
+    """Extract (mode, target, workload_hash, cost, timestamp) from a single line of a tuning log.
+
+    The cost is None for failed measurements. Returns None for lines which are no valid records.
+    """
+    line = line.strip()
+    if len(line) == 0:
+        return None
+    try:
+        record = json.loads(line)
+        if "input" in record:  # AutoTVM (v0.2)
+            target, task_name, args, kwargs = record["input"][:4]
+            workload = json.dumps([task_name, args, kwargs], sort_keys=True)
+            costs, error_no, _, timestamp = record["result"][:4]
+            mode = "autotvm"
+        elif isinstance(record["i"][0], list):  # AutoScheduler
+            workload, target = record["i"][0][:2]
+            costs, error_no, _, timestamp = record["r"][:4]
+            mode = "autoscheduler"
+        else:  # AutoTVM (v0.1)
+            target = record["i"][0]
+            workload = json.dumps(record["i"][1:4], sort_keys=True)
+            costs, error_no, _, timestamp = record["r"][:4]
+            mode = "autotvm"
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+    cost = sum(costs) / len(costs) if error_no == 0 and len(costs) > 0 else None
+    return mode, str(target), _hash(str(workload)), cost, timestamp
+
+
+class TuningRecordDB:
+    """SQLite-backed store of tuning records indexed by tuner, context, target string and workload.
+
+    The context is an arbitrary string chosen by the caller (e.g. derived from the tvmc target arguments)
+    which allows to look up records before the TVM target string of a tuning session is known. A new
+    connection is used for every operation so that the database can be shared by threads and processes.
+    """
+
+    def __init__(self, path, timeout=60):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(SCHEMA)
+
+    def __repr__(self):
+        return f"TuningRecordDB({self.path})"
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=self.timeout)
+
+    def add_records(self, content, context=None):
+        """Insert all records in the given tuning log. Duplicates are ignored. Returns the number of new records."""
+        rows = []
+        for line in content.splitlines():
+            parsed = parse_record(line)
+            if parsed is None:
+                continue
+            mode, target, workload, cost, timestamp = parsed
+            line = line.strip()
+            rows.append((_hash(line), mode, context, target, workload, cost, timestamp, line))
+        if len(rows) == 0:
+            return 0
+        con = self._connect()
+        try:
+            with con:
+                before = con.total_changes
+                con.executemany(
+                    "INSERT OR IGNORE INTO records (hash, mode, context, target, workload, cost, timestamp, line)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                added = con.total_changes - before
+        finally:
+            con.close()
+        logger.debug("Added %d of %d tuning records to %s", added, len(rows), self.path)
+        return added
+
+    def _query(self, sql, args):
+        con = self._connect()
+        try:
+            return con.execute(sql, args).fetchall()
+        finally:
+            con.close()
+
+    @staticmethod
+    def _where(**kwargs):
+        conditions = ["cost IS NOT NULL"]
+        args = []
+        for key, value in kwargs.items():
+            if value is not None:
+                conditions.append(f"{key} = ?")
+                args.append(value)
+        return " AND ".join(conditions), args
+
+    def best_records(self, mode=None, context=None, target=None):
+        """Return the best known (successful) record for every workload as a tuning log."""
+        where, args = self._where(mode=mode, context=context, target=target)
+        partition = "PARTITION BY mode, target, workload"
+        rows = self._query(
+            f"SELECT line FROM (SELECT line, ROW_NUMBER() OVER ({partition} ORDER BY cost, id) AS rank,"
+            f" MIN(id) OVER ({partition}) AS first FROM records WHERE {where}) WHERE rank = 1 ORDER BY first",
+            args,
+        )
+        return "".join(line + "\n" for (line,) in rows)
+
+    def lookup(self, workload, target=None, mode=None):
+        """Return the best known record line and its cost for a single workload or None.
+
+        The workload is either an AutoScheduler workload key or a (task_name, args, kwargs) tuple for AutoTVM.
+        """
+        if not isinstance(workload, str):
+            workload = json.dumps(list(workload), sort_keys=True)
+        where, args = self._where(workload=_hash(workload), target=target, mode=mode)
+        rows = self._query(f"SELECT line, cost FROM records WHERE {where} ORDER BY cost LIMIT 1", args)
+        return rows[0] if len(rows) > 0 else None
+
+    def count(self, mode=None, context=None, target=None):
+        """Return the number of stored records."""
+        conditions, args = [], []
+        for key, value in {"mode": mode, "context": context, "target": target}.items():
+            if value is not None:
+                conditions.append(f"{key} = ?")
+                args.append(value)
+        where = " AND ".join(conditions) if len(conditions) > 0 else "1"
+        return self._query(f"SELECT COUNT(*) FROM records WHERE {where}", args)[0][0]
@@ -0,0 +1,245 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Pool of long-lived TVM worker processes to avoid paying the TVM import for every tvmc invocation."""
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import signal
+import threading
+import subprocess
+from pathlib import Path
+
+from mlonmcu.logging import get_logger
+
+logger = get_logger()
+
+SERVER_SCRIPT = Path(__file__).parent / "tvmc_server.py"
+DEFAULT_PRELOAD = ("tvm", "tvm.driver.tvmc")
+
+
+class TvmcWorker:
+    """A single server process (see tvmc_server.py) handling one request at a time."""
+
+    def __init__(self, env=None, preload=DEFAULT_PRELOAD):
+        self.process = subprocess.Popen(
+            [sys.executable, str(SERVER_SCRIPT), *preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+            text=True,
+            encoding="utf-8",
+            start_new_session=True,  # Allows to kill the forked children as well
+        )
+        self.next_id = 0
+        # Replies are received by a thread to be able to wait for them with a timeout
+        self.replies = queue.Queue()
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+        ready = self._receive()
+        if not ready.get("ready"):
+            self.close()
+            raise RuntimeError(f"Failed to start TVM worker: {ready.get('error')}")
+        self.pid = ready["pid"]
+
+    def _read(self):
+        for line in self.process.stdout:
+            self.replies.put(json.loads(line))
+        self.replies.put(None)
+
+    def _receive(self, timeout=None):
+        try:
+            reply = self.replies.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"TVM worker did not reply within {timeout} seconds")
+        if reply is None:
+            raise RuntimeError("TVM worker terminated unexpectedly")
+        return reply
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def request(self, module, args, cwd=None, timeout=None, line_func=None):
+        """Execute 'python -m module *args' in a fork of the worker. Returns the exit code and output.
+
+        If given, line_func is called for every line of output while the module is running. The worker is
+        killed if the request does not complete within timeout seconds.
+        """
+        request = {
+            "id": self.next_id,
+            "module": module,
+            "args": list(map(str, args)),
+            "cwd": cwd,
+            "stream": line_func is not None,
+        }
+        self.next_id += 1
+        self.process.stdin.write(json.dumps(request) + "\n")
+        self.process.stdin.flush()
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            try:
+                reply = self._receive(timeout=max(0, deadline - time.time()) if deadline is not None else None)
+            except TimeoutError:
+                self.kill()
+                raise TimeoutError(
+                    "The TVM worker did not complete within {} seconds! (CMD: `{}`)".format(
+                        timeout, " ".join(["python", "-m", module, *request["args"]])
+                    )
+                )
+            assert reply["id"] == request["id"]
+            if "line" in reply:
+                line_func(reply["line"])
+                continue
+            return reply["exit_code"], reply["output"]
+
+    def kill(self):
+        """Terminate the worker including the forked child handling the current request."""
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+
+    def close(self):
+        if self.alive:
+            try:
+                self.process.stdin.write(json.dumps({"shutdown": True}) + "\n")
+                self.process.stdin.flush()
+                self.process.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+
+
+class TvmcWorkerPool:
+    """Bounded pool of workers which share the same environment. Workers are spawned on demand."""
+
+    def __init__(self, env=None, preload=DEFAULT_PRELOAD, max_workers=None):
+        self.env = env
+        self.preload = tuple(preload)
+        self.max_workers = max_workers
+        self.idle = []
+        self.num_workers = 0
+        self.cond = threading.Condition()
+
+    def _acquire(self):
+        with self.cond:
+            while True:
+                while len(self.idle) > 0:
+                    worker = self.idle.pop()
+                    if worker.alive:
+                        return worker
+                    self.num_workers -= 1
+                if self.max_workers is None or self.num_workers < self.max_workers:
+                    self.num_workers += 1
+                    break
+                self.cond.wait()
+        try:
+            logger.debug("Starting TVM worker")
+            return TvmcWorker(env=self.env, preload=self.preload)
+        except Exception:
+            with self.cond:
+                self.num_workers -= 1
+                self.cond.notify()
+            raise
+
+    def _release(self, worker, broken=False):
+        with self.cond:
+            if broken:
+                self.num_workers -= 1
+            else:
+                self.idle.append(worker)
+            self.cond.notify()
+        if broken:
+            worker.close()
+
+    def run(self, module, *args, cwd=None, timeout=None, line_func=None):
+        worker = self._acquire()
+        try:
+            ret = worker.request(
+                module, args, cwd=None if cwd is None else str(cwd), timeout=timeout, line_func=line_func
+            )
+        except Exception:
+            # A new worker is started for the next request
+            self._release(worker, broken=True)
+            raise
+        self._release(worker)
+        return ret
+
+    def close(self):
+        with self.cond:
+            idle = self.idle
+            self.idle = []
+            self.num_workers -= len(idle)
+        for worker in idle:
+            worker.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_worker_pool(env=None, preload=DEFAULT_PRELOAD, max_workers=None):
+    """Return the (shared) pool for the given environment, i.e. TVM pythonpath, build dir and settings."""
+    # Workers (and their pipes) can not be shared with forked processes
+    key = (os.getpid(), tuple(preload), tuple(sorted(env.items())) if env is not None else None)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = TvmcWorkerPool(env=env, preload=preload)
+            _pools[key] = pool
+        if max_workers is not None:
+            pool.max_workers = int(max_workers)
+    return pool
+
+
+@atexit.register
+def shutdown_worker_pools():
+    with _pools_lock:
+        # Workers inherited from a parent process are left to their owner
+        pools = [pool for key, pool in _pools.items() if key[0] == os.getpid()]
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def python_module(
+    module,
+    *args,
+    env=None,
+    cwd=None,
+    live=False,
+    print_func=print,
+    preload=DEFAULT_PRELOAD,
+    max_workers=None,
+    timeout=None,
+):
+    """Replacement for utils.python("-m", module, *args) which runs the module in a warm TVM worker."""
+    logger.debug("- Executing (tvmc worker): %s %s", module, str(args))
+    pool = get_worker_pool(env=env, preload=preload, max_workers=max_workers)
+    exit_code, out = pool.run(module, *args, cwd=cwd, timeout=timeout, line_func=print_func if live else None)
+    if exit_code != 0 and not live:  # Live outputs were already printed
+        logger.error(out)
+    assert exit_code == 0, "The process returned an non-zero exit code {}! (CMD: `{}`)".format(
+        exit_code, " ".join(["python", "-m", module, *map(str, args)])
+    )
+    return out
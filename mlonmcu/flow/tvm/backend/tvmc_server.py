@@ -0,0 +1,135 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Standalone server which executes python modules (i.e. tvmc) in forked children of a warm interpreter.
+
+The server is started with the environment (PYTHONPATH,...) of the TVM installation, hence it must only
+depend on the standard library. The given modules are imported once at startup so that every request
+only pays for a fork() instead of a full interpreter start and TVM import.
+
+Protocol (JSON lines via stdin/stdout):
+    -> {"id": 0, "module": "tvm.driver.tvmc", "args": ["compile", ...], "cwd": "/path", "stream": false}
+    <- {"id": 0, "line": "..."}  (only if stream is set, once per line of output while the module is running)
+    <- {"id": 0, "exit_code": 0, "output": "..."}
+"""
+import os
+import sys
+import json
+import time
+import runpy
+import tempfile
+import importlib
+import traceback
+
+POLL_INTERVAL = 0.1
+
+
+def _run_child(request, out_fd):
+    os.dup2(out_fd, 1)
+    os.dup2(out_fd, 2)
+    code = 0
+    try:
+        if request.get("cwd"):
+            os.chdir(request["cwd"])
+        module = request["module"]
+        sys.argv = [module] + list(request.get("args", []))
+        runpy.run_module(module, run_name="__main__", alter_sys=True)
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    os._exit(code)
+
+
+def _read_new(fd, pos):
+    # pread does not move the file offset, which is shared with the (still writing) child
+    chunks = []
+    while True:
+        data = os.pread(fd, 65536, pos)
+        if not data:
+            return b"".join(chunks), pos
+        chunks.append(data)
+        pos += len(data)
+
+
+def _send(channel, message):
+    channel.write(json.dumps(message) + "\n")
+    channel.flush()
+
+
+def main():
+    # Keep the original stdout for the protocol and redirect everything else to stderr
+    channel = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+    error = None
+    for module in sys.argv[1:]:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            error = f"Failed to import {module}: {e}"
+            break
+    _send(channel, {"ready": error is None, "error": error, "pid": os.getpid()})
+    if error is not None:
+        return 1
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request.get("shutdown"):
+            break
+        with tempfile.TemporaryFile() as out:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                _run_child(request, out.fileno())
+            stream = request.get("stream", False)
+            pos = 0
+            pending = b""
+            while True:
+                done, status = os.waitpid(pid, os.WNOHANG if stream else 0)
+                if stream:
+                    # Forward the complete lines written so far
+                    new, pos = _read_new(out.fileno(), pos)
+                    lines = (pending + new).split(b"\n")
+                    pending = lines.pop()
+                    if done and len(pending) > 0:
+                        lines.append(pending)
+                    for line in lines:
+                        _send(channel, {"id": request.get("id"), "line": line.decode("utf-8", errors="replace")})
+                if done:
+                    break
+                time.sleep(POLL_INTERVAL)
+            out.seek(0)
+            output = out.read().decode("utf-8", errors="replace")
+        # os.waitstatus_to_exitcode is not available before Python 3.9
+        exit_code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+        _send(channel, {"id": request.get("id"), "exit_code": exit_code, "output": output})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
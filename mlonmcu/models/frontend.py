@@ -16,9 +16,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import os
 import re
 import time
+import hashlib
 import tempfile
+import threading
 import multiprocessing
 from pathlib import Path
 from abc import ABC, abstractmethod
@@ -73,6 +76,7 @@ class Frontend(ABC):
         "gen_ref_labels_mode": None,
         "gen_ref_labels_file": None,
         "gen_ref_labels_fmt": None,
+        "ref_data_cache_dir": None,  # Directory for caching the outputs of the reference inference
     }
 
     REQUIRED = set()
@@ -168,9 +172,45 @@ class Frontend(ABC):
         assert value in ["npy", "npz", "txt", "csv"]
         return value
 
+    @property
+    def ref_data_cache_dir(self):
+        value = self.config["ref_data_cache_dir"]
+        return Path(value) if value else None
+
     def inference(self, model: Model, input_data: Dict[str, np.array]):
         raise NotImplementedError
 
+    def batch_inference(self, model: Model, inputs_data: List[Dict[str, np.array]], **kwargs):
+        """Run the reference inference for a list of samples. Frontends may override this to share state."""
+        return [self.inference(model, input_data, **kwargs) for input_data in inputs_data]
+
+    def cached_inference(self, model: Model, inputs_data: List[Dict[str, np.array]], **kwargs):
+        """Wrapper for batch_inference which reuses the outputs of earlier runs with the same model and inputs."""
+        cache_dir = self.ref_data_cache_dir
+        if cache_dir is None:
+            return self.batch_inference(model, inputs_data, **kwargs)
+        hasher = hashlib.sha256()
+        hasher.update(f"{self.name};{sorted(kwargs.items())}".encode())
+        for path in model.paths:
+            with open(path, "rb") as handle:
+                for chunk in iter(lambda: handle.read(1 << 20), b""):
+                    hasher.update(chunk)
+        for input_data in inputs_data:
+            for name in sorted(input_data):
+                arr = np.ascontiguousarray(input_data[name])
+                hasher.update(f"{name};{arr.dtype};{arr.shape}".encode())
+                hasher.update(arr.tobytes())
+        cache_file = cache_dir / f"{hasher.hexdigest()}.npy"
+        if cache_file.is_file():
+            logger.debug("Using cached reference outputs: %s", cache_file)
+            return list(np.load(cache_file, allow_pickle=True))
+        outputs_data = self.batch_inference(model, inputs_data, **kwargs)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # Write to temporary file first to make sure that parallel readers never see partial entries
+        with utils.atomic_write(cache_file, "wb") as handle:
+            np.save(handle, outputs_data, allow_pickle=True)
+        return outputs_data
+
     def extract_model_info(self, model: Model):
         raise NotImplementedError
 
@@ -404,11 +444,7 @@ class Frontend(ABC):
         outputs_data = []
         if self.gen_ref_data_mode == "model":
             assert len(inputs_data) > 0
-            for i, input_data in enumerate(inputs_data):
-                # input("321?")
-                output_data = self.inference(model, input_data, quant=False, dequant=True)
-                outputs_data.append(output_data)
-                # input("321!")
+            outputs_data = self.cached_inference(model, inputs_data, quant=False, dequant=True)
 
         elif self.gen_ref_data_mode == "file":
             if self.gen_ref_data_file == "auto":
@@ -478,8 +514,7 @@ class Frontend(ABC):
         labels = []
         if self.gen_ref_labels_mode == "model":
             assert len(inputs_data) > 0
-            for i, input_data in enumerate(inputs_data):
-                output_data = self.inference(model, input_data, quant=False, dequant=True)
+            for output_data in self.cached_inference(model, inputs_data, quant=False, dequant=True):
                 assert len(output_data) == 1, "Does not support multi-output classification"
                 output_data = output_data[list(output_data)[0]]
                 top_label = np.argmax(output_data)
@@ -952,6 +987,19 @@ class TfLiteFrontend(SimpleFrontend):
             features=features,
             config=config,
         )
+        self._interpreters = {}
+        self._interpreter_lock = threading.Lock()
+
+    def __getstate__(self):
+        # Interpreters and locks can not be copied or pickled (i.e. when copying runs)
+        state = self.__dict__.copy()
+        state["_interpreters"] = {}
+        del state["_interpreter_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._interpreter_lock = threading.Lock()
 
     @property
     def visualize_enable(self):
@@ -1024,59 +1072,69 @@ class TfLiteFrontend(SimpleFrontend):
             output_quant_details,
         )
 
-    def inference(self, model: Model, input_data: Dict[str, np.array], quant=False, dequant=False, verbose=False):
+    def get_interpreter(self, model: Model):
+        """Return the (cached) interpreter with allocated tensors for the given model."""
         import tensorflow as tf
 
         model_path = str(model.paths[0])
-        interpreter = tf.lite.Interpreter(model_path=model_path)
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
-        interpreter.allocate_tensors()
-        if verbose:
-            print()
-            print("Input details:")
-            print(input_details)
-            print()
-            print("Output details:")
-            print(output_details)
-            print()
-        assert len(input_details) == 1, "Multi-inputs not yet supported"
-        input_type = input_details[0]["dtype"]
-        input_name = input_details[0]["name"]
-        input_shape = input_details[0]["shape"]
-        assert input_name in input_data, f"Input {input_name} fot found in data"
-        np_features = input_data[input_name]
-        if quant and input_type == np.int8:
-            input_scale, input_zero_point = input_details[0]["quantization"]
+        key = (model_path, os.stat(model_path).st_mtime_ns)
+        if key not in self._interpreters:
+            interpreter = tf.lite.Interpreter(model_path=model_path)
+            interpreter.allocate_tensors()
+            self._interpreters[key] = interpreter
+        return self._interpreters[key]
+
+    def inference(self, model: Model, input_data: Dict[str, np.array], quant=False, dequant=False, verbose=False):
+        with self._interpreter_lock:  # Interpreters are not thread-safe
+            interpreter = self.get_interpreter(model)
+            input_details = interpreter.get_input_details()
+            output_details = interpreter.get_output_details()
             if verbose:
-                print("Input scale:", input_scale)
-                print("Input zero point:", input_zero_point)
                 print()
-            np_features = (np_features / input_scale) + input_zero_point
-            np_features = np.around(np_features)
-        np_features = np_features.astype(input_type)
-        np_features = np_features.reshape(input_shape)
-        interpreter.set_tensor(input_details[0]["index"], np_features)
-        interpreter.invoke()
-        output = interpreter.get_tensor(output_details[0]["index"])
-
-        # If the output type is int8 (quantized model), rescale data
-        assert len(output_details) == 1, "Multi-outputs not yet supported"
-        output_type = output_details[0]["dtype"]
-        output_name = output_details[0]["name"]
-        if dequant and output_type == np.int8:
-            output_scale, output_zero_point = output_details[0]["quantization"]
-            if verbose:
-                print("Raw output scores:", output)
-                print("Output scale:", output_scale)
-                print("Output zero point:", output_zero_point)
+                print("Input details:")
+                print(input_details)
+                print()
+                print("Output details:")
+                print(output_details)
                 print()
-            output = output_scale * (output.astype(np.float32) - output_zero_point)
+            for details in input_details:
+                input_type = details["dtype"]
+                input_name = details["name"]
+                input_shape = details["shape"]
+                assert input_name in input_data, f"Input {input_name} fot found in data"
+                np_features = input_data[input_name]
+                if quant and input_type == np.int8:
+                    input_scale, input_zero_point = details["quantization"]
+                    if verbose:
+                        print("Input scale:", input_scale)
+                        print("Input zero point:", input_zero_point)
+                        print()
+                    np_features = (np_features / input_scale) + input_zero_point
+                    np_features = np.around(np_features)
+                np_features = np_features.astype(input_type)
+                np_features = np_features.reshape(input_shape)
+                interpreter.set_tensor(details["index"], np_features)
+            interpreter.invoke()
+            outputs = {}
+            for details in output_details:
+                output = interpreter.get_tensor(details["index"])
+                # If the output type is int8 (quantized model), rescale data
+                output_type = details["dtype"]
+                output_name = details["name"]
+                if dequant and output_type == np.int8:
+                    output_scale, output_zero_point = details["quantization"]
+                    if verbose:
+                        print("Raw output scores:", output)
+                        print("Output scale:", output_scale)
+                        print("Output zero point:", output_zero_point)
+                        print()
+                    output = output_scale * (output.astype(np.float32) - output_zero_point)
+                outputs[output_name] = output
 
         if verbose:
             # Print the results of inference
-            print("Inference output:", output, type(output))
-        return {output_name: output}
+            print("Inference output:", outputs)
+        return outputs
 
     def produce_artifacts(self, model):
         assert len(self.input_formats) == len(model.paths) == 1
@@ -0,0 +1,138 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""On-disk index of the model directories used to speed up the model lookup."""
+import os
+import json
+from pathlib import Path
+
+import yaml
+
+from mlonmcu.logging import get_logger
+from mlonmcu.setup.utils import atomic_write
+
+logger = get_logger()
+
+INDEX_VERSION = 1
+
+
+class ModelIndex:
+    """Cache for the directory listings and model group definitions found in the model directories.
+
+    Every entry is keyed by the modification time of the respective directory (or file) and only refreshed
+    if it has changed since the last lookup. This avoids repeated directory listings and probing of
+    metadata files, which is especially slow on network file systems.
+
+    Attributes
+    ----------
+    path : Path
+        Location of the index file. The index is only kept in memory if None.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path is not None else None
+        self.listings = {}
+        self.groups = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        if self.path is not None and self.path.is_file():
+            self.load()
+
+    def __repr__(self):
+        return f"ModelIndex({self.path})"
+
+    def load(self):
+        """Restore the index from disk. Incompatible or corrupted index files are ignored."""
+        try:
+            with open(self.path, "r") as handle:
+                data = json.load(handle)
+        except (OSError, ValueError) as err:
+            logger.warning("Ignoring invalid model index %s: %s", self.path, err)
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        self.listings = data.get("listings", {})
+        self.groups = data.get("groups", {})
+
+    def save(self):
+        """Write the index to disk if it was modified."""
+        if self.path is None or not self.dirty:
+            return
+        data = {"version": INDEX_VERSION, "listings": self.listings, "groups": self.groups}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to temporary file first to make sure that parallel readers never see partial files
+        with atomic_write(self.path, "w") as handle:
+            json.dump(data, handle)
+        self.dirty = False
+
+    def get_listing(self, directory):
+        """Return the sorted names of subdirectories and files in the given directory.
+
+        Returns
+        -------
+        tuple
+            A (dirs, files) tuple or None if the directory does not exist.
+        """
+        key = str(directory)
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            if self.listings.pop(key, None) is not None:
+                self.dirty = True
+            return None
+        entry = self.listings.get(key)
+        if entry is not None and entry["mtime"] == mtime:
+            self.hits += 1
+            return entry["dirs"], entry["files"]
+        self.misses += 1
+        dirs, files = [], []
+        with os.scandir(directory) as it:
+            for item in it:
+                (dirs if item.is_dir() else files).append(item.name)
+        entry = {"mtime": mtime, "dirs": sorted(dirs), "files": sorted(files)}
+        self.listings[key] = entry
+        self.dirty = True
+        return entry["dirs"], entry["files"]
+
+    def get_groups(self, path):
+        """Return the parsed contents of a model groups YAML file."""
+        key = str(path)
+        mtime = os.stat(path).st_mtime_ns
+        entry = self.groups.get(key)
+        if entry is not None and entry["mtime"] == mtime:
+            self.hits += 1
+            return entry["content"]
+        self.misses += 1
+        with open(path, "r") as yamlfile:
+            try:
+                content = yaml.safe_load(yamlfile)
+            except yaml.YAMLError as err:
+                raise RuntimeError("Could not open YAML file") from err
+        content = content if content is not None else {}
+        self.groups[key] = {"mtime": mtime, "content": content}
+        self.dirty = True
+        return content
+
+
+def get_model_index(context):
+    """Get the persistent model index for the environment (located in the temp directory if available)."""
+    paths = context.environment.paths if context else {}
+    if "temp" not in paths:
+        return ModelIndex()
+    return ModelIndex(paths["temp"].path / "models" / "index.json")
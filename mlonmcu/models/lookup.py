@@ -18,12 +18,11 @@
 #
 from pathlib import Path
 import os
-import glob
 from itertools import product
-import yaml
 
 from .model import Model, ModelFormats
 from .group import ModelGroup
+from .index import ModelIndex, get_model_index
 
 from mlonmcu.logging import get_logger
 
@@ -36,7 +35,7 @@ def get_model_directories(context):
     return dirs
 
 
-def find_metadata(directory, model_name=None):
+def find_metadata(directory, model_name=None, files=None):
     possible_basenames = ["model", "metadata", "definition"]
     possible_extensions = ["yaml", "yml"]
     directory = Path(directory)
@@ -49,41 +48,46 @@ def find_metadata(directory, model_name=None):
     for combination in product(possible_basenames, possible_extensions):
         filename = f"{combination[0]}.{combination[1]}"
         fullpath = directory / filename
-        if fullpath.is_file():
+        # If the directory listing is known, there is no need to probe every file
+        if (filename in files) if files is not None else fullpath.is_file():
             return fullpath
             # logger.debug("Found match. Ignoring other files")
     return None
 
 
-def list_models(directory, depth=1, formats=None, config=None):  # TODO: get config from environment or cmdline!
+def list_models(directory, depth=1, formats=None, config=None, index=None):  # TODO: get config from environment!
     config = config if config is not None else {}
     formats = formats if formats else [ModelFormats.TFLITE]
     assert len(formats) > 0, "No formats provided for model lookup"
+    index = index if index is not None else ModelIndex()
     models = []
     for fmt in formats:
         if depth != 1:
             raise NotImplementedError  # TODO: implement for arm ml zoo
             # define all allowed extensions + search recusively (with limit?)
             # list(Path(".").rglob(f"*.{ext}")) for ext in allowed_ext
-        if not os.path.isdir(directory):
+        listing = index.get_listing(directory)
+        if listing is None:
             logger.debug("Not a directory: %s", str(directory))
             return []
-        subdirs = [Path(directory) / o for o in os.listdir(directory) if os.path.isdir(os.path.join(directory, o))]
-        for subdir in subdirs:
-            dirname = subdir.name
+        subdirs, _ = listing
+        for dirname in subdirs:
             if dirname.startswith("."):
                 # logger.debug("Skipping hidden directory: %s", str(dirname))
                 continue
+            subdir = Path(directory) / dirname
+            sublisting = index.get_listing(subdir)
+            if sublisting is None:
+                continue
+            _, files = sublisting
             exts = fmt.extensions
             for ext in exts:
-                main_model = subdir / f"{dirname}.{ext}"
-                if os.path.exists(main_model):
-                    main_model = f"{dirname}/{dirname}"
-                else:
-                    main_model = None
+                main_model = f"{dirname}/{dirname}" if f"{dirname}.{ext}" in files else None
                 submodels = []
-                for filename in glob.glob(str(subdir / f"*.{ext}")):
-                    basename = "".join(Path(filename).name.split(".")[:-1])
+                for filename in files:
+                    if filename.startswith(".") or not filename.endswith(f".{ext}"):
+                        continue
+                    basename = "".join(filename.split(".")[:-1])
                     submodels.append(f"{dirname}/{basename}")
 
                 if len(submodels) == 1:
@@ -94,7 +98,7 @@ def list_models(directory, depth=1, formats=None, config=None):  # TODO: get con
 
                     main_base = main_model.split("/")[-1]
                     main_config = {}
-                    main_metadata_path = find_metadata(Path(directory) / dirname, model_name=main_base)
+                    main_metadata_path = find_metadata(subdir, model_name=main_base, files=files)
                     if main_metadata_path:
                         main_config[f"{main_base}.metadata_path"] = main_metadata_path
                     main_config.update(config)
@@ -112,7 +116,7 @@ def list_models(directory, depth=1, formats=None, config=None):  # TODO: get con
                 for submodel in submodels:
                     sub_base = submodel.split("/")[-1]
                     submodel_config = {}
-                    submodel_metadata_path = find_metadata(Path(directory) / dirname, model_name=sub_base)
+                    submodel_metadata_path = find_metadata(subdir, model_name=sub_base, files=files)
                     if submodel_metadata_path:
                         submodel_config[f"{sub_base}.metadata_path"] = submodel_metadata_path
                     submodel_config.update(config)
@@ -128,66 +132,61 @@ def list_models(directory, depth=1, formats=None, config=None):  # TODO: get con
     return models
 
 
-def list_modelgroups(directory):
-    if not os.path.isdir(directory):
+def list_modelgroups(directory, index=None):
+    index = index if index is not None else ModelIndex()
+    listing = index.get_listing(directory)
+    if listing is None:
         logger.debug("Not a directory: %s", str(directory))
         return []
+    _, files = listing
     groups = []
     directory = Path(directory)
     possible_basenames = ["modelgroups", "groups"]
     possible_extensions = ["yaml", "yml"]
     for combination in product(possible_basenames, possible_extensions):
         filename = f"{combination[0]}.{combination[1]}"
-        fullpath = directory / filename
-        if fullpath.is_file():
+        if filename in files:
             logger.debug("Found match. Ignoring other files")
-            with open(fullpath, "r") as yamlfile:
-                try:
-                    content = yaml.safe_load(yamlfile)
-                    for groupname, groupmodels in content.items():
-                        assert isinstance(groupmodels, list), "Modelgroups should be defined as a YAML list"
-                        modelgroup = ModelGroup(groupname, groupmodels)
-                        groups.append(modelgroup)
-                except yaml.YAMLError as err:
-                    raise RuntimeError("Could not open YAML file") from err
+            content = index.get_groups(directory / filename)
+            for groupname, groupmodels in content.items():
+                assert isinstance(groupmodels, list), "Modelgroups should be defined as a YAML list"
+                modelgroup = ModelGroup(groupname, groupmodels)
+                groups.append(modelgroup)
             break
     return groups
 
 
-def lookup_models_and_groups(directories, formats, config=None):
+def lookup_models_and_groups(directories, formats, config=None, index=None):
+    index = index if index is not None else ModelIndex()
     all_models = []
     all_groups = []
     duplicates = {}
     group_duplicates = {}
+    model_names = set()
+    group_names = set()
     for directory in directories:
-        models = list_models(directory, formats=formats, config=config)
-        if len(all_models) == 0:
-            all_models = models
-        else:
-            all_model_names = [m.name for m in all_models]
-            for model in models:
-                name = model.name
-                if name in all_model_names:
-                    if name in duplicates:
-                        duplicates[name] += 1
-                    else:
-                        duplicates[name] = 1
-                else:
-                    all_models.append(model)
-        groups = list_modelgroups(directory)
-        if len(all_groups) == 0:
-            all_groups = groups
-        else:
-            all_group_names = [g.name for g in all_groups]
-            for group in groups:
-                name = group.name
-                if name in all_group_names:
-                    if name in group_duplicates:
-                        group_duplicates[name] += 1
-                    else:
-                        group_duplicates[name] = 1
-                else:
-                    all_groups.append(group)
+        # Models and groups with the same name in a later directory are shadowed by earlier ones
+        models = list_models(directory, formats=formats, config=config, index=index)
+        new_models = []
+        for model in models:
+            name = model.name
+            if name in model_names:
+                duplicates[name] = duplicates.get(name, 0) + 1
+            else:
+                new_models.append(model)
+        all_models.extend(new_models)
+        model_names.update(model.name for model in new_models)
+        groups = list_modelgroups(directory, index=index)
+        new_groups = []
+        for group in groups:
+            name = group.name
+            if name in group_names:
+                group_duplicates[name] = group_duplicates.get(name, 0) + 1
+            else:
+                new_groups.append(group)
+        all_groups.extend(new_groups)
+        group_names.update(group.name for group in new_groups)
+    index.save()
 
     all_models = sorted(all_models, key=lambda x: x.name)
 
@@ -224,10 +223,10 @@ def print_models(models, duplicates=[], detailed=False):
 
 def print_groups(groups, all_models=[], duplicates=[], detailed=False):
     print("Groups:")
+    all_model_names = {m.name for m in all_models}
     for group in groups:
         name = group.name
         models = group.models
-        all_model_names = [m.name for m in all_models]
         for model in models:
             if model in all_model_names:
                 # Groupname conflicts with modelname
@@ -252,7 +251,9 @@ def print_summary(context, detailed=False):
 
     directories = get_model_directories(context)
 
-    models, groups, duplicates, group_duplicates = lookup_models_and_groups(directories, formats)
+    models, groups, duplicates, group_duplicates = lookup_models_and_groups(
+        directories, formats, index=get_model_index(context)
+    )
 
     print("Models Summary\n")
     print_paths(directories)
@@ -272,10 +273,14 @@ def lookup_models(names, frontends=None, config=None, context=None):
 
     if context:
         directories = get_model_directories(context)
-        models, _, _, _ = lookup_models_and_groups(directories, allowed_fmts, config=config)
+        models, _, _, _ = lookup_models_and_groups(
+            directories, allowed_fmts, config=config, index=get_model_index(context)
+        )
     else:
         models = []
-    model_names = [model.name for model in models]
+    models_by_name = {}
+    for model in models:
+        models_by_name.setdefault(model.name, model)
 
     hints = []
     for name in names:
@@ -295,10 +300,9 @@ def lookup_models(names, frontends=None, config=None, context=None):
             hints.append(hint)
         else:
             assert context is not None, "Context is required for passing models by name"
-            assert len(model_names) > 0, "List of available models is empty"
-            assert name in model_names, f"Could not find a model matching the name: {name}"
-            index = model_names.index(name)
-            hint = models[index]
+            assert len(models_by_name) > 0, "List of available models is empty"
+            assert name in models_by_name, f"Could not find a model matching the name: {name}"
+            hint = models_by_name[name]
             hints.append(hint)
 
     return hints
@@ -308,15 +312,17 @@ def apply_modelgroups(models, context=None):
     assert context is not None
     directories = get_model_directories(context)
 
+    index = get_model_index(context)
     groups = {}
     for directory in directories:
-        for group in list_modelgroups(directory):
+        for group in list_modelgroups(directory, index=index):
             if group.name in groups and groups[group.name] != group.models:
                 raise RuntimeError(
                     f"The model group '{group.name}' has conflicting definitions. Used the following directories:"
                     f" {directories}"
                 )
             groups[group.name] = group.models
+    index.save()
 
     out_models = []
     for model in models:
@@ -21,21 +21,41 @@ import numpy as np
 from pathlib import Path
 
 
+# Every byte is formatted as "0x??, " (6 characters) using a lookup table
+_HEX_TABLE = np.frombuffer("".join(f"0x{x:02x}, " for x in range(256)).encode("ascii"), dtype=np.uint8).reshape(256, 6)
+
+
+def bytes_to_hex_array(data):
+    """Format the given bytes as body of a C array initializer (i.e. '0x01, 0x02, ')."""
+    return _HEX_TABLE[np.frombuffer(data, dtype=np.uint8)].tobytes().decode("ascii")
+
+
+def make_incbin(symbol, path, section=".rodata", align=16):
+    """Return a top-level asm statement which links the contents of a binary file as (global) symbol.
+
+    Compared to huge C array literals, this avoids that the compiler has to parse the data.
+    """
+    path = str(path)
+    assert '"' not in path and "\\" not in path, f"Unsupported path for .incbin: {path}"
+    lines = [
+        f".section {section}",
+        f".balign {align}",
+        f".global {symbol}",
+        f"{symbol}:",
+        f'.incbin \\"{path}\\"',
+        ".previous",
+    ]
+    return "__asm__(\n" + "".join(f'    "{line}\\n"\n' for line in lines) + ");\n"
+
+
 def make_hex_array(filename, mode="bin"):
-    out = ""
     if mode == "auto":
         _, ext = os.path.splitext(filename)
         assert len(ext) > 1, "Could not detect format because of missing file extension"
         mode = ext[1:]
     if mode == "bin":
         with open(filename, "rb") as f:
-            data = f.read(1)
-            length = 0
-            while data:
-                length += 1
-                out += "0x" + data.hex() + ", "
-                data = f.read(1)
-            assert length > 0, "Data can not be empty"
+            byte_data = f.read()
     elif mode in ["npy", "npz"]:
         data = np.load(filename)
         # TODO: figure out endianess
@@ -44,11 +64,10 @@ def make_hex_array(filename, mode="bin"):
             assert len(files) == 1
             data = data[files[0]]
         byte_data = data.tobytes()
-        assert len(byte_data) > 0, "Data can not be empty"
-        out = ", ".join(["0x{:02x}".format(x) for x in byte_data] + [""])
     else:
         raise RuntimeError(f"Unsupported mode: {mode}")
-    return out
+    assert len(byte_data) > 0, "Data can not be empty"
+    return bytes_to_hex_array(byte_data)
 
 
 def fill_data_source(in_bufs, out_bufs):
@@ -96,6 +115,27 @@ def fill_data_source_inputs_only(in_bufs):
     return out
 
 
+def fill_data_source_inputs_only_incbin(in_files):
+    """Variant of fill_data_source_inputs_only for buffers given as (path, size) of binary files."""
+    out = "#include <stddef.h>\n"
+    out += "const int num_data_buffers_in = " + str(sum([len(files) for files in in_files])) + ";\n"
+    names = []
+    sizes = []
+    for i, files in enumerate(in_files):
+        for j, (path, size) in enumerate(files):
+            name = "data_buffer_in_" + str(i) + "_" + str(j)
+            out += make_incbin(name, path)
+            names.append(name)
+            sizes.append(str(size))
+    out += '#ifdef __cplusplus\nextern "C" {\n#endif\n'
+    for name in names:
+        out += "extern const unsigned char " + name + "[];\n"
+    out += "#ifdef __cplusplus\n}\n#endif\n"
+    out += "const unsigned char *const data_buffers_in[] = {" + "".join(name + ", " for name in names) + "};\n"
+    out += "const size_t data_size_in[] = {" + "".join(size + ", " for size in sizes) + "};\n"
+    return out
+
+
 def lookup_data_buffers(input_paths, output_paths):
     assert len(input_paths) > 0
     legacy = False
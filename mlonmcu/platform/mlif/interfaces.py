@@ -17,7 +17,9 @@
 # limitations under the License.
 #
 """MLIF Interfaces"""
-from mlonmcu.models.utils import fill_data_source_inputs_only
+from pathlib import Path
+
+from mlonmcu.models.utils import bytes_to_hex_array, fill_data_source_inputs_only, fill_data_source_inputs_only_incbin
 
 MAX_BATCH_SIZE = int(1e6)
 DEFAULT_BATCH_SIZE = 10
@@ -48,14 +50,27 @@ int mlif_num_outputs();
 """
 
 
-def get_top_rom(inputs_data):
+def get_top_rom(inputs_data, embedding="array", blob_dir=None):
+    if embedding == "incbin":
+        assert blob_dir is not None, "Embedding data via .incbin requires a directory for the binary files"
+        Path(blob_dir).mkdir(parents=True, exist_ok=True)
+        in_files = []
+        for i, ins_data in enumerate(inputs_data):
+            temp = []
+            for j, in_data in enumerate(ins_data.values()):
+                blob_file = Path(blob_dir) / f"data_buffer_in_{i}_{j}.bin"
+                byte_data = in_data.tobytes()
+                with open(blob_file, "wb") as f:
+                    f.write(byte_data)
+                temp.append((blob_file.resolve(), len(byte_data)))
+            in_files.append(temp)
+        return fill_data_source_inputs_only_incbin(in_files)
+    assert embedding == "array", f"Unsupported data embedding: {embedding}"
     in_bufs = []
     for i, ins_data in enumerate(inputs_data):
         temp = []
         for j, in_data in enumerate(ins_data.values()):
-            byte_data = in_data.tobytes()
-            temp2 = ", ".join(["0x{:02x}".format(x) for x in byte_data] + [""])
-            temp.append(temp2)
+            temp.append(bytes_to_hex_array(in_data.tobytes()))
         in_bufs.append(temp)
 
     return fill_data_source_inputs_only(in_bufs)
@@ -160,10 +175,22 @@ def get_process_outputs_stdout_raw():
 
 
 class ModelSupport:
-    def __init__(self, in_interface, out_interface, model_info, target=None, batch_size=None, inputs_data=None):
+    def __init__(
+        self,
+        in_interface,
+        out_interface,
+        model_info,
+        target=None,
+        batch_size=None,
+        inputs_data=None,
+        embedding="array",
+        blob_dir=None,
+    ):
         self.model_info = model_info
         self.target = target
         self.inputs_data = inputs_data
+        self.embedding = embedding
+        self.blob_dir = blob_dir
         self.in_interface = in_interface
         self.out_interface = out_interface
         self.in_interface, self.batch_size = self.select_set_inputs_interface(in_interface, batch_size)
@@ -209,7 +236,7 @@ class ModelSupport:
 
     def generate_top(self):
         if self.in_interface == "rom":
-            return get_top_rom(self.inputs_data)
+            return get_top_rom(self.inputs_data, embedding=self.embedding, blob_dir=self.blob_dir)
         return ""
 
     def generate_bottom(self):
@@ -94,6 +94,7 @@ class MlifPlatform(CompilePlatform, TargetPlatform):
         "get_outputs_interface": None,
         "get_outputs_fmt": None,
         "batch_size": None,
+        "data_embedding": "array",  # Embed input data in model support code as C array or via .incbin
         "model_support_file": None,
         "model_support_dir": None,
         "model_support_lib": None,
@@ -145,6 +146,12 @@ class MlifPlatform(CompilePlatform, TargetPlatform):
         value = self.config["get_outputs_interface"]
         return value
 
+    @property
+    def data_embedding(self):
+        value = self.config["data_embedding"]
+        assert value in ["array", "incbin"], f"Unsupported data_embedding: {value}"
+        return value
+
     @property
     def get_outputs_fmt(self):
         value = self.config["get_outputs_fmt"]  # TODO: use
@@ -480,6 +487,8 @@ class MlifPlatform(CompilePlatform, TargetPlatform):
                 target=target,
                 batch_size=batch_size,
                 inputs_data=inputs_data,
+                embedding=self.data_embedding,
+                blob_dir=self.build_dir,
             )
             code = model_support.generate()
             code_artifact = Artifact(
@@ -576,42 +585,44 @@ class MlifPlatform(CompilePlatform, TargetPlatform):
         asmdump_file = self.build_dir / "dumps" / "generic_mlonmcu.dump"  # TODO: optional
         srcdump_file = self.build_dir / "dumps" / "generic_mlonmcu.srcdump"  # TODO: optional
 
-        # TODO: just use path instead of raw data?
-        with open(elf_file, "rb") as handle:
-            data = handle.read()
-            artifact = Artifact("generic_mlonmcu", raw=data, fmt=ArtifactFormat.RAW)
-            artifacts.insert(0, artifact)  # First artifact should be the ELF
+        # Large files (i.e. dumps) are only read on demand unless the build directory is temporary
+        lazy = self.tempdir is None
+        if lazy:
+            # The build directory is reused (i.e. for every sub of a run), hence the outputs need a unique location
+            outputs_dir = self.build_dir / "outputs"
+            outputs_dir.mkdir(exist_ok=True)
+            out_dir = Path(tempfile.mkdtemp(dir=outputs_dir))
+
+        def _from_file(name, path, **kwargs):
+            if lazy:
+                dest = out_dir / name
+                utils.clone_file(path, dest, link=False)  # Hardlinks would be overwritten by the next build
+                path = dest
+            return Artifact.from_file(name, path, lazy=lazy, **kwargs)
+
+        artifact = _from_file("generic_mlonmcu", elf_file, fmt=ArtifactFormat.RAW)
+        artifacts.insert(0, artifact)  # First artifact should be the ELF
         # for cv32e40p
         if hex_file.is_file():
-            with open(hex_file, "rb") as handle:
-                data = handle.read()
-                artifact = Artifact("generic_mlonmcu.hex", raw=data, fmt=ArtifactFormat.RAW)
-                artifacts.insert(1, artifact)
+            artifact = _from_file("generic_mlonmcu.hex", hex_file, fmt=ArtifactFormat.RAW)
+            artifacts.insert(1, artifact)
         # only for vicuna
         if path_file.is_file():
-            with open(path_file, "r") as handle:
-                data = handle.read()
-                artifact = Artifact("generic_mlonmcu.path", content=data, fmt=ArtifactFormat.TEXT)
-                artifacts.insert(1, artifact)
+            artifact = _from_file("generic_mlonmcu.path", path_file, fmt=ArtifactFormat.TEXT)
+            artifacts.insert(1, artifact)
         if map_file.is_file():
-            with open(map_file, "r") as handle:
-                data = handle.read()
-                artifact = Artifact("generic_mlonmcu.map", content=data, fmt=ArtifactFormat.TEXT)
-                artifacts.append(artifact)
+            artifact = _from_file("generic_mlonmcu.map", map_file, fmt=ArtifactFormat.TEXT)
+            artifacts.append(artifact)
         if asmdump_file.is_file():
-            with open(asmdump_file, "r") as handle:
-                data = handle.read()
-                artifact = Artifact(
-                    "generic_mlonmcu.dump", content=data, fmt=ArtifactFormat.TEXT, flags=(self.toolchain,)
-                )
-                artifacts.append(artifact)
+            artifact = _from_file(
+                "generic_mlonmcu.dump", asmdump_file, fmt=ArtifactFormat.TEXT, flags=(self.toolchain,)
+            )
+            artifacts.append(artifact)
         if srcdump_file.is_file():
-            with open(srcdump_file, "r") as handle:
-                data = handle.read()
-                artifact = Artifact(
-                    "generic_mlonmcu.srcdump", content=data, fmt=ArtifactFormat.TEXT, flags=(self.toolchain,)
-                )
-                artifacts.append(artifact)
+            artifact = _from_file(
+                "generic_mlonmcu.srcdump", srcdump_file, fmt=ArtifactFormat.TEXT, flags=(self.toolchain,)
+            )
+            artifacts.append(artifact)
         metrics = self.get_metrics(elf_file)
         stdout_artifact = Artifact(
             "mlif_out.log", content=out, fmt=ArtifactFormat.TEXT
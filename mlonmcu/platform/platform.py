@@ -175,6 +175,7 @@ class CompilePlatform(Platform):
         "debug": False,
         "build_dir": None,
         "num_threads": multiprocessing.cpu_count(),
+        "elf_cache_dir": None,  # Persist static memory usage results (always memoized in-process)
     }
 
     @property
@@ -191,7 +192,7 @@ class CompilePlatform(Platform):
         return max(1, int(self.config["num_threads"]))
 
     def get_metrics(self, elf):
-        static_mem = get_static_mem_usage(elf)
+        static_mem = get_static_mem_usage(elf, cache_dir=self.config["elf_cache_dir"])
         rom_ro, rom_code, rom_misc, ram_data, ram_zdata = (
             static_mem["rom_rodata"],
             static_mem["rom_code"],
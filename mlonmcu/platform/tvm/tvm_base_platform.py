@@ -22,6 +22,8 @@ from pathlib import Path
 from ..platform import Platform
 from mlonmcu.setup import utils
 from mlonmcu.flow.tvm.backend.python_utils import prepare_python_environment
+from mlonmcu.flow.tvm.backend import tvmc_pool
+from mlonmcu.config import str2bool
 from mlonmcu.logging import get_logger
 
 logger = get_logger()
@@ -35,6 +37,9 @@ class TvmBasePlatform(Platform):
 
     DEFAULTS = {
         "tvmc_custom_script": None,
+        "tvmc_server": False,
+        "tvmc_server_workers": None,  # Maximum number of warm TVM worker processes (per process)
+        "tvmc_server_timeout": None,  # Kill (and restart) a TVM worker if a request takes longer (in s)
         "project_dir": None,
     }
 
@@ -80,6 +85,21 @@ class TvmBasePlatform(Platform):
     def tvmc_custom_script(self):
         return self.config["tvmc_custom_script"]
 
+    @property
+    def tvmc_server(self):
+        value = self.config["tvmc_server"]
+        return str2bool(value)
+
+    @property
+    def tvmc_server_workers(self):
+        value = self.config["tvmc_server_workers"]
+        return int(value) if value is not None else None
+
+    @property
+    def tvmc_server_timeout(self):
+        value = self.config["tvmc_server_timeout"]
+        return float(value) if value is not None else None
+
     @property
     def tvm_pythonpath(self):
         return self.config["tvm.pythonpath"]
@@ -99,6 +119,17 @@ class TvmBasePlatform(Platform):
         if target:
             target.update_environment(env)
         if self.tvmc_custom_script is None:
+            if self.tvmc_server and set(kwargs.keys()) <= {"cwd"}:
+                return tvmc_pool.python_module(
+                    "tvm.driver.tvmc",
+                    command,
+                    *args,
+                    live=live,
+                    env=env,
+                    max_workers=self.tvmc_server_workers,
+                    timeout=self.tvmc_server_timeout,
+                    **kwargs,
+                )
             pre = ["-m", "tvm.driver.tvmc"]
         else:
             pre = [self.tvmc_custom_script]
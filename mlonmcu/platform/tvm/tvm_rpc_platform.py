@@ -18,6 +18,7 @@
 #
 """TVM RPC Platform"""
 from mlonmcu.config import str2bool
+from mlonmcu.target.device_pool import parse_devices
 from ...platform import Platform
 
 
@@ -34,6 +35,8 @@ class TvmRpcPlatform(Platform):
         "rpc_key": None,
         "rpc_hostname": None,
         "rpc_port": None,
+        "rpc_hosts": None,  # List of equivalent trackers ('hostname[:port][*capacity]') used instead of hostname/port
+        "rpc_lease_timeout": None,
     }
 
     @property
@@ -52,3 +55,15 @@ class TvmRpcPlatform(Platform):
     @property
     def rpc_port(self):
         return self.config["rpc_port"]
+
+    @property
+    def rpc_hosts(self):
+        value = self.config["rpc_hosts"]
+        if value is None:
+            return None
+        return parse_devices(value, default_port=self.rpc_port)
+
+    @property
+    def rpc_lease_timeout(self):
+        value = self.config["rpc_lease_timeout"]
+        return float(value) if value is not None else None
@@ -23,6 +23,7 @@ from .tvm_rpc_platform import TvmRpcPlatform
 from ..platform import TargetPlatform
 from mlonmcu.target import get_targets
 from mlonmcu.target.target import Target
+from mlonmcu.target.device_pool import get_device_pool
 from .tvm_target import create_tvm_platform_target
 from mlonmcu.flow.tvm.backend.tvmc_utils import (
     get_bench_tvmc_args,
@@ -168,13 +169,14 @@ class TvmTargetPlatform(TargetPlatform, TvmRpcPlatform):
             base = Target
         return create_tvm_platform_target(name, self, base=base)
 
-    def get_tvmc_run_args(self, ins_file=None, outs_file=None, print_top=None):
+    def get_tvmc_run_args(self, ins_file=None, outs_file=None, print_top=None, device=None):
+        rpc_hostname, rpc_port = (device.hostname, device.port) if device else (self.rpc_hostname, self.rpc_port)
         return [
             *get_data_tvmc_args(mode=self.fill_mode, ins_file=ins_file, outs_file=outs_file, print_top=print_top),
             *get_bench_tvmc_args(
                 print_time=True, profile=self.profile, end_to_end=False, repeat=self.repeat, number=self.number
             ),
-            *get_rpc_tvmc_args(self.use_rpc, self.rpc_key, self.rpc_hostname, self.rpc_port),
+            *get_rpc_tvmc_args(self.use_rpc, self.rpc_key, rpc_hostname, rpc_port),
         ]
 
     def invoke_tvmc_run(self, *args, target=None, **kwargs):
@@ -197,7 +199,18 @@ class TvmTargetPlatform(TargetPlatform, TvmRpcPlatform):
         #     # TODO: populate
         # if self.get_outputs and self.get_outputs_interface == "filesystem" and out_path is None:
         #     out_path = Path(cwd) / "outs.npz"
-        args = [tar_path] + self.get_tvmc_run_args(ins_file=ins_file, outs_file=outs_file, print_top=print_top)
-        output = self.invoke_tvmc_run(*args, target=target, cwd=cwd)
+
+        def _run(device=None):
+            args = [tar_path] + self.get_tvmc_run_args(
+                ins_file=ins_file, outs_file=outs_file, print_top=print_top, device=device
+            )
+            return self.invoke_tvmc_run(*args, target=target, cwd=cwd)
+
+        hosts = self.rpc_hosts
+        if self.use_rpc and hosts is not None:
+            # Schedule the execution on the first free device of the farm
+            output = get_device_pool(hosts).run(_run, timeout=self.rpc_lease_timeout)
+        else:
+            output = _run()
 
         return output, artifacts
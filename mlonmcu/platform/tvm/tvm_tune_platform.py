@@ -34,6 +34,8 @@ from mlonmcu.flow.tvm.backend.tuner import (
     get_autoscheduler_defaults,
     get_metascheduler_defaults,
 )
+from mlonmcu.flow.tvm.backend import tvmc_pool
+from mlonmcu.flow.tvm.backend.tuning_db import TuningRecordDB
 from mlonmcu.flow.tvm.backend.tvmc_utils import (
     get_rpc_tvmc_args,
     get_target_tvmc_args,
@@ -94,13 +96,41 @@ class TvmTunePlatform(TunePlatform, TvmTargetPlatform):
         value = self.config["min_repeat_ms"]
         return int(value)
 
+    @property
+    def tuning_database(self):
+        path = self.config["autotuning_database"]
+        if not path:
+            return None
+        # Opening the database initializes its schema, hence it is only done once
+        database = getattr(self, "_tuning_database", None)
+        if database is None or database.path != Path(path):
+            database = TuningRecordDB(path)
+            self._tuning_database = database
+        return database
+
+    @property
+    def database_seed(self):
+        value = self.config["autotuning_database_seed"]
+        return str2bool(value)
+
+    def get_tuning_context(self, backend, target):
+        # Records are only comparable if the target as well as the device used for the measurements match
+        args = get_target_tvmc_args(
+            backend.target,
+            extra_targets=backend.extra_targets,
+            target_details=backend.get_target_details(),
+            extra_target_details=backend.extra_target_details,
+        )
+        return " ".join([target.name, *args])
+
     def invoke_tvmc_tune(self, *args, target=None, **kwargs):
         return self.invoke_tvmc("tune", *args, target=target, **kwargs)
 
-    def get_tune_args(self, model, backend, target, out, trials, early_stopping):
+    def get_tune_args(self, model, backend, target, out, trials, early_stopping, records=None):
         max_parallel = int(self.config.get("autotuning_max_parallel", 1))
         timeout = int(self.config.get("autotuning_timeout", 1000))
-        results_file = self.config.get("autotuning_results_file", None)
+        # Existing records (used to continue tuning) are only loaded from this file, not from the output file
+        results_file = records if records is not None else self.config.get("autotuning_results_file", None)
         desired_layout = backend.config.get("desired_layout", None)
         ret = [
             *get_target_tvmc_args(
@@ -131,8 +161,8 @@ class TvmTunePlatform(TunePlatform, TvmTargetPlatform):
         ret.append(model)
         return ret
 
-    def get_autotvm_tune_args(self, model, backend, target, out, trials_global, early_stopping):
-        ret = self.get_tune_args(model, backend, target, out, trials_global, early_stopping)
+    def get_autotvm_tune_args(self, model, backend, target, out, trials_global, early_stopping, records=None):
+        ret = self.get_tune_args(model, backend, target, out, trials_global, early_stopping, records=records)
 
         tuner = self.config.get("autotvm_tuner", "ga")
         assert tuner in ["ga", "gridsearch", "random", "xgb", "xgb_knob", "xgb-rank"]
@@ -149,9 +179,9 @@ class TvmTunePlatform(TunePlatform, TvmTargetPlatform):
             ret.extend(["--visualize", visualize_arg])
         return ret
 
-    def get_autoscheduler_tune_args(self, model, backend, target, out, trials_global, early_stopping):
+    def get_autoscheduler_tune_args(self, model, backend, target, out, trials_global, early_stopping, records=None):
         assert not self.enable_wandb, "WANDB callback not yet supported by AutoScheduler"
-        ret = self.get_tune_args(model, backend, target, out, trials_global, early_stopping)
+        ret = self.get_tune_args(model, backend, target, out, trials_global, early_stopping, records=records)
         ret.append("--enable-autoscheduler")
         if self.config.get("autoscheduler_include_simple_tasks", False):
             ret.append("--include-simple-tasks")
@@ -205,6 +235,33 @@ class TvmTunePlatform(TunePlatform, TvmTargetPlatform):
                 return res[-1]
             return -1
 
+        def join_records(*parts):
+            ret = ""
+            for part in parts:
+                if len(ret) > 0 and len(part) > 0 and not ret.endswith("\n"):
+                    ret += "\n"
+                ret += part
+            return ret
+
+        def strip_records(inp, prefix):
+            # The tuner appends to the given file, only keep the records it produced
+            if inp.startswith(prefix):
+                return inp[len(prefix) :]
+            return inp
+
+        def write_history(directory):
+            # Seeded records are passed to the tuner via a temporary copy of the results file
+            if len(seed) == 0:
+                return None
+            history = seed
+            if results_file is not None and Path(results_file).is_file():
+                with open(results_file, "r") as handle:
+                    history = join_records(handle.read(), seed)
+            history_file = Path(directory) / "tuning_history.log.txt"
+            with open(history_file, "w") as handle:
+                handle.write(history)
+            return history_file
+
         # pick best records
         def _pick_best(backend, records, verbose=False):
             with tempfile.TemporaryDirectory() as tmp_dir:
@@ -221,12 +278,25 @@ class TvmTunePlatform(TunePlatform, TvmTargetPlatform):
                     out_file,
                 ]
                 env = prepare_python_environment(backend.tvm_pythonpath, backend.tvm_build_dir, backend.tvm_configs_dir)
-                utils.python("-m", "tvm.autotvm.record", *args, live=verbose, env=env)
+                if backend.tvmc_server:
+                    tvmc_pool.python_module(
+                        "tvm.autotvm.record",
+                        *args,
+                        live=verbose,
+                        env=env,
+                        max_workers=backend.tvmc_server_workers,
+                        timeout=backend.tvmc_server_timeout,
+                    )
+                else:
+                    utils.python("-m", "tvm.autotvm.record", *args, live=verbose, env=env)
                 with open(out_file, "r") as handle:
                     content_best = handle.read()
             return content_best
 
         content = ""
+        seed = ""
+        database = None
+        num_seeded = None
         total_size = None
         visualize_raw = None
         if num_workers is not None:
@@ -276,6 +346,14 @@ class TvmTunePlatform(TunePlatform, TvmTargetPlatform):
                 if results_file is not None:
                     with open(results_file, "r") as handle:
                         content = handle.read()
+            database = self.tuning_database
+            if database is not None:
+                context = self.get_tuning_context(backend, target)
+                if self.database_seed:
+                    seed = database.best_records(mode="autotvm" if autotvm_enable else "autoscheduler", context=context)
+                    num_seeded = len(remove_empty(seed.split("\n")))
+            # Seeded records are only loaded by the tuner and do not count as trials
+            prepend = content
 
             sub_metrics = {}
             sub_artifacts = {}
@@ -325,6 +403,7 @@ class TvmTunePlatform(TunePlatform, TvmTargetPlatform):
                                 out_file = Path(tmp_dir) / "tuning_results.log.txt"
                                 with open(out_file, "w") as handle:
                                     handle.write(prepend)
+                                history_file = write_history(tmp_dir)
                                 if trials_single == 0 or (
                                     trials_single is None
                                 ):  # 0: auto, None: do not limit per task
@@ -332,17 +411,29 @@ class TvmTunePlatform(TunePlatform, TvmTargetPlatform):
                                     early_stopping = max(trials_single, 10)  # Let's see if this default works out...
                                 if autotvm_enable:
                                     tune_args = self.get_autotvm_tune_args(
-                                        model_path, backend, target, out_file, trials_single, early_stopping
+                                        model_path,
+                                        backend,
+                                        target,
+                                        out_file,
+                                        trials_single,
+                                        early_stopping,
+                                        records=history_file,
                                     )
                                 elif autoscheduler_enable:
                                     tune_args = self.get_autoscheduler_tune_args(
-                                        model_path, backend, target, out_file, trials_single, early_stopping
+                                        model_path,
+                                        backend,
+                                        target,
+                                        out_file,
+                                        trials_single,
+                                        early_stopping,
+                                        records=history_file,
                                     )
                                 else:
                                     assert False
                                 out = self.invoke_tvmc_tune(*tune_args, "--tasks", str(idx), target=target, cwd=tmp_dir)
                                 with open(out_file, "r") as handle:
-                                    content = handle.read()
+                                    content = strip_records(handle.read(), prepend)
                                 visualize_raw_task = None
                                 if self.config["autotuning_visualize"]:
                                     to_file = self.config["autotuning_visualize_file"]
@@ -369,9 +460,9 @@ class TvmTunePlatform(TunePlatform, TvmTargetPlatform):
                                 visualize_raw_task,
                             )
 
-                        workers.append(executor.submit(do_work, i, content, task_len))
+                        workers.append(executor.submit(do_work, i, prepend, task_len))
                 all_out = ""
-                all_content = ""
+                all_content = content
                 for i, w in enumerate(workers):
                     logger.debug(f"Worker {i}: pending")
                     metrics_ = Metrics()
@@ -381,7 +472,7 @@ class TvmTunePlatform(TunePlatform, TvmTargetPlatform):
                         logger.debug(f"Worker {i}: done")
                         out, content, size, tuned, failed, max_flops, duration, visualize_raw_task = ret
                         all_out += out
-                        all_content += content
+                        all_content = join_records(all_content, content)
                         metrics_.add("Config Space Size", size, True)
                         metrics_.add("Total Trials", tuned, True)
                         metrics_.add("Failed Trials", failed, True)
@@ -412,20 +503,21 @@ class TvmTunePlatform(TunePlatform, TvmTargetPlatform):
                 with tempfile.TemporaryDirectory() as tmp_dir:
                     out_file = Path(tmp_dir) / "tuning_results.log.txt"
                     with open(out_file, "w") as handle:
-                        handle.write(content)
+                        handle.write(prepend)
+                    history_file = write_history(tmp_dir)
                     if autotvm_enable:
                         tune_args = self.get_autotvm_tune_args(
-                            model_path, backend, target, out_file, trials_global, early_stopping
+                            model_path, backend, target, out_file, trials_global, early_stopping, records=history_file
                         )
                     elif autoscheduler_enable:
                         tune_args = self.get_autoscheduler_tune_args(
-                            model_path, backend, target, out_file, trials_global, early_stopping
+                            model_path, backend, target, out_file, trials_global, early_stopping, records=history_file
                         )  # TODO: expose per_task trials
                     else:
                         assert False
                     out = self.invoke_tvmc_tune(*tune_args, target=target, cwd=tmp_dir)
                     with open(out_file, "r") as handle:
-                        content = handle.read()
+                        content = join_records(content, strip_records(handle.read(), prepend))
                     visualize_raw = None
                     if self.config["autotuning_visualize"]:
                         to_file = self.config["autotuning_visualize_file"]
@@ -449,8 +541,9 @@ class TvmTunePlatform(TunePlatform, TvmTargetPlatform):
             metrics = Metrics()
         elif autotvm_enable or autoscheduler_enable:
             flag = "autotvm" if not autoscheduler_enable else "autoscheduler"
+            records = join_records(content, seed)
             artifact = Artifact(
-                "tuning_results.log.txt", content=content, fmt=ArtifactFormat.TEXT, flags=["records", flag]
+                "tuning_results.log.txt", content=records, fmt=ArtifactFormat.TEXT, flags=["records", flag]
             )
             artifacts.append(artifact)
             if visualize_raw:
@@ -464,7 +557,13 @@ class TvmTunePlatform(TunePlatform, TvmTargetPlatform):
             if total_size is not None:
                 metrics.add("Config Space Size", total_size, True)
 
-            content_best = _pick_best(backend, content, verbose=verbose)
+            if database is not None:
+                num_added = database.add_records(content, context=context)
+                metrics.add("New Database Records", num_added, True)
+                if num_seeded is not None:
+                    metrics.add("Seeded Records", num_seeded, True)
+
+            content_best = _pick_best(backend, records, verbose=verbose)
             total_trials = len(remove_empty(content.split("\n")))
             metrics.add("Total Trials", total_trials, True)
 
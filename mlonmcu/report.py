@@ -17,28 +17,270 @@
 # limitations under the License.
 #
 """Definitions of the Report class used by MLonMCU sessions and runs."""
+import json
 from pathlib import Path
 import pandas as pd
 
+from mlonmcu.logging import get_logger
+
+logger = get_logger()
+
 
 pd.set_option("display.max_columns", None)
 pd.set_option("display.max_rows", None)
 pd.set_option("display.width", 0)
 
-SUPPORTED_FMTS = ["csv", "xlsx"]
+COLUMNAR_FMTS = ["parquet", "feather"]
+SUPPORTED_FMTS = ["csv", "xlsx"] + COLUMNAR_FMTS
+
+
+def _concat_rows(dfs):
+    """Concatenate a list of dataframes row-wise using a single copy."""
+    if len(dfs) == 1:
+        return dfs[0]
+    return pd.concat(dfs, axis=0, ignore_index=True)
+
+
+def _encode_value(value):
+    """Convert a single value of a mixed column to a string (nested containers are encoded as JSON)."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if isinstance(value, (set, frozenset)):
+        value = sorted(value, key=str)
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, sort_keys=True, default=str)
+    return str(value)
+
+
+def to_columnar(df):
+    """Prepare a dataframe for being written to a columnar file format.
+
+    Columns with a single scalar type are kept as is while columns holding nested data (e.g. the Config dicts)
+    or values of mixed types are converted to strings, as they can not be represented by a single Arrow type.
+    """
+    df = df.copy(deep=False)
+    df.columns = [str(col) for col in df.columns]
+    for col in df.columns:
+        if not pd.api.types.is_object_dtype(df[col].dtype):
+            continue
+        inferred = pd.api.types.infer_dtype(df[col], skipna=True)
+        if inferred in ["empty", "string", "boolean", "integer", "floating", "mixed-integer-float", "bytes"]:
+            continue
+        df[col] = df[col].map(_encode_value).astype(object)
+    return df
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as err:
+        raise RuntimeError("Columnar report formats require pyarrow to be installed") from err
+    return pa
+
+
+class ReportWriter:
+    """Incrementally write reports to a Parquet or Feather file.
+
+    Every call to write() appends a new row group (Parquet) or record batch (Feather) to the open file, which
+    allows to flush partial results of long-running sessions without rewriting the already written rows. The
+    schema of the file is determined by the first written report. Missing columns of later reports are filled
+    with nulls. As the schema of an open file can not be changed, a new part file (i.e. report.partial.1.parquet)
+    with a widened schema is started if a later report contains additional columns (or values which can not be
+    converted to the existing type). The parts are merged into the destination file once when closing the writer,
+    hence the written rows are only copied a single time.
+
+    Attributes
+    ----------
+    path : Path
+        Destination file.
+    fmt : str
+        One of the formats in COLUMNAR_FMTS (determined by the file extension).
+    num_rows : int
+        Number of rows written so far.
+    parts : list
+        Files written so far (the first one is the destination file).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.fmt = self.path.suffix[1:]
+        assert self.fmt in COLUMNAR_FMTS, f"Unsupported format for incremental reports: {self.fmt}"
+        self.schema = None
+        self.num_rows = 0
+        self.parts = []
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _open(self, table, path):
+        pa = _import_pyarrow()
+        # Columns which are entirely empty in the first report would otherwise be fixed to the null type
+        fields = [
+            pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field for field in table.schema
+        ]
+        self.schema = pa.schema(fields)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema)
+
+    def _read(self, path):
+        """Read back the rows of a (closed) part file."""
+        pa = _import_pyarrow()
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            return pq.read_table(path)
+        with pa.OSFile(str(path), "rb") as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def _widen(self, table):
+        """Start a new part file if the given table does not fit into the current schema."""
+        pa = _import_pyarrow()
+        fields = []
+        for field in self.schema:
+            if field.name in table.column_names:
+                column = table.column(field.name)
+                if column.type != field.type and not pa.types.is_null(column.type):
+                    try:
+                        column.cast(field.type)
+                    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                        # Strings can represent the values of both types
+                        field = pa.field(field.name, pa.string())
+            fields.append(field)
+        for field in table.schema:
+            if field.name not in self.schema.names:
+                fields.append(pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field)
+        schema = pa.schema(fields)
+        if schema.equals(self.schema):
+            return
+        self._writer.close()
+        part = self.path.with_name(f"{self.path.stem}.{len(self.parts)}{self.path.suffix}")
+        logger.debug("Continuing %s in %s with widened report schema", self.path, part)
+        self.parts.append(part)
+        self._open(schema.empty_table(), part)
+
+    def _merge(self):
+        """Combine all part files into the destination file (using the final schema)."""
+        tables = [self._conform(self._read(part)) for part in self.parts]
+        self._open(self.schema.empty_table(), self.path)
+        for table in tables:
+            self._writer.write_table(table)
+        self._writer.close()
+        for part in self.parts[1:]:
+            part.unlink()
+        self.parts = [self.path]
+
+    def _conform(self, table):
+        """Match the columns of the given table with the schema of the file."""
+        pa = _import_pyarrow()
+        columns = []
+        for field in self.schema:
+            if field.name not in table.column_names:
+                columns.append(pa.nulls(table.num_rows, type=field.type))
+                continue
+            column = table.column(field.name)
+            if column.type != field.type:
+                column = column.cast(field.type)
+            columns.append(column)
+        return pa.Table.from_arrays(columns, schema=self.schema)
+
+    def write(self, report):
+        """Append the rows of a report (or dataframe) to the file."""
+        pa = _import_pyarrow()
+        df = report.df if isinstance(report, Report) else report
+        if len(df) == 0:
+            return
+        table = pa.Table.from_pandas(to_columnar(df), preserve_index=False)
+        if self._writer is None:
+            self.parts.append(self.path)
+            self._open(table, self.path)
+        else:
+            self._widen(table)
+        table = self._conform(table)
+        self._writer.write_table(table)
+        self.num_rows += table.num_rows
+
+    def close(self):
+        """Finalize the file. No further reports can be appended afterwards."""
+        if self._writer is not None:
+            self._writer.close()
+            if len(self.parts) > 1:
+                self._merge()
+            self._writer = None
 
 
 class Report:
-    """Report class wrapped around multiple pandas dataframes."""
+    """Report class wrapped around multiple pandas dataframes.
+
+    Appended reports are only collected in a list. They are merged into the internal dataframes when these are
+    accessed the next time, which copies the existing rows once per batch of appended reports. Hence, reports
+    should be appended in large batches (see from_reports) instead of alternating between appending and reading.
+    """
 
     def __init__(self):
-        self.pre_df = pd.DataFrame()
-        self.main_df = pd.DataFrame()
-        self.post_df = pd.DataFrame()
+        self._pre_df = pd.DataFrame()
+        self._main_df = pd.DataFrame()
+        self._post_df = pd.DataFrame()
+        self._pending = []  # Appended reports which have not been merged yet
+
+    def _flush(self):
+        """Merge all pending reports into the internal dataframes at once."""
+        if len(self._pending) == 0:
+            return
+        pending = self._pending
+        self._pending = []
+        self._pre_df = _concat_rows([self._pre_df] + [report.pre_df for report in pending])
+        self._main_df = _concat_rows([self._main_df] + [report.main_df for report in pending])
+        self._post_df = _concat_rows([self._post_df] + [report.post_df for report in pending])
+
+    @property
+    def pre_df(self):
+        """Get the left third of the dataframe."""
+        self._flush()
+        return self._pre_df
+
+    @pre_df.setter
+    def pre_df(self, value):
+        self._flush()
+        self._pre_df = value
+
+    @property
+    def main_df(self):
+        """Get the center part of the dataframe."""
+        self._flush()
+        return self._main_df
+
+    @main_df.setter
+    def main_df(self, value):
+        self._flush()
+        self._main_df = value
+
+    @property
+    def post_df(self):
+        """Get the right third of the dataframe."""
+        self._flush()
+        return self._post_df
+
+    @post_df.setter
+    def post_df(self, value):
+        self._flush()
+        self._post_df = value
 
     @property
     def df(self):
-        """Combine the three internal dataframes to a large one and return in."""
+        """Combine the three internal dataframes to a large one and return in.
+
+        A new dataframe is created on every access, hence the result should be kept by the caller if used
+        multiple times.
+        """
         # TODO: handle this properly by either adding NAN or use a single set(pre=, post=, main=) method
         return pd.concat([self.pre_df, self.main_df, self.post_df], axis=1)
 
@@ -48,7 +290,7 @@ class Report:
         Arguments
         ---------
         path : str
-            Destination path.
+            Destination path. The format is determined by the file extension (see SUPPORTED_FMTS).
 
         """
         ext = Path(path).suffix[1:]
@@ -60,12 +302,16 @@ class Report:
             self.df.to_csv(path, index=False)
         elif ext in ["xlsx", "xls"]:
             self.df.to_excel(path, index=False)
+        elif ext in COLUMNAR_FMTS:
+            _import_pyarrow()
+            df = to_columnar(self.df)
+            if ext == "parquet":
+                df.to_parquet(path, index=False)
+            else:
+                df.to_feather(path)
         else:
             raise RuntimeError()
 
-    # def append(self, *args, **kwargs):
-    #     self.df = self.df.append(*args, **kwargs, ignore_index=True)
-
     def set_pre(self, data):
         """Setter for the left third of the dataframe."""
         self.pre_df = pd.DataFrame.from_records(data).reset_index(drop=True)
@@ -89,11 +335,25 @@ class Report:
             self.set_main(main if main is not None else {})
         self.set_post(post if post is not None else {})
 
-    def add(self, reports):
-        """Helper function to append a line to an existing report."""
+    def append(self, reports):
+        """Append one or more reports.
+
+        No rows are copied here. The reports are merged lazily with a single concatenation (copying the existing
+        and the appended rows) as soon as the dataframes are accessed, hence they should not be modified after
+        being appended.
+        """
         if not isinstance(reports, list):
             reports = [reports]
-        for report in reports:
-            self.pre_df = pd.concat([self.pre_df, report.pre_df], axis=0).reset_index(drop=True)
-            self.main_df = pd.concat([self.main_df, report.main_df], axis=0).reset_index(drop=True)
-            self.post_df = pd.concat([self.post_df, report.post_df], axis=0).reset_index(drop=True)
+        self._pending.extend(reports)
+
+    def add(self, reports):
+        """Helper function to append a line to an existing report (merged immediately)."""
+        self.append(reports)
+        self._flush()
+
+    @classmethod
+    def from_reports(cls, reports):
+        """Create a single report by merging the given reports in linear time."""
+        merged = cls()
+        merged.add(reports)
+        return merged
@@ -0,0 +1,248 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Content-addressed cache for stage artifacts which can be shared across runs and sessions."""
+import os
+import copy
+import json
+import pickle
+import shutil
+import hashlib
+from pathlib import Path
+
+import filelock
+
+from mlonmcu.artifact import ArtifactFormat
+from mlonmcu.logging import get_logger
+from mlonmcu.setup.utils import atomic_write
+
+logger = get_logger()
+
+CACHE_VERSION = 3
+ENTRY_FILE = "artifacts.pkl"
+
+
+def _normalize(value):
+    """Convert a config value into a deterministic JSON-serializable representation."""
+    if isinstance(value, dict):
+        return {str(key): _normalize(val) for key, val in value.items()}
+    if isinstance(value, (set, frozenset)):
+        return sorted(str(_normalize(val)) for val in value)
+    if isinstance(value, (list, tuple)):
+        return [_normalize(val) for val in value]
+    if isinstance(value, (bool, int, float)) or value is None:
+        return value
+    return str(value)
+
+
+def hash_config(config):
+    """Return a stable hash for a (component) configuration dict."""
+    data = json.dumps(_normalize(config), sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def hash_artifacts(artifacts, ignore_flags=("metrics",)):
+    """Return a stable hash for the contents of a list (or dict of lists) of artifacts.
+
+    Artifacts with one of the given flags (e.g. metrics which contain timing information) are skipped.
+    """
+    if isinstance(artifacts, dict):
+        artifacts = sum([artifacts[name] for name in sorted(artifacts)], [])
+    hasher = hashlib.sha256()
+    for artifact in sorted(artifacts, key=lambda x: x.name):
+        if any(flag in artifact.flags for flag in ignore_flags):
+            continue
+        hasher.update(artifact.name.encode("utf-8"))
+        hasher.update(str(artifact.fmt.value).encode("utf-8"))
+        if artifact.lazy:
+            path = artifact.source
+        elif artifact.path is not None and artifact.content is None and artifact.raw is None:
+            path = Path(artifact.path)
+        else:
+            path = None
+        if path is None:
+            if artifact.content is not None:
+                hasher.update(artifact.content.encode("utf-8"))
+            elif artifact.raw is not None:
+                hasher.update(artifact.raw)
+        else:
+            if path.is_file():
+                with open(path, "rb") as handle:
+                    for chunk in iter(lambda: handle.read(1 << 20), b""):
+                        hasher.update(chunk)
+            else:
+                hasher.update(str(path).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def is_cacheable(artifacts):
+    """Only artifacts holding their data in memory can be restored from the cache."""
+    if isinstance(artifacts, dict):
+        artifacts = sum(artifacts.values(), [])
+    return all(artifact.fmt != ArtifactFormat.PATH for artifact in artifacts)
+
+
+class ArtifactCache:
+    """Persistent, content-addressed cache for the artifacts produced by a stage of a run.
+
+    Entries are stored in a two-level directory structure below the given directory and evicted
+    in least-recently-used order once the configured size or number of entries is exceeded.
+
+    Attributes
+    ----------
+    directory : Path
+        The root directory of the cache (usually located in the environments temp directory).
+    max_size : int
+        Maximum size of the cache in bytes (unlimited if None).
+    max_entries : int
+        Maximum number of cache entries (unlimited if None).
+    """
+
+    def __init__(self, directory, max_size=None, max_entries=None):
+        self.directory = Path(directory)
+        self.max_size = int(max_size) if max_size is not None else None
+        self.max_entries = int(max_entries) if max_entries is not None else None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.lock = filelock.FileLock(self.directory / ".lock")
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f"ArtifactCache({self.directory})"
+
+    def __getstate__(self):
+        # File locks can not be pickled (required for process-based parallelism)
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = filelock.FileLock(self.directory / ".lock")
+
+    @staticmethod
+    def get_key(*args, **kwargs):
+        """Combine the given hashes and configs to a single cache key."""
+        data = {"version": CACHE_VERSION, "args": _normalize(list(args)), "kwargs": _normalize(kwargs)}
+        return hash_config(data)
+
+    def _entry_dir(self, key):
+        return self.directory / key[:2] / key
+
+    def lookup(self, key):
+        """Return the cached artifacts for the given key or None on a cache miss."""
+        entry_file = self._entry_dir(key) / ENTRY_FILE
+        if not entry_file.is_file():
+            self.misses += 1
+            return None
+        try:
+            with open(entry_file, "rb") as handle:
+                artifacts = pickle.load(handle)
+        except Exception as err:  # Corrupted or incompatible entry
+            logger.warning("Dropping invalid artifact cache entry %s: %s", key, err)
+            self.remove(key)
+            self.misses += 1
+            return None
+        os.utime(entry_file)  # Used to determine the least recently used entries
+        self.hits += 1
+        return artifacts
+
+    def store(self, key, artifacts):
+        """Add the given artifacts to the cache. Returns false if the artifacts are not cacheable."""
+        if not is_cacheable(artifacts):
+            logger.debug("Skipping artifact cache for %s because of file-based artifacts", key)
+            return False
+
+        def _strip(artifact):
+            new = copy.copy(artifact)
+            new.cache()  # The backing files of lazy artifacts might not exist anymore when restoring
+            new.source = None
+            new.path = None  # Restored artifacts will be exported to the directory of the new run
+            new.extracted = None
+            return new
+
+        if isinstance(artifacts, dict):
+            data = {name: [_strip(artifact) for artifact in value] for name, value in artifacts.items()}
+        else:
+            data = [_strip(artifact) for artifact in artifacts]
+        entry_dir = self._entry_dir(key)
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        # Write to temporary file first to make sure that parallel readers never see partial entries
+        with atomic_write(entry_dir / ENTRY_FILE, "wb") as handle:
+            pickle.dump(data, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        return True
+
+    def remove(self, key):
+        """Drop a single entry from the cache."""
+        entry_dir = self._entry_dir(key)
+        if entry_dir.is_dir():
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+    def entries(self):
+        """Return a list of (key, size, last_access) tuples for all cache entries."""
+        ret = []
+        for prefix_dir in self.directory.iterdir():
+            if not prefix_dir.is_dir():
+                continue
+            for entry_dir in prefix_dir.iterdir():
+                entry_file = entry_dir / ENTRY_FILE
+                try:
+                    stat = entry_file.stat()
+                except FileNotFoundError:
+                    continue
+                ret.append((entry_dir.name, stat.st_size, stat.st_mtime))
+        return ret
+
+    @property
+    def size(self):
+        """Get the total size of the cache in bytes."""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove least recently used entries until the size and count limits are met.
+
+        Returns
+        -------
+        int
+            The number of removed entries.
+        """
+        if self.max_size is None and self.max_entries is None:
+            return 0
+        removed = 0
+        with self.lock:
+            entries = sorted(self.entries(), key=lambda x: x[2])
+            total_size = sum(size for _, size, _ in entries)
+            total_count = len(entries)
+            for key, size, _ in entries:
+                too_large = self.max_size is not None and total_size > self.max_size
+                too_many = self.max_entries is not None and total_count > self.max_entries
+                if not (too_large or too_many):
+                    break
+                self.remove(key)
+                total_size -= size
+                total_count -= 1
+                removed += 1
+        if removed > 0:
+            logger.debug("Evicted %d entries from artifact cache", removed)
+        return removed
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        with self.lock:
+            for key, _, _ in self.entries():
+                self.remove(key)
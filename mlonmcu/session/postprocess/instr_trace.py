@@ -0,0 +1,223 @@
+#
+# Copyright (c) 2024 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Streaming analysis of (RISC-V) instruction traces with bounded memory usage."""
+import numpy as np
+import pandas as pd
+
+from mlonmcu.trace import parse_encodings, iter_text_chunks  # noqa: F401
+
+MAJOR_OPCODES = {
+    0b0010011: "OP-IMM",
+    0b0110111: "LUI",
+    0b0010111: "AUIPC",
+    0b0110011: "OP",
+    0b1101111: "JAL",
+    0b1100111: "JALR",
+    0b1100011: "BRANCH",
+    0b0000011: "LOAD",
+    0b0100011: "STORE",
+    0b0001111: "MISC-MEM",
+    0b1110011: "SYSTEM",
+    0b1000011: "MADD",
+    0b1000111: "MSUB",
+    0b1001011: "MNSUB",
+    0b1001111: "MNADD",
+    0b0000111: "LOAD-FP",
+    0b0100111: "STORE-FP",
+    0b0001011: "custom-0",
+    0b0101011: "custom-1",
+    0b1011011: "custom-2/rv128",
+    0b1111011: "custom-3/rv128",
+    0b1101011: "reserved",
+    0b0101111: "AMO",
+    0b1010011: "OP-FP",
+    0b1010111: "OP-V",
+    0b1110111: "OP-P",
+    0b0011011: "OP-IMM-32",
+    0b0111011: "OP-32",
+}
+
+# Indexed by funct3 (bits 15-13) and the quadrant (bits 1-0) of 16-bit instructions
+RVC_MAJOR_OPCODES = {
+    0b00000: "OP-IMM",
+    0b00001: "OP-IMM",
+    0b00010: "OP-IMM",
+    0b00100: "LOAD",
+    0b00101: "JAL",
+    0b00110: "LOAD-FP",
+    0b01000: "LOAD",
+    0b01001: "OP-IMM",
+    0b01010: "LOAD",
+    0b01100: "LOAD-FP",
+    0b01101: "OP-IMM",
+    0b01110: "LOAD-FP",
+    0b10000: "reserved",
+    0b10001: "MISC-ALU",
+    0b10010: "JALR",
+    0b10100: "STORE-FP",
+    0b10101: "JAL",
+    0b10110: "STORE-FP",
+    0b11000: "STORE",
+    0b11001: "BRANCH",
+    0b11010: "STORE",
+    0b11100: "STORE-FP",
+    0b11101: "BRANCH",
+    0b11110: "STORE-FP",
+}
+
+
+def _build_major_tables():
+    labels = sorted(
+        set(MAJOR_OPCODES.values()) | {f"{label} (Compressed)" for label in RVC_MAJOR_OPCODES.values()} | {"UNKNOWN"}
+    )
+    index = {label: i for i, label in enumerate(labels)}
+    table = np.full(128, index["UNKNOWN"], dtype=np.int64)
+    for opcode, label in MAJOR_OPCODES.items():
+        table[opcode] = index[label]
+    rvc_table = np.full(32, index["UNKNOWN"], dtype=np.int64)
+    for combined, label in RVC_MAJOR_OPCODES.items():
+        rvc_table[combined] = index[f"{label} (Compressed)"]
+    return labels, table, rvc_table
+
+
+MAJOR_LABELS, _MAJOR_TABLE, _RVC_MAJOR_TABLE = _build_major_tables()
+
+
+def get_major_opcodes(encodings):
+    """Map instruction encodings to indices into MAJOR_LABELS."""
+    encodings = np.asarray(encodings, dtype=np.uint32)
+    quadrant = encodings & 0b11
+    ret = _MAJOR_TABLE[encodings & 0b1111111]
+    compressed = quadrant != 0b11
+    if compressed.any():
+        combined = ((encodings[compressed] >> 13) & 0b111) << 2 | quadrant[compressed]
+        ret[compressed] = _RVC_MAJOR_TABLE[combined]
+    return ret
+
+
+def _top(counts, top):
+    if len(counts) == 0:
+        return {}, {}
+    counts = pd.Series(counts, dtype=np.int64).sort_values(ascending=False, kind="stable")
+    probs = counts / counts.sum()
+    if top is not None:
+        counts, probs = counts.head(top), probs.head(top)
+    return dict(counts), dict(probs)
+
+
+class InstructionTraceAnalyzer:
+    """Incrementally count major opcodes and instruction sequences (n-grams) of a trace.
+
+    Instruction names are mapped to integer codes so that all counting can be done with NumPy. Only the
+    last seq_depth - 1 instructions of a chunk are kept to count the sequences spanning two chunks.
+    """
+
+    def __init__(self, seq_depth=0):
+        self.seq_depth = seq_depth
+        self.vocab = {}
+        self.names = []
+        self.major_counts = np.zeros(len(MAJOR_LABELS), dtype=np.int64)
+        self.name_counts = np.zeros(0, dtype=np.int64)
+        self.seq_counts = {length: {} for length in range(2, seq_depth + 1)}
+        self._tail = np.zeros(0, dtype=np.int64)
+
+    def encode_names(self, names):
+        """Translate the given instruction names to integer codes."""
+        codes, uniques = pd.factorize(np.asarray(names, dtype=object))
+        return self._translate(codes, uniques)
+
+    def _translate(self, codes, names):
+        lookup = np.array([self.vocab.setdefault(name, len(self.vocab)) for name in names], dtype=np.int64)
+        self.names.extend(list(self.vocab)[len(self.names) :])
+        return lookup[codes] if len(lookup) > 0 else np.zeros(0, dtype=np.int64)
+
+    def feed_encodings(self, encodings, base=None):
+        """Add instruction encodings (integers or strings) to the major opcode statistics."""
+        if len(encodings) == 0:
+            return
+        if not np.issubdtype(np.asarray(encodings).dtype, np.integer):
+            encodings = parse_encodings(encodings, base=base)
+        majors = get_major_opcodes(encodings)
+        self.major_counts += np.bincount(majors, minlength=len(MAJOR_LABELS))
+
+    def _count_sequences(self, data, skip):
+        base = max(len(self.names), 1)
+        for length, counts in self.seq_counts.items():
+            start = max(0, skip - (length - 1))
+            num = len(data) - length + 1 - start
+            if num <= 0:
+                continue
+            columns = [data[start + i : start + i + num] for i in range(length)]
+            if base**length < 2**63:
+                keys = np.zeros(num, dtype=np.int64)
+                for column in columns:
+                    keys = keys * base + column
+                uniques, cnts = np.unique(keys, return_counts=True)
+                decoded = []
+                for _ in range(length):
+                    decoded.insert(0, (uniques % base).tolist())
+                    uniques = uniques // base
+                seqs = zip(*decoded)
+            else:
+                uniques, cnts = np.unique(np.stack(columns, axis=1), axis=0, return_counts=True)
+                seqs = map(tuple, uniques.tolist())
+            for seq, cnt in zip(seqs, cnts.tolist()):
+                counts[seq] = counts.get(seq, 0) + cnt
+
+    def feed_names(self, names):
+        """Add a chunk of consecutive instruction names to the instruction and sequence statistics."""
+        self._feed_codes(self.encode_names(names))
+
+    def feed_codes(self, codes, names):
+        """Same as feed_names for names given as indices into a table of names (i.e. of a binary trace)."""
+        self._feed_codes(self._translate(np.asarray(codes, dtype=np.int64), names))
+
+    def _feed_codes(self, codes):
+        if len(codes) == 0:
+            return
+        counts = np.bincount(codes, minlength=len(self.names))
+        counts[: len(self.name_counts)] += self.name_counts
+        self.name_counts = counts
+        if self.seq_depth > 1:
+            data = np.concatenate([self._tail, codes])
+            self._count_sequences(data, len(self._tail))
+            self._tail = data[-(self.seq_depth - 1) :]
+
+    def get_major_counts(self, top=None):
+        """Return dicts with the (top) counts and probabilities of the major opcodes."""
+        counts = {label: count for label, count in zip(MAJOR_LABELS, self.major_counts.tolist()) if count > 0}
+        return _top(counts, top)
+
+    def get_name_counts(self, mapping=None, top=None):
+        """Return the counts/probabilities of all instruction names, optionally aggregated via mapping(name)."""
+        counts = {}
+        for name, count in zip(self.names, self.name_counts.tolist()):
+            if count == 0:
+                continue
+            key = name if mapping is None else mapping(name)
+            counts[key] = counts.get(key, 0) + count
+        return _top(counts, top)
+
+    def get_sequence_counts(self, length, top=None):
+        """Return the counts/probabilities of instruction sequences with the given length (joined by ';')."""
+        if length == 1:
+            return self.get_name_counts(top=top)
+        assert 1 < length <= self.seq_depth
+        counts = {";".join(self.names[code] for code in seq): count for seq, count in self.seq_counts[length].items()}
+        return _top(counts, top)
@@ -20,9 +20,10 @@
 
 import re
 import ast
+import json
 import tempfile
 from pathlib import Path
-from io import StringIO
+from io import StringIO, BytesIO
 
 import numpy as np
 import pandas as pd
@@ -30,9 +31,12 @@ import pandas as pd
 from mlonmcu.artifact import Artifact, ArtifactFormat, lookup_artifacts
 from mlonmcu.config import str2dict, str2bool, str2list
 from mlonmcu.logging import get_logger
+from mlonmcu.trace import InstructionTrace
+from mlonmcu.stream import COMPRESSION_SUFFIXES, read_log
 
 from .postprocess import SessionPostprocess, RunPostprocess
 from .validate_metrics import parse_validate_metrics, parse_classify_metrics
+from .instr_trace import InstructionTraceAnalyzer, iter_text_chunks
 
 logger = get_logger()
 
@@ -561,6 +565,7 @@ class AnalyseInstructionsPostprocess(RunPostprocess):
         "to_df": False,
         "to_file": True,
         "corev": False,
+        "chunksize": 2**20,  # Number of trace lines processed at once
     }
 
     def __init__(self, features=None, config=None):
@@ -606,188 +611,94 @@ class AnalyseInstructionsPostprocess(RunPostprocess):
         value = self.config["corev"]
         return str2bool(value)
 
+    @property
+    def chunksize(self):
+        """Get chunksize property."""
+        return int(self.config["chunksize"])
+
     def post_run(self, report, artifacts):
         """Called at the end of a run."""
         ret_artifacts = []
-        log_artifact = lookup_artifacts(artifacts, flags=("log_instrs",), fmt=ArtifactFormat.TEXT, first_only=True)
+        log_artifact = lookup_artifacts(artifacts, flags=("log_instrs",), first_only=True)
         assert len(log_artifact) == 1, "To use analyse_instructions process, please enable feature log_instrs."
         log_artifact = log_artifact[0]
         is_spike = "spike" in log_artifact.flags
         is_etiss = "etiss_pulpino" in log_artifact.flags or "etiss" in log_artifact.flags
         is_ovpsim = "ovpsim" in log_artifact.flags or "corev_ovpsim" in log_artifact.flags
         is_riscv = is_spike or is_etiss or is_ovpsim
-        if is_spike:
-            content = log_artifact.content
-            if self.groups:
-                encodings = re.compile(r"\((0x[0-9abcdef]+)\)").findall(content)
-            if self.sequences:
-                names = re.compile(r"core\s+\d+:\s0x[0-9abcdef]+\s\(0x[0-9abcdef]+\)\s([\w.]+).*").findall(content)
-        elif is_etiss:
-
-            # TODO: generalize
-            def transform_df(df):
-                df["pc"] = df["pc"].apply(lambda x: int(x, 0))
-                df["pc"] = pd.to_numeric(df["pc"])
-                # TODO: normalize instr names
-                df[["instr", "rest"]] = df["rest"].str.split(" # ", n=1, expand=True)
-                df["instr"] = df["instr"].apply(lambda x: x.strip())
-                df["instr"] = df["instr"].astype("category")
-                df[["bytecode", "operands"]] = df["rest"].str.split(" ", n=1, expand=True)
-
-                def detect_size(bytecode):
-                    if bytecode[:2] == "0x":
-                        return len(bytecode[2:]) / 2
-                    elif bytecode[:2] == "0b":
-                        return len(bytecode[2:]) / 8
-                    else:
-                        assert len(set(bytecode)) == 2
-                        return len(bytecode) / 8
-
-                df["size"] = df["bytecode"].apply(detect_size)
-                df["bytecode"] = df["bytecode"].apply(
-                    lambda x: int(x, 16) if "0x" in x else (int(x, 2) if "0b" in x else int(x, 2))
-                )
-                df["bytecode"] = pd.to_numeric(df["bytecode"])
-                df.drop(columns=["rest"], inplace=True)
-                return df
-
-            def process_df(df):
-                encodings = None
-                names = None
+        analyze_names = self.sequences or self.corev
+        analyzer = InstructionTraceAnalyzer(seq_depth=self.seq_depth if self.sequences else 0)
+        compress = next((fmt for fmt in COMPRESSION_SUFFIXES if fmt in log_artifact.flags), None)
+        if "binary" in log_artifact.flags:
+            trace = InstructionTrace(log_artifact.source if log_artifact.lazy else log_artifact.raw)
+            for chunk in trace.iter_chunks(self.chunksize):
                 if self.groups:
-                    # encodings = re.compile(r"0x[0-9abcdef]+:\s\w+\s#\s([0-9a-fx]+)\s.*").findall(content)
-                    # encodings = [f"{enc}" for enc in encodings]
-                    encodings = [bin(enc) for enc in df["bytecode"].values]
-                if self.sequences:
-                    # names = re.compile(r"0x[0-9abcdef]+:\s(\w+)\s#\s[0-9a-fx]+\s.*").findall(content)
-                    names = list(df["instr"].values)
-                return encodings, names
-
+                    analyzer.feed_encodings(chunk["encoding"])
+                if analyze_names:
+                    analyzer.feed_codes(chunk["name"], trace.names)
+        elif is_spike or is_ovpsim:
+            if is_spike:
+                encoding_regex = re.compile(r"\((0x[0-9abcdef]+)\)")
+                name_regex = re.compile(r"core\s+\d+:\s0x[0-9abcdef]+\s\(0x[0-9abcdef]+\)\s([\w.]+).*")
+                base = None
+            else:
+                encoding_regex = re.compile(r"riscvOVPsim\/cpu',\s0x[0-9abcdef]+\(.*\):\s([0-9abcdef]+)\s+\w+\s+.*")
+                name_regex = re.compile(r"riscvOVPsim\/cpu',\s0x[0-9abcdef]+\(.*\):\s[0-9abcdef]+\s+(\w+)\s+.*")
+                base = 16
+            if compress is not None:
+                handle = read_log(log_artifact.source if log_artifact.lazy else BytesIO(log_artifact.raw), compress)
+            else:
+                handle = open(log_artifact.source, "r") if log_artifact.lazy else StringIO(log_artifact.content)
+            with handle:
+                for text in iter_text_chunks(handle, self.chunksize):
+                    if self.groups:
+                        analyzer.feed_encodings(encoding_regex.findall(text), base=base)
+                    if analyze_names:
+                        analyzer.feed_names(name_regex.findall(text))
+        elif is_etiss:
             log_artifact.uncache()
-            encodings = None
-            names = None
-            if self.groups:
-                encodings = []
-            if self.sequences:
-                names = []
-            with pd.read_csv(log_artifact.path, sep=":", names=["pc", "rest"], chunksize=2**22) as reader:  # TODO: expose chunksize
+            with pd.read_csv(
+                log_artifact.source,
+                sep=":",
+                names=["pc", "rest"],
+                dtype=str,
+                chunksize=self.chunksize,
+                compression=compress,
+            ) as reader:
                 for chunk in reader:
-                    df = transform_df(chunk)
-
-                    encodings_, names_ = process_df(df)
-                    # input(">")
-
-                    encodings = encodings_
-                    names += names_
-            # df = None
-            # content = log_artifact.content
-            # if self.groups:
-            #     encodings = re.compile(r"0x[0-9abcdef]+:\s\w+\s#\s([0-9a-fx]+)\s.*").findall(content)
-            #     encodings = [f"0b{enc}" for enc in encodings]
-            #     # encodings = [f"{enc}" for enc in encodings]
-            # if self.sequences:
-            #     names = re.compile(r"0x[0-9abcdef]+:\s(\w+)\s#\s[0-9a-fx]+\s.*").findall(content)
-        elif is_ovpsim:
-            content = log_artifact.content
-            if self.groups:
-                encodings = re.compile(r"riscvOVPsim\/cpu',\s0x[0-9abcdef]+\(.*\):\s([0-9abcdef]+)\s+\w+\s+.*").findall(
-                    content
-                )
-                encodings = [f"0x{enc}" for enc in encodings]
-            if self.sequences:
-                names = re.compile(r"riscvOVPsim\/cpu',\s0x[0-9abcdef]+\(.*\):\s[0-9abcdef]+\s+(\w+)\s+.*").findall(
-                    content
-                )
+                    # Format: pc: instr # bytecode operands
+                    parts = chunk["rest"].str.split(" # ", n=1, expand=True)
+                    if self.groups:
+                        analyzer.feed_encodings(parts[1].str.strip().str.split(" ", n=1).str[0])
+                    if analyze_names:
+                        analyzer.feed_names(parts[0].str.strip())
         else:
             raise RuntimeError("Uable to determine the used target.")
 
-        def _helper(x, top=100):
-            counts = pd.Series(x).value_counts()
-            probs = counts / len(x)
-            return dict(counts.head(top)), dict(probs.head(top))
+        # Statistics of sampled logs are extrapolated to the whole traced region
+        scale = None
+        sampling_artifact = lookup_artifacts(artifacts, flags=("log_instrs_sampling",), first_only=True)
+        if len(sampling_artifact) > 0:
+            scale = json.loads(sampling_artifact[0].content)["scale"]
 
         def _gen_csv(label, counts, probs):
-            lines = [f"{label},Count,Probability"]
+            if scale is None:
+                lines = [f"{label},Count,Probability"]
+            else:
+                lines = [f"{label},Count,Probability,Estimate,Margin"]
             for x in counts:
                 line = f"{x},{counts[x]},{probs[x]:.3f}"
+                if scale is not None:
+                    # Half-width of the 95% confidence interval (normal approximation, independent samples)
+                    num = counts[x] / probs[x] if probs[x] > 0 else 0
+                    margin = 1.96 * np.sqrt(probs[x] * (1 - probs[x]) * num) * scale
+                    line += f",{round(counts[x] * scale)},{round(margin)}"
                 lines.append(line)
             return "\n".join(lines)
 
         if self.groups:
             assert is_riscv, "Currently only riscv instrcutions can be analysed by groups"
-
-            def _extract_major_opcode(enc):
-                mapping = {
-                    0b0010011: "OP-IMM",
-                    0b0110111: "LUI",
-                    0b0010111: "AUIPC",
-                    0b0110011: "OP",
-                    0b1101111: "JAL",
-                    0b1100111: "JALR",
-                    0b1100011: "BRANCH",
-                    0b0000011: "LOAD",
-                    0b0100011: "STORE",
-                    0b0001111: "MISC-MEM",
-                    0b1110011: "SYSTEM",
-                    0b1000011: "MADD",
-                    0b1000111: "MSUB",
-                    0b1001011: "MNSUB",
-                    0b1001111: "MNADD",
-                    0b0000111: "LOAD-FP",
-                    0b0100111: "STORE-FP",
-                    0b0001011: "custom-0",
-                    0b0101011: "custom-1",
-                    0b1011011: "custom-2/rv128",
-                    0b1111011: "custom-3/rv128",
-                    0b1101011: "reserved",
-                    0b0101111: "AMO",
-                    0b1010011: "OP-FP",
-                    0b1010111: "OP-V",
-                    0b1110111: "OP-P",
-                    0b0011011: "OP-IMM-32",
-                    0b0111011: "OP-32",
-                }
-                enc = int(enc, 0)  # Convert from hexadecimal
-                opcode = enc & 0b1111111
-                lsbs = opcode & 0b11
-                if lsbs == 0b11:
-                    major = mapping.get(opcode, "UNKNOWN")
-                else:
-                    # 16-bit instruction
-                    msbs = (enc & 0b1110000000000000) >> 13
-                    rvc_mapping = {
-                        0b00000: "OP-IMM",
-                        0b00001: "OP-IMM",
-                        0b00010: "OP-IMM",
-                        0b00100: "LOAD",
-                        0b00101: "JAL",
-                        0b00110: "LOAD-FP",
-                        0b01000: "LOAD",
-                        0b01001: "OP-IMM",
-                        0b01010: "LOAD",
-                        0b01100: "LOAD-FP",
-                        0b01101: "OP-IMM",
-                        0b01110: "LOAD-FP",
-                        0b10000: "reserved",
-                        0b10001: "MISC-ALU",
-                        0b10010: "JALR",
-                        0b10100: "STORE-FP",
-                        0b10101: "JAL",
-                        0b10110: "STORE-FP",
-                        0b11000: "STORE",
-                        0b11001: "BRANCH",
-                        0b11010: "STORE",
-                        0b11100: "STORE-FP",
-                        0b11101: "BRANCH",
-                        0b11110: "STORE-FP",
-                    }
-                    combined = msbs << 2 | lsbs
-                    assert combined in rvc_mapping.keys()
-                    return f"{rvc_mapping[combined]} (Compressed)"
-                return major
-
-            majors = list(map(_extract_major_opcode, encodings))
-            major_counts, major_probs = _helper(majors, top=self.top)
+            major_counts, major_probs = analyzer.get_major_counts(top=self.top)
             majors_csv = _gen_csv("Major", major_counts, major_probs)
             artifact = Artifact("analyse_instructions_majors.csv", content=majors_csv, fmt=ArtifactFormat.TEXT)
             if self.to_file:
@@ -798,18 +709,8 @@ class AnalyseInstructionsPostprocess(RunPostprocess):
                 post_df["AnalyseInstructionsMajorsProbs"] = str(major_probs)
                 report.post_df = post_df
         if self.sequences:
-            max_len = self.seq_depth
-
-            def _get_sublists(lst, length):
-                ret = []
-                for i in range(len(lst) - length + 1):
-                    lst_ = lst[i : i + length]
-                    ret.append(";".join(lst_))
-                return ret
-
-            for length in range(1, max_len + 1):
-                names_ = _get_sublists(names, length)
-                counts, probs = _helper(names_, top=self.top)
+            for length in range(1, self.seq_depth + 1):
+                counts, probs = analyzer.get_sequence_counts(length, top=self.top)
                 sequence_csv = _gen_csv("Sequence", counts, probs)
                 artifact = Artifact(
                     f"analyse_instructions_seq{length}.csv", content=sequence_csv, fmt=ArtifactFormat.TEXT
@@ -1012,8 +913,7 @@ class AnalyseInstructionsPostprocess(RunPostprocess):
                 else:
                     return "Other"
 
-            names_ = list(map(apply_mapping, names))
-            cv_ext_counts, cv_ext_probs = _helper(names_, top=self.top)
+            cv_ext_counts, cv_ext_probs = analyzer.get_name_counts(mapping=apply_mapping, top=self.top)
             corev_csv = _gen_csv("Set", cv_ext_counts, cv_ext_probs)
             artifact = Artifact("analyse_instructions_corev.csv", content=corev_csv, fmt=ArtifactFormat.TEXT)
             if self.to_file:
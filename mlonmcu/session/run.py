@@ -20,13 +20,15 @@
 import itertools
 import os
 import copy
+import pickle
 import tempfile
 from pathlib import Path
 from enum import IntEnum
 from collections import defaultdict
 
 from mlonmcu.logging import get_logger
-from mlonmcu.artifact import ArtifactFormat, lookup_artifacts
+from mlonmcu.setup.utils import atomic_write
+from mlonmcu.artifact import ArtifactFormat, lookup_artifacts, TEXT_FMTS, RAW_FMTS
 from mlonmcu.config import str2bool
 from mlonmcu.platform.platform import CompilePlatform, TargetPlatform, BuildPlatform, TunePlatform
 from mlonmcu.report import Report  # TODO: move to mlonmcu.session.report
@@ -41,9 +43,13 @@ from mlonmcu.flow import SUPPORTED_FRAMEWORKS, SUPPORTED_BACKENDS
 
 from .postprocess import SUPPORTED_POSTPROCESSES
 from .postprocess.postprocess import RunPostprocess
+from .artifact_cache import hash_artifacts
 
 logger = get_logger()
 
+CHECKPOINT_VERSION = 1
+CHECKPOINT_FILE = "checkpoint.pkl"
+
 
 class RunStage(IntEnum):
     """Type describing the stages a run can have."""
@@ -90,8 +96,14 @@ class Run:
 
     @classmethod
     def from_file(cls, path):
-        """Restore a run object which was written to the disk."""
-        raise NotImplementedError
+        """Restore a run object which was written to the disk (see save_checkpoint)."""
+        with open(path, "rb") as handle:
+            data = pickle.load(handle)
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise RuntimeError(f"Incompatible run checkpoint: {path}")
+        run = data["run"]
+        assert isinstance(run, cls)
+        return run
 
     def __init__(
         self,
@@ -141,6 +153,8 @@ class Run:
         # self.lock = threading.Lock()  # FIXME: use mutex instead of boolean
         self.locked = False
         self.report = None
+        self.artifact_cache = None
+        self.cache_keys = {}
 
     def process_features(self, features):
         """Utility which handles postprocess_features."""
@@ -320,7 +334,7 @@ class Run:
         result = cls.__new__(cls)
         memo[id(self)] = result
         for k, v in self.__dict__.items():
-            if k == "session":
+            if k in ["session", "artifact_cache"]:
                 setattr(result, k, v)
             else:
                 setattr(result, k, copy.deepcopy(v, memo))
@@ -641,22 +655,62 @@ class Run:
         """Utility not implemented yet. (TODO: remove?)"""
         raise NotImplementedError
 
+    def get_cache_key(self, stage, inputs, parent=None, with_target=True):
+        """Determine the artifact cache key of a stage based on its inputs and the involved components."""
+        components = list(self.features)
+        if stage == RunStage.BUILD:
+            components += list(self.frontends) + [self.framework, self.backend, self.build_platform]
+        else:
+            components += [self.compile_platform] if parent else list(self.frontends) + [self.compile_platform]
+        if with_target:
+            components.append(self.target)
+        configs = {
+            f"{type(component).__name__}.{component.name}": component.config
+            for component in components
+            if component is not None
+        }
+        return self.artifact_cache.get_key(RunStage(stage).name, hash_artifacts(inputs), parent, configs=configs)
+
+    def cached_generate(self, stage, func, inputs, parent=None, with_target=True):
+        """Helper which skips the generation of artifacts if a matching artifact cache entry exists.
+
+        Returns
+        -------
+        artifacts : dict or list
+            The generated (or restored) artifacts.
+        key : str
+            The used cache key (None if the artifact cache is disabled).
+        """
+        if self.artifact_cache is None:
+            return func(), None
+        key = self.get_cache_key(stage, inputs, parent=parent, with_target=with_target)
+        artifacts = self.artifact_cache.lookup(key)
+        if artifacts is not None:
+            logger.debug("%s Restored artifacts of stage %s from cache", self.prefix, RunStage(stage).name)
+            return artifacts, key
+        artifacts = func()
+        self.artifact_cache.store(key, artifacts)
+        return artifacts, key
+
+    def get_stage_dir(self, stage, name="default"):
+        """Get the directory where the artifacts of the given stage (and sub) are exported to."""
+        dest = self.dir
+        if self.stage_subdirs:
+            stage_idx = int(stage)
+            dest = dest / "stages" / str(stage_idx)
+            # TODO: stages.txt for mapping between stage idx and name
+        if name not in ["", "default"]:
+            dest = dest / "sub" / name
+        return dest
+
     def export_stage(self, stage, optional=False):
         """Export stage artifacts of this run to its directory."""
-        # TODO: per stage subdirs?
-        subdir = self.stage_subdirs
         if stage in self.artifacts_per_stage:
             for name in self.artifacts_per_stage[stage]:
                 artifacts = self.artifacts_per_stage[stage][name]
                 for artifact in artifacts:
                     if not artifact.optional or optional:
-                        dest = self.dir
-                        if subdir:
-                            stage_idx = int(stage)
-                            dest = dest / "stages" / str(stage_idx)
-                            # TODO: stages.txt for mapping between stage idx and name
-                        if name not in ["", "default"]:
-                            dest = dest / "sub" / name
+                        dest = self.get_stage_dir(stage, name)
                         dest.mkdir(parents=True, exist_ok=True)
                         extract = artifact.fmt in [ArtifactFormat.MLF, ArtifactFormat.ARCHIVE]
                         # extract = artifact.fmt == ArtifactFormat.MLF
@@ -736,6 +790,8 @@ class Run:
             self.export_stage(RunStage.COMPILE, optional=self.export_optional)
             for name in self.artifacts_per_stage[RunStage.COMPILE]:
                 elf_artifact = self.artifacts_per_stage[RunStage.COMPILE][name][0]
+                # Allows the target to place large artifacts (i.e. instruction logs) at their final location
+                self.target.output_dir = self.get_stage_dir(RunStage.RUN, name) if self.dir is not None else None
                 artifacts = self.target.generate_artifacts(elf_artifact.path)
                 if isinstance(artifacts, dict):
                     new = {
@@ -755,6 +811,7 @@ class Run:
             self.export_stage(RunStage.BUILD, optional=self.export_optional)
             for name in self.artifacts_per_stage[RunStage.BUILD]:
                 shared_object_artifact = self.artifacts_per_stage[RunStage.BUILD][name][0]
+                self.target.output_dir = self.get_stage_dir(RunStage.RUN, name) if self.dir is not None else None
                 artifacts = self.target.generate_artifacts(shared_object_artifact.path)
                 if isinstance(artifacts, dict):
                     new = {
@@ -785,12 +842,14 @@ class Run:
             self.export_stage(RunStage.BUILD, optional=self.export_optional)
             self.artifacts_per_stage[RunStage.COMPILE] = {}
             for name in self.artifacts_per_stage[RunStage.BUILD]:
-                codegen_dir = self.dir if not self.stage_subdirs else (self.dir / "stages" / str(int(RunStage.BUILD)))
-                if name not in ["", "default"]:
-                    codegen_dir = codegen_dir / "sub" / name
+                codegen_dir = self.get_stage_dir(RunStage.BUILD, name)
+                parent_key = self.cache_keys.get((RunStage.BUILD, name))
                 # TODO!
-                artifacts = self.compile_platform.generate_artifacts(
-                    codegen_dir, self.target
+                artifacts, cache_key = self.cached_generate(
+                    RunStage.COMPILE,
+                    lambda: self.compile_platform.generate_artifacts(codegen_dir, self.target),
+                    [] if parent_key else self.get_all_sub_artifacts(name, RunStage.BUILD),
+                    parent=parent_key,
                 )  # TODO: has to go into different dirs
                 # artifacts = self.compile_platform.artifacts
                 if isinstance(artifacts, dict):
@@ -805,13 +864,19 @@ class Run:
                 else:
                     new = {name if name in ["", "default"] else f"{name}": artifacts}
                 self.artifacts_per_stage[RunStage.COMPILE].update(new)
+                if cache_key:
+                    self.cache_keys.update({(RunStage.COMPILE, key): cache_key for key in new.keys()})
                 self.sub_parents.update({(RunStage.COMPILE, key): (self.last_stage, name) for key in new.keys()})
         else:
             assert self.completed[RunStage.LOAD]
             self.artifacts_per_stage[RunStage.COMPILE] = {}
             codegen_dir = self.dir if not self.stage_subdirs else (self.dir / "stages" / str(int(RunStage.BUILD)))
             name = "default"
-            artifacts = self.compile_platform.generate_artifacts(codegen_dir, self.target)
+            artifacts, _ = self.cached_generate(
+                RunStage.COMPILE,
+                lambda: self.compile_platform.generate_artifacts(codegen_dir, self.target),
+                self.artifacts_per_stage[RunStage.LOAD].get(name, []),
+            )
             if isinstance(artifacts, dict):
                 new = {
                     key if name in ["", "default"] else (f"{name}_{key}" if key not in ["", "default"] else name): value
@@ -846,9 +911,13 @@ class Run:
                 optimized_schedules=self.target_optimized_schedules,
             )
 
-        def _build():
+        def _build(inputs):
             # TODO: allow raw data as well as filepath in backends
-            artifacts = self.backend.generate_artifacts()
+            # Allows the backend to place large artifacts (i.e. MLF) at their final location right away
+            self.backend.output_dir = self.get_stage_dir(RunStage.BUILD, name) if self.dir is not None else None
+            artifacts, cache_key = self.cached_generate(
+                RunStage.BUILD, self.backend.generate_artifacts, inputs, with_target=target_to_backend
+            )
             if isinstance(artifacts, dict):
                 new = {
                     key if name in ["", "default"] else (f"{name}_{key}" if key not in ["", "default"] else name): value
@@ -858,6 +927,8 @@ class Run:
                 new = {name if name in ["", "default"] else f"{name}": artifacts}
             self.artifacts_per_stage[RunStage.BUILD].update(new)
             self.sub_parents.update({(RunStage.BUILD, key): (self.last_stage, name) for key in new.keys()})
+            if cache_key:
+                self.cache_keys.update({(RunStage.BUILD, key): cache_key for key in new.keys()})
 
         self.artifacts_per_stage[RunStage.BUILD] = {}
         if self.has_stage(RunStage.TUNE):
@@ -909,7 +980,7 @@ class Run:
                     input_types=input_types,
                     output_types=output_types,
                 )
-                _build()
+                _build(tune_stage_artifacts + load_stage_artifacts)
 
         else:
             self.export_stage(RunStage.LOAD, optional=self.export_optional)  # Not required anymore?
@@ -939,7 +1010,7 @@ class Run:
                     input_types=input_types,
                     output_types=output_types,
                 )
-                _build()
+                _build(load_stage_artifacts)
 
         self.sub_names.extend(self.artifacts_per_stage[RunStage.BUILD])
         self.sub_names = list(set(self.sub_names))
@@ -1098,6 +1169,13 @@ class Run:
                     self.failed_stage = run_stage
                     logger.error("%s Run failed at stage '%s', aborting...", self.prefix, run_stage)
                     break
+                if self.session is not None and self.session.checkpoint:
+                    try:
+                        self.save_checkpoint(stage)
+                    except Exception as e:  # The run itself is not affected by a missing checkpoint
+                        logger.warning(
+                            "%s Unable to save checkpoint after stage %s: %s", self.prefix, RunStage(stage).name, e
+                        )
             # self.stage = stage  # FIXME: The stage_func should update the stage intead?
         report = self.get_report()
         if export:
@@ -1106,6 +1184,38 @@ class Run:
             report.export(report_file)
         return report
 
+    def save_checkpoint(self, stage=None):
+        """Write the state of the run to its directory to allow resuming it after an interruption.
+
+        The artifacts of the given stage are exported first, so that the checkpoint only has to hold
+        references to the exported files instead of their contents. Components only store their picklable
+        state, i.e. the callbacks of target features are registered again when the checkpoint is loaded.
+        """
+        if stage is not None:
+            self.export_stage(stage, optional=self.export_optional)
+
+        def _reference(artifact):
+            if artifact.lazy or not artifact.exported or artifact.fmt not in TEXT_FMTS + RAW_FMTS:
+                return artifact
+            if not Path(artifact.path).is_file():
+                return artifact
+            new = copy.copy(artifact)
+            new.uncache()
+            return new
+
+        run = copy.copy(self)
+        run.session = None  # Will be replaced by the resumed session
+        run.artifact_cache = None
+        run.artifacts_per_stage = {
+            stage_: {name: [_reference(artifact) for artifact in artifacts] for name, artifacts in subs.items()}
+            for stage_, subs in self.artifacts_per_stage.items()
+        }
+        filename = Path(self.dir) / CHECKPOINT_FILE
+        # Write to temporary file first to make sure that an interruption does not corrupt the checkpoint
+        with atomic_write(filename, "wb") as handle:
+            pickle.dump({"version": CHECKPOINT_VERSION, "run": run}, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        logger.debug("%s Saved checkpoint after stage %s", self.prefix, RunStage(stage).name if stage else None)
+
     def write_run_file(self):
         """Create a run.txt file which contains information used to reconstruct the run based
         on its properties at a later point in time."""
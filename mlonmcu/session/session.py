@@ -31,11 +31,12 @@ from tqdm import tqdm
 
 from mlonmcu.session.run import Run
 from mlonmcu.logging import get_logger
-from mlonmcu.report import Report
-from mlonmcu.config import filter_config
+from mlonmcu.report import Report, ReportWriter, COLUMNAR_FMTS
+from mlonmcu.config import filter_config, str2bool, str2dict
 
 from .postprocess.postprocess import SessionPostprocess
-from .run import RunStage
+from .run import RunStage, CHECKPOINT_FILE
+from .artifact_cache import ArtifactCache
 
 logger = get_logger()  # TODO: rename to get_mlonmcu_logger
 
@@ -49,14 +50,47 @@ class SessionStatus(Enum):  # TODO: remove?
     ERROR = 3
 
 
+def _process_run(run, until, skip, export):
+    """Helper function to invoke the run inside a worker process.
+
+    The processed run (incl. its artifacts and report) is pickled and sent back to the main process."""
+    if run.artifact_cache is not None:
+        # Only count the lookups of this task, the main process accumulates them
+        run.artifact_cache.hits = 0
+        run.artifact_cache.misses = 0
+    run.process(until=until, skip=skip, export=export)
+    return run
+
+
+def _publish_file(src, dest):
+    """Make an already written file available at a second location without serializing it again."""
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest.is_file() or dest.is_symlink():
+        dest.unlink()
+    try:
+        os.link(src, dest)
+    except OSError:  # e.g. different filesystems
+        shutil.copyfile(src, dest)
+
+
 class Session:
     """A session which wraps around multiple runs in a context."""
 
     DEFAULTS = {
-        "report_fmt": "csv",
+        "report_fmt": "csv",  # Alternatives: xlsx, parquet, feather
+        "partial_report": False,  # Append reports of finished runs to report.partial.<fmt> (columnar formats only)
+        "executor": "thread_pool",  # Alternative: process_pool
+        "pipeline": False,
+        "stage_limits": None,  # Example: {"BUILD": 4, "COMPILE": 2}
+        "artifact_cache": False,
+        "artifact_cache_dir": None,
+        "artifact_cache_max_size": None,  # in bytes
+        "artifact_cache_max_entries": None,
+        "checkpoint": False,  # Save the state of every run after each stage (required for resuming sessions)
     }
 
-    def __init__(self, label="", idx=None, archived=False, dir=None, config=None):
+    def __init__(self, label="", idx=None, archived=False, dir=None, config=None, catalog=None):
         self.timestamp = datetime.now().strftime("%Y%m%dT%H%M%S")
         self.label = (
             label if len(label) > 0 else ("unnamed" + "_" + self.timestamp)
@@ -69,12 +103,23 @@ class Session:
         self.closed_at = None
         self.runs = []
         self.report = None
+        self.report_file = None
         self.next_run_idx = 0
         self.archived = archived
         self.dir = dir
+        self.catalog = catalog
         self.tempdir = None
         self.session_lock = None
 
+    def __getstate__(self):
+        # Only a detached copy of the session is passed to worker processes (see process_runs)
+        state = self.__dict__.copy()
+        state["runs"] = []
+        state["report"] = None
+        state["tempdir"] = None
+        state["session_lock"] = None
+        return state
+
     @property
     def runs_dir(self):
         return None if self.dir is None else (self.dir / "runs")
@@ -100,6 +145,68 @@ class Session:
         """get report_fmt property."""
         return str(self.config["report_fmt"])
 
+    @property
+    def partial_report(self):
+        """get partial_report property."""
+        value = self.config["partial_report"]
+        return str2bool(value)
+
+    @property
+    def checkpoint(self):
+        """get checkpoint property."""
+        value = self.config["checkpoint"]
+        return str2bool(value)
+
+    @property
+    def executor(self):
+        """get executor property."""
+        value = str(self.config["executor"])
+        assert value in ["thread_pool", "process_pool"], f"Unsupported executor: {value}"
+        return value
+
+    @property
+    def pipeline(self):
+        """get pipeline property."""
+        value = self.config["pipeline"]
+        return str2bool(value)
+
+    def get_stage_limits(self, num_workers):
+        """Determine the maximum number of concurrently processed runs per stage used by the pipelined scheduler.
+
+        By default, the number of COMPILE tasks is chosen such that the threads spawned by the compile platforms
+        (see 'mlif.num_threads') do not exceed the available CPU resources. The limits can be overwritten via
+        the 'session.stage_limits' config.
+        """
+        limits = {stage: num_workers for stage in RunStage}
+        compile_threads = max(
+            [run.compile_platform.num_threads for run in self.runs if run.compile_platform is not None], default=1
+        )
+        limits[RunStage.COMPILE] = max(1, min(num_workers, multiprocessing.cpu_count() // compile_threads))
+        user_limits = str2dict(self.config["stage_limits"], allow_none=True)
+        if user_limits:
+            for key, value in user_limits.items():
+                stage = RunStage[key.upper()] if isinstance(key, str) else RunStage(key)
+                limits[stage] = max(1, min(num_workers, int(value)))
+        return limits
+
+    @property
+    def use_artifact_cache(self):
+        """get use_artifact_cache property."""
+        value = self.config["artifact_cache"]
+        return str2bool(value)
+
+    def get_artifact_cache(self, context=None):
+        """Create the persistent artifact cache used for sharing BUILD/COMPILE artifacts between runs."""
+        cache_dir = self.config["artifact_cache_dir"]
+        if cache_dir is None:
+            assert context is not None, "The artifact cache requires a context or session.artifact_cache_dir"
+            cache_dir = context.environment.paths["temp"].path / "cache" / "artifacts"
+        return ArtifactCache(
+            cache_dir,
+            max_size=self.config["artifact_cache_max_size"],
+            max_entries=self.config["artifact_cache_max_entries"],
+        )
+
     def create_run(self, *args, **kwargs):
         """Factory method to create a run and add it to this session."""
         idx = len(self.runs)
@@ -108,6 +215,34 @@ class Session:
         self.runs.append(run)
         return run
 
+    def restore_runs(self):
+        """Restore the runs of an interrupted session from the checkpoints found in its directory.
+
+        Runs without a checkpoint can not be restored and are skipped. Processing the restored runs
+        continues with the first unfinished stage of each run.
+
+        Returns
+        -------
+        int
+            The number of restored runs.
+        """
+        self.runs = []
+        if self.runs_dir is None or not self.runs_dir.is_dir():
+            return 0
+        run_ids = sorted(int(name) for name in os.listdir(self.runs_dir) if name.isdigit())
+        for rid in run_ids:
+            checkpoint_file = self.runs_dir / str(rid) / CHECKPOINT_FILE
+            if not checkpoint_file.is_file():
+                logger.warning(self.prefix + "Unable to restore run %d (no checkpoint found)", rid)
+                continue
+            run = Run.from_file(checkpoint_file)
+            run.session = self
+            run.archived = True  # Keep index and directory of the restored run
+            self.runs.append(run)
+        self.next_run_idx = run_ids[-1] + 1 if len(run_ids) > 0 else 0
+        logger.debug(self.prefix + "Restored %d runs", len(self.runs))
+        return len(self.runs)
+
     #  def update_run(self): # TODO TODO
     #      pass
 
@@ -117,9 +252,7 @@ class Session:
             return self.report
 
         reports = [run.get_report() for run in self.runs]
-        merged = Report()
-        merged.add(reports)
-        return merged
+        return Report.from_reports(reports)
 
     def enumerate_runs(self):
         """Update run indices."""
@@ -162,8 +295,15 @@ class Session:
         progress=False,
         export=False,
         context=None,
+        executor=None,
+        pipeline=None,
     ):
-        """Process a runs in this session until a given stage."""
+        """Process a runs in this session until a given stage.
+
+        If pipeline is enabled, every (run, stage) pair is treated as a task which is dispatched as soon as the
+        previous stage of the same run has finished, while the concurrency of each stage is bounded by the
+        limits returned by get_stage_limits(). This overrules the per_stage option.
+        """
 
         # TODO: Add configurable callbacks for stage/run complete
         assert self.active, "Session needs to be opened first"
@@ -171,6 +311,9 @@ class Session:
         self.enumerate_runs()
         self.report = None
         assert num_workers > 0, "num_workers can not be < 1"
+        executor = executor if executor is not None else self.executor
+        use_processes = executor == "process_pool"
+        pipeline = pipeline if pipeline is not None else self.pipeline
         workers = []
         # results = []
         workers = []
@@ -206,29 +349,118 @@ class Session:
             if progress:
                 _update_progress(pbar)
 
+        def _submit(executor, pbar, run, until, skip):
+            """Helper function to schedule the processing of a run using a thread or process pool."""
+            if not use_processes:
+                return executor.submit(_process, pbar, run, until=until, skip=skip)
+            future = executor.submit(_process_run, run, until, skip, export)
+            if progress:
+                future.add_done_callback(lambda _: _update_progress(pbar))
+            return future
+
+        def _collect(future, run_index):
+            """Helper function to wait for a single worker and update the processed run."""
+            try:
+                result = future.result()
+                if use_processes:
+                    # Replace the run by the processed copy received from the worker process
+                    if artifact_cache is not None and result.artifact_cache is not None:
+                        artifact_cache.hits += result.artifact_cache.hits
+                        artifact_cache.misses += result.artifact_cache.misses
+                    result.session = self
+                    result.artifact_cache = artifact_cache
+                    self.runs[run_index] = result
+                return result
+            except Exception as e:
+                logger.exception(e)
+                logger.error("An exception was thrown by a worker during simulation")
+                if use_processes:
+                    run = self.runs[run_index]
+                    run.failing = True
+                    run.reason = e
+                    run.failed_stage = RunStage(run.next_stage).name
+            return None
+
+        def _flush_partial(run_index):
+            """Helper function to append the report of a finished run to the partial report file."""
+            if partial_writer is None or run_index in flushed:
+                return
+            run = self.runs[run_index]
+            finished = run.failing or all(run.completed[stage] for stage in used_stages if run.has_stage(stage))
+            if not finished:
+                return
+            flushed.add(run_index)
+            try:
+                partial_writer.write(run.get_report())
+            except Exception as e:
+                logger.warning("Failed to flush partial report of run %s: %s", run.idx, e)
+
+        def _check_failure(run_index):
+            """Helper function to keep track of failed runs."""
+            nonlocal num_failures
+            run = self.runs[run_index]
+            if run.failing:
+                num_failures += 1
+                failed_stage = RunStage(run.next_stage).name
+                if failed_stage in stage_failures:
+                    stage_failures[failed_stage].append(run_index)
+                else:
+                    stage_failures[failed_stage] = [run_index]
+            return run.failing
+
         def _join_workers(workers):
             """Helper function to collect all worker threads."""
-            nonlocal num_failures
             results = []
             for i, w in enumerate(workers):
-                try:
-                    results.append(w.result())
-                except Exception as e:
-                    logger.exception(e)
-                    logger.error("An exception was thrown by a worker during simulation")
                 run_index = worker_run_idx[i]
-                run = self.runs[run_index]
-                if run.failing:
-                    num_failures += 1
-                    failed_stage = RunStage(run.next_stage).name
-                    if failed_stage in stage_failures:
-                        stage_failures[failed_stage].append(run_index)
-                    else:
-                        stage_failures[failed_stage] = [run_index]
+                result = _collect(w, run_index)
+                if result is not None:
+                    results.append(result)
+                _check_failure(run_index)
+                _flush_partial(run_index)
             if progress:
                 _close_progress(pbar)
             return results
 
+        def _process_pipelined(executor, stages, skip):
+            """Helper function to schedule the stages of all runs based on their dependencies."""
+            nonlocal pbar
+            limits = self.get_stage_limits(num_workers)
+            logger.debug("%s Stage limits: %s", self.prefix, {RunStage(k).name: v for k, v in limits.items()})
+            tasks = {i: [stage for stage in stages if run.has_stage(stage)] for i, run in enumerate(self.runs)}
+            if progress:
+                pbar = _init_progress(sum(map(len, tasks.values())), msg="Processing stages (pipelined)")
+            else:
+                logger.info("%s Processing all stages (pipelined)", self.prefix)
+            ready = [i for i, remaining in tasks.items() if len(remaining) > 0]
+            running = {}
+            while len(ready) > 0 or len(running) > 0:
+                # Prefer runs which are already further advanced to keep the later stages busy
+                ready.sort(key=lambda i: tasks[i][0], reverse=True)
+                for run_index in list(ready):
+                    if len(running) >= num_workers:
+                        break
+                    stage = tasks[run_index][0]
+                    active = sum(1 for _, stage_ in running.values() if stage_ == stage)
+                    if active >= limits[stage]:
+                        continue
+                    ready.remove(run_index)
+                    future = _submit(executor, pbar, self.runs[run_index], until=stage, skip=skip)
+                    running[future] = (run_index, stage)
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    run_index, _ = running.pop(future)
+                    tasks[run_index].pop(0)
+                    _collect(future, run_index)
+                    _flush_partial(run_index)
+                    if _check_failure(run_index):
+                        if progress:
+                            _update_progress(pbar, len(tasks[run_index]))
+                    elif len(tasks[run_index]) > 0:
+                        ready.append(run_index)
+            if progress:
+                _close_progress(pbar)
+
         def _used_stages(runs, until):
             """Determines the stages which are used by at least one run."""
             used = []
@@ -241,8 +473,28 @@ class Session:
         used_stages = _used_stages(self.runs, until)
         skipped_stages = [stage for stage in RunStage if stage not in used_stages]
 
-        with concurrent.futures.ThreadPoolExecutor(num_workers) as executor:
-            if per_stage:
+        artifact_cache = self.get_artifact_cache(context=context) if self.use_artifact_cache else None
+        for run in self.runs:
+            run.artifact_cache = artifact_cache
+
+        partial_writer = None
+        flushed = set()  # Runs are only appended once to the partial report
+        if self.partial_report:
+            if self.report_fmt in COLUMNAR_FMTS:
+                partial_writer = ReportWriter(Path(self.dir) / f"report.partial.{self.report_fmt}")
+            else:
+                logger.warning("Partial reports are only supported for the formats: %s", ", ".join(COLUMNAR_FMTS))
+
+        if use_processes:
+            # Forking ensures that plugins and extensions registered by the context are available in the workers
+            mp_context = multiprocessing.get_context("fork") if os.name == "posix" else None
+            pool = concurrent.futures.ProcessPoolExecutor(num_workers, mp_context=mp_context)
+        else:
+            pool = concurrent.futures.ThreadPoolExecutor(num_workers)
+        with pool as executor:
+            if pipeline:
+                _process_pipelined(executor, used_stages, skipped_stages)
+            elif per_stage:
                 if progress:
                     pbar2 = _init_progress(len(used_stages), msg="Processing stages")
                 for stage in used_stages:
@@ -271,7 +523,7 @@ class Session:
                             logger.warning("Skiping stage '%s' for failed run", run_stage)
                         else:
                             worker_run_idx.append(i)
-                            workers.append(executor.submit(_process, pbar, run, until=stage, skip=skipped_stages))
+                            workers.append(_submit(executor, pbar, run, until=stage, skip=skipped_stages))
                     _join_workers(workers)
                     workers = []
                     worker_run_idx = []
@@ -307,8 +559,14 @@ class Session:
                                 cpu_count,
                             )
                     worker_run_idx.append(i)
-                    workers.append(executor.submit(_process, pbar, run, until=until, skip=skipped_stages))
+                    workers.append(_submit(executor, pbar, run, until=until, skip=skipped_stages))
                 _join_workers(workers)
+        if partial_writer is not None:
+            partial_writer.close()
+        if artifact_cache is not None:
+            # Eviction only operates on the cache directory, hence it is also valid for process pools
+            logger.info("Artifact cache: %d hits, %d misses", artifact_cache.hits, artifact_cache.misses)
+            artifact_cache.evict()
         if num_failures == 0:
             logger.info("All runs completed successfuly!")
         elif num_failures == num_runs:
@@ -344,9 +602,10 @@ class Session:
                     artifact.export(self.dir)
         report_file = Path(self.dir) / f"report.{self.report_fmt}"
         report.export(report_file)
+        self.report_file = report_file
         results_dir = context.environment.paths["results"].path
         results_file = results_dir / f"{self.label}.{self.report_fmt}"
-        report.export(results_file)
+        _publish_file(report_file, results_file)
         logger.info(self.prefix + "Done processing runs")
         self.report = report
         if print_report:
@@ -405,6 +664,23 @@ class Session:
             raise RuntimeError("Lock on session could not be aquired.") from err
         if not os.path.exists(self.runs_dir):
             os.mkdir(self.runs_dir)
+        if self.catalog is not None:
+            self.catalog.update_session(self.idx, "open")
+
+    def update_catalog(self):
+        """Record the current status, report and runs of the session in the environments session catalog."""
+        if self.catalog is None:
+            return
+        status = {SessionStatus.CLOSED: "closed", SessionStatus.ERROR: "error"}.get(self.status, "open")
+        runs = [
+            (
+                run.idx if run.idx is not None else i,
+                getattr(run, "dir", None) or self.runs_dir / str(i),
+                run.failing,
+            )
+            for i, run in enumerate(self.runs)
+        ]
+        self.catalog.update_session(self.idx, status, report=self.report_file, runs=runs)
 
     def close(self, err=None):
         """Close this run."""
@@ -413,6 +689,7 @@ class Session:
         else:
             self.status = SessionStatus.CLOSED
         self.closed_at = datetime.now()
+        self.update_catalog()
         self.session_lock.release()
         os.remove(self.session_lock.lock_file)
         if self.tempdir:
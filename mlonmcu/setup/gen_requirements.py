@@ -133,6 +133,8 @@ REQUIREMENTS_BY_PIECE: RequirementsByPieceType = [
     ("onnx", ("Requirements for onnx", ["onnx"])),
     # Provide support for relay visualization.
     ("relay-visualization", ("Requirements for relay visualization", ["relayviz"])),
+    # Provide support for columnar (parquet/feather) reports.
+    ("reports", ("Requirements for parquet/feather reports", ["pyarrow"])),
     # Provide support for tflite.
     (
         "tflite",
@@ -239,6 +241,7 @@ CONSTRAINTS = [
     ("pandas", None),
     ("prettytable", None),
     ("psutil", None),
+    ("pyarrow", None),
     ("pyelftools", None),
     ("pygdbmi", "<=0.9.0.2"),
     ("pyparsing", ">=2.0.3,<2.4.0"),
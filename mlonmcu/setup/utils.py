@@ -17,8 +17,11 @@
 # limitations under the License.
 #
 import os
+import re
 import signal
 import sys
+import threading
+import collections
 import multiprocessing
 import subprocess
 
@@ -27,6 +30,7 @@ import tarfile
 import zipfile
 import shutil
 import tempfile
+import contextlib
 import urllib.request
 from pathlib import Path
 from typing import Union, List, Callable, Optional
@@ -188,6 +192,62 @@ def exec_getout(*args, live: bool = False, print_output: bool = False, handle_ex
     )
 
 
+class OutputBuffer:
+    """Collects the output of a subprocess line by line.
+
+    By default all lines are kept in memory. If max_lines is given, only the most recent lines are kept in a
+    ring buffer together with all (older) lines matching keep_pattern, e.g. the '# key: value' lines used for
+    benchmarking. Optionally, the complete output is written to a log file while being collected.
+    """
+
+    def __init__(self, max_lines=None, keep_pattern=None, log_file=None, binary=False):
+        self.lines = collections.deque(maxlen=max_lines)
+        self.max_lines = max_lines
+        self.keep_pattern = re.compile(keep_pattern) if isinstance(keep_pattern, (str, bytes)) else keep_pattern
+        self.kept = []  # (index, line) pairs
+        self.count = 0
+        self.empty = b"" if binary else ""
+        self.log = None
+        if log_file is not None:
+            self.log = open(log_file, "wb") if binary else open(log_file, "w", encoding="utf-8")
+
+    def append(self, line, keep=True):
+        if self.log is not None:
+            self.log.write(line)
+        if not keep:
+            return
+        if self.max_lines is not None and self.keep_pattern is not None and self.keep_pattern.search(line):
+            self.kept.append((self.count, line))
+        self.lines.append(line)
+        self.count += 1
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    @property
+    def dropped(self):
+        """Number of lines which were removed from the ring buffer."""
+        return self.count - len(self.lines)
+
+    def getvalue(self):
+        start = self.dropped
+        kept = [line for idx, line in self.kept if idx < start]
+        return self.empty.join(kept + list(self.lines))
+
+
+def _kill_process_group(process):
+    """Terminate a process including all of its children (requires start_new_session on posix systems)."""
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
 def execute(
     *args: List[str],
     ignore_output: bool = False,
@@ -198,6 +258,11 @@ def execute(
     encoding: Optional[str] = "utf-8",
     stdin_data: Optional[bytes] = None,
     prefix: str = "",
+    timeout: Optional[float] = None,
+    log_file: Optional[Union[str, os.PathLike]] = None,
+    max_lines: Optional[int] = None,
+    keep_pattern: Optional[Union[str, re.Pattern]] = None,
+    line_func: Optional[Callable] = None,
     **kwargs,
 ) -> str:
     """Wrapper for running a program in a subprocess.
@@ -220,6 +285,18 @@ def execute(
         Used encoding for the stdout.
     stdin_data: bytes, optional
         Send this to the stdin of the process.
+    timeout: float, optional
+        Wall-clock timeout in seconds after which the process (and its children) are killed.
+    log_file: str, optional
+        Stream the complete output to this file.
+    max_lines: int, optional
+        Only keep the last lines of the output in memory (plus the ones matching keep_pattern). By default the
+        complete output is kept, i.e. the memory usage is only bounded if max_lines is set.
+    keep_pattern: str, optional
+        Regular expression for lines which should be kept even if max_lines is exceeded.
+    line_func: Callable, optional
+        Function which is called for every line of output while the process is running (e.g. a parser). If it
+        returns True, the line is consumed and not part of the returned output.
     kwargs: dict
         Arbitrary keyword arguments passed through to the subprocess.
 
@@ -234,9 +311,12 @@ def execute(
         logger.debug("- CWD: %s", str(kwargs["cwd"]))
     # if "env" in kwargs:
     #     logger.debug("- ENV: %s", str(kwargs["env"]))
+    if timeout is not None and os.name == "posix":
+        # Run in a separate process group to be able to kill all children on timeout
+        kwargs.setdefault("start_new_session", True)
     if ignore_output:
         assert not live
-        subprocess.run(args, **kwargs, check=True)
+        subprocess.run(args, **kwargs, check=True, timeout=timeout)
         return None
 
     def args_helper(x):
@@ -245,35 +325,65 @@ def execute(
             x = f'"{x}"'
         return x
 
+    def timeout_error():
+        return TimeoutError(
+            "The process did not complete within {} seconds! (CMD: `{}`)".format(
+                timeout, " ".join(list(map(args_helper, args)))
+            )
+        )
+
     out_str = ""
-    if live:
+    streaming = live or log_file is not None or max_lines is not None or line_func is not None
+    if streaming:
+        if stdin_data:
+            raise RuntimeError("stdin_data only supported if live=False")
+            # not working...
+            # process.stdin.write(stdin_data)
+        buffer = OutputBuffer(max_lines=max_lines, keep_pattern=keep_pattern, log_file=log_file, binary=not encoding)
+        timed_out = threading.Event()
         with subprocess.Popen(
             args,
             **kwargs,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
         ) as process:
+            timer = None
+            if timeout is not None:
+
+                def _on_timeout():
+                    timed_out.set()
+                    _kill_process_group(process)
+
+                timer = threading.Timer(timeout, _on_timeout)
+                timer.daemon = True
+                timer.start()
             try:
-                if stdin_data:
-                    raise RuntimeError("stdin_data only supported if live=False")
-                    # not working...
-                    # process.stdin.write(stdin_data)
                 for line in process.stdout:
                     if encoding:
                         line = line.decode(encoding, errors="replace")
                         new_line = prefix + line
                     else:
                         new_line = line
-                    out_str = out_str + new_line
-                    print_func(new_line.replace("\n", ""))
-                exit_code = None
-                while exit_code is None:
-                    exit_code = process.poll()
+                    consumed = line_func(line) if line_func is not None else False
+                    buffer.append(new_line, keep=not consumed)
+                    if live:
+                        print_func(new_line.replace("\n", "") if encoding else new_line)
+                exit_code = process.wait()  # Blocks without polling
+                if timer is not None:
+                    timer.cancel()
+                out_str = buffer.getvalue()
+                if buffer.dropped > 0:
+                    logger.debug("Discarded %d lines of output (max_lines=%d)", buffer.dropped, max_lines)
+                if timed_out.is_set():
+                    err_func(out_str)
+                    raise timeout_error()
                 if handle_exit is not None:
                     out_str_ = out_str
                     if encoding is None:
                         out_str_ = out_str_.decode("utf-8", errors="ignore")
                     exit_code = handle_exit(exit_code, out=out_str_)
+                if exit_code != 0 and not live:  # Live outputs were already printed
+                    err_func(out_str)
                 assert exit_code == 0, "The process returned an non-zero exit code {}! (CMD: `{}`)".format(
                     exit_code, " ".join(list(map(args_helper, args)))
                 )
@@ -281,15 +391,22 @@ def execute(
                 logger.debug("Interrupted subprocess. Sending SIGINT signal...")
                 pid = process.pid
                 os.kill(pid, signal.SIGINT)
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                buffer.close()
     else:
         try:
             p = subprocess.Popen(
                 [i for i in args], **kwargs, stdout=subprocess.PIPE, stdin=subprocess.PIPE, stderr=subprocess.STDOUT
             )
-            if stdin_data:
-                out_str = p.communicate(input=stdin_data)[0]
-            else:
+            try:
+                out_str = p.communicate(input=stdin_data, timeout=timeout)[0]
+            except subprocess.TimeoutExpired:
+                _kill_process_group(p)
                 out_str = p.communicate()[0]
+                err_func(out_str.decode(encoding or "utf-8", errors="replace"))
+                raise timeout_error()
             if encoding:
                 out_str = out_str.decode(encoding, errors="replace")
                 out_str = prefix + out_str
@@ -506,6 +623,62 @@ def copy(src, dest):
     shutil.copy(src, dest)
 
 
+FICLONE = 0x40049409  # Linux ioctl for copy-on-write clones (btrfs, xfs,...)
+
+
+def _reflink(src, dest):
+    import fcntl
+
+    with open(src, "rb") as src_handle, open(dest, "wb") as dest_handle:
+        fcntl.ioctl(dest_handle.fileno(), FICLONE, src_handle.fileno())
+
+
+def clone_file(src, dest, link=True):
+    """Make a file available at a new location with as little I/O as possible.
+
+    Tries a copy-on-write clone (reflink) first and falls back to a hardlink and finally a regular copy.
+    Hardlinks can be disabled via link=False if the source might be modified in place later.
+    """
+    dest = Path(dest)
+    if dest.exists() or dest.is_symlink():
+        if dest.exists() and os.path.samefile(src, dest):
+            return
+        dest.unlink()
+    if sys.platform.startswith("linux"):
+        try:
+            _reflink(src, dest)
+            return
+        except (OSError, ImportError):
+            if dest.exists():
+                dest.unlink()
+    if link:
+        try:
+            os.link(src, dest)
+            return
+        except OSError:
+            pass
+    shutil.copyfile(src, dest)
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w", **kwargs):
+    """Open a temporary file which replaces the given path once it was written completely.
+
+    Parallel readers never see partial files and an interruption does not corrupt an existing file. The
+    temporary file is removed if writing fails.
+    """
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **kwargs) as handle:
+            yield handle
+        os.replace(tmp_name, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_name)
+        raise
+
+
 def symlink(src, dest):
     os.symlink(src, dest)
 
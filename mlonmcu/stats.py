@@ -0,0 +1,173 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Statistics for aggregating the metrics of repeated benchmark executions."""
+import math
+import numbers
+from statistics import NormalDist
+
+import numpy as np
+
+# Metrics containing one of these keywords are aggregated over repetitions
+BENCH_KEYWORDS = ["cycle", "time", "instruction"]
+
+AGGREGATES = {
+    "mean": "Average",
+    "median": "Median",
+    "std": "Std",
+    "min": "Min",
+    "max": "Max",
+    "ci_low": "CI Low",
+    "ci_high": "CI High",
+}
+
+
+def is_bench_metric(name, value=None):
+    """Decide whether a metric should be aggregated over repetitions."""
+    if value is not None and (isinstance(value, bool) or not isinstance(value, numbers.Real)):
+        return False
+    return any(x in name.lower() for x in BENCH_KEYWORDS)
+
+
+def _t_cdf(t, dof):
+    """Cumulative distribution function of the Student's t-distribution for integer degrees of freedom.
+
+    Closed form given by Abramowitz and Stegun (26.7.3, 26.7.4).
+    """
+    theta = math.atan(t / math.sqrt(dof))
+    cos2 = math.cos(theta) ** 2
+    term, total = 1.0, 1.0
+    if dof % 2 == 1:
+        for k in range(1, (dof - 1) // 2):
+            term *= 2 * k / (2 * k + 1) * cos2
+            total += term
+        if dof == 1:
+            total = 0.0
+        return 0.5 + (theta + math.sin(theta) * math.cos(theta) * total) / math.pi
+    for k in range(1, dof // 2):
+        term *= (2 * k - 1) / (2 * k) * cos2
+        total += term
+    return 0.5 + math.sin(theta) / 2 * total
+
+
+# Up to this number of degrees of freedom the quantiles are determined from the exact distribution function
+T_EXACT_DOF = 10
+
+
+def t_quantile(p, dof):
+    """Quantile function of the Student's t-distribution.
+
+    Exact (up to floating point precision) for at most T_EXACT_DOF degrees of freedom. Otherwise a
+    Cornish-Fisher expansion is used, which has a relative error below 0.01% for 0.005 <= p <= 0.995.
+    """
+    assert 0 < p < 1 and dof > 0
+    if dof == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if dof == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    if dof <= T_EXACT_DOF and int(dof) == dof:
+        if p < 0.5:
+            return -t_quantile(1 - p, dof)
+        # Bisection on the distribution function
+        low, high = 0.0, 1.0
+        while _t_cdf(high, int(dof)) < p:
+            low, high = high, 2 * high
+        for _ in range(100):
+            mid = (low + high) / 2
+            if _t_cdf(mid, int(dof)) < p:
+                low = mid
+            else:
+                high = mid
+            if high - low <= 1e-12 * high:
+                break
+        return (low + high) / 2
+    z = NormalDist().inv_cdf(p)
+    return (
+        z
+        + (z**3 + z) / (4 * dof)
+        + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * dof**2)
+        + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * dof**3)
+        + (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / (92160 * dof**4)
+    )
+
+
+def confidence_interval(values, confidence=0.95):
+    """Confidence interval of the mean of the given samples (assuming approximately normal samples)."""
+    values = np.asarray(values, dtype=float)
+    mean = float(np.mean(values))
+    if len(values) < 2:
+        return mean, mean
+    sem = float(np.std(values, ddof=1)) / math.sqrt(len(values))
+    delta = t_quantile(0.5 + confidence / 2, len(values) - 1) * sem
+    return mean - delta, mean + delta
+
+
+def relative_ci_width(values, confidence=0.95):
+    """Width of the confidence interval relative to the mean (inf if it can not be determined yet)."""
+    if len(values) < 2:
+        return math.inf
+    low, high = confidence_interval(values, confidence=confidence)
+    mean = (low + high) / 2
+    if mean == 0:
+        return 0.0 if high == low else math.inf
+    return (high - low) / abs(mean)
+
+
+def summarize(values, confidence=0.95, percentiles=None):
+    """Compute the statistics of the samples of a single metric.
+
+    Returns
+    -------
+    dict
+        Mapping of the labels (see AGGREGATES, Pxx for percentiles) to the respective values.
+    """
+    values = np.asarray(values, dtype=float)
+    assert len(values) > 0, "Can not summarize empty list of samples"
+    low, high = confidence_interval(values, confidence=confidence)
+    stats = {
+        "mean": float(np.mean(values)),
+        "median": float(np.median(values)),
+        "std": float(np.std(values, ddof=1)) if len(values) > 1 else 0.0,
+        "min": float(np.min(values)),
+        "max": float(np.max(values)),
+        "ci_low": low,
+        "ci_high": high,
+    }
+    ret = {AGGREGATES[key]: value for key, value in stats.items()}
+    for p in percentiles if percentiles is not None else []:
+        ret[f"P{p:g}"] = float(np.percentile(values, float(p)))
+    return ret
+
+
+def get_bench_samples(metrics):
+    """Collect the samples of all benchmark metrics of the given list of Metrics objects."""
+    samples = {}
+    for metrics_ in metrics:
+        if isinstance(metrics_, dict):  # Only the default metrics are considered
+            metrics_ = metrics_.get("default")
+        if metrics_ is None:
+            continue
+        for key, value in metrics_.data.items():
+            if is_bench_metric(key, value):
+                samples.setdefault(key, []).append(value)
+    return samples
+
+
+def converged(samples, max_width, confidence=0.95):
+    """Check if the confidence intervals of all metrics (dict of sample lists) are narrow enough."""
+    return all(relative_ci_width(values, confidence=confidence) <= max_width for values in samples.values())
@@ -0,0 +1,229 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Streaming (and optionally compressing) large log files written by external programs."""
+import os
+import io
+import gzip
+import shutil
+import threading
+from pathlib import Path
+from itertools import islice
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+
+def _import_zstandard():
+    try:
+        import zstandard
+    except ImportError as err:
+        raise RuntimeError("Compression with zstd requires zstandard to be installed") from err
+    return zstandard
+
+
+def open_log(path, compress=None, mode="w"):
+    """Open a (compressed) log file for writing in text (w) or binary (wb) mode."""
+    assert mode in ["w", "wb"]
+    if compress is None:
+        return open(path, mode)
+    assert compress in COMPRESSION_SUFFIXES, f"Unsupported compression: {compress}"
+    if compress == "gzip":
+        # Fast compression level, the logs are mostly written once and rarely read
+        handle = gzip.open(path, "wb", compresslevel=1)
+    else:
+        zstandard = _import_zstandard()
+        handle = zstandard.ZstdCompressor(threads=-1).stream_writer(open(path, "wb"), closefd=True)
+    return io.TextIOWrapper(handle) if mode == "w" else handle
+
+
+def read_log(src, compress=None):
+    """Open a (compressed) log file given by a path or binary file object for reading in text mode."""
+    if compress is None:
+        return open(src, "r") if isinstance(src, (str, Path)) else io.TextIOWrapper(src)
+    assert compress in COMPRESSION_SUFFIXES, f"Unsupported compression: {compress}"
+    if compress == "gzip":
+        handle = gzip.open(src, "rb") if isinstance(src, (str, Path)) else gzip.GzipFile(fileobj=src)
+    else:
+        zstandard = _import_zstandard()
+        if isinstance(src, (str, Path)):
+            handle = zstandard.ZstdDecompressor().stream_reader(open(src, "rb"), closefd=True)
+        else:
+            handle = zstandard.ZstdDecompressor().stream_reader(src)
+    return io.TextIOWrapper(handle)
+
+
+class InstructionSampler:
+    """Select a subset of the instructions of a textual instruction log.
+
+    The first skip instructions of the log are ignored. Afterwards instructions are only considered after the
+    start PC was reached and until the stop PC is reached (both optional). Within this region the instructions
+    are split into windows of the given size and only every period-th window is kept (or only the first window
+    if no period is given). The number of considered and kept instructions allows to scale statistics of
+    the sampled log to the whole region.
+
+    Attributes
+    ----------
+    regex : re.Pattern
+        Expression matching instructions in the log (with a named group pc).
+    start : int
+        PC which enables the tracing.
+    stop : int
+        PC which disables the tracing (the instruction at this PC is still included).
+    window : int
+        Number of consecutive instructions per window.
+    period : int
+        Keep one out of period windows.
+    skip : int
+        Number of instructions to ignore before looking for the start PC.
+    """
+
+    def __init__(self, regex, start=None, stop=None, window=None, period=1, skip=0):
+        assert window is None or window > 0, "Sampling window has to be positive"
+        assert period is None or period > 0, "Sampling period has to be positive"
+        assert skip >= 0, "Number of skipped instructions can not be negative"
+        self.regex = regex
+        self.start = start
+        self.stop = stop
+        self.window = window
+        self.period = period
+        self.skip = skip
+        self.active = start is None
+        # RV32 simulators might print sign-extended 64-bit PCs
+        self.mask = 0xFFFFFFFF if max(start or 0, stop or 0) <= 0xFFFFFFFF else 0xFFFFFFFFFFFFFFFF
+        self.total = 0  # Instructions in the log
+        self.considered = 0  # Instructions inside the traced region
+        self.sampled = 0
+
+    def _keep(self):
+        if self.window is None:
+            return True
+        if self.period is None:
+            return self.considered < self.window
+        return (self.considered // self.window) % self.period == 0
+
+    def filter(self, lines):
+        """Return the sampled instructions of the given lines. Lines which are no instructions are dropped."""
+        ret = []
+        check_pc = self.start is not None or self.stop is not None
+        for line in lines:
+            match = self.regex.search(line)
+            if match is None:
+                continue
+            self.total += 1
+            if self.total <= self.skip:
+                continue
+            if check_pc:
+                pc = int(match.group("pc"), 16) & self.mask
+                if not self.active and pc == self.start:
+                    self.active = True
+                if not self.active:
+                    continue
+                if pc == self.stop:
+                    self.active = False
+            if self._keep():
+                ret.append(line)
+                self.sampled += 1
+            self.considered += 1
+        return ret
+
+    @property
+    def scale(self):
+        """Factor to extrapolate counts in the sampled log to the traced region."""
+        return self.considered / self.sampled if self.sampled > 0 else 0.0
+
+    def summary(self):
+        return {
+            "start": self.start,
+            "stop": self.stop,
+            "window": self.window,
+            "period": self.period,
+            "skip": self.skip,
+            "total": self.total,
+            "considered": self.considered,
+            "sampled": self.sampled,
+            "scale": self.scale,
+        }
+
+
+class LogStream:
+    """Compress and/or sample a log file while it is being written by an external program (i.e. a simulator).
+
+    A named pipe is created in place of the log file and a background thread compresses (or samples)
+    everything written to it into a file with the respective suffix. Hence the uncompressed log neither needs to
+    fit on the disk nor in memory. On platforms without named pipes the log is compressed after the
+    program has finished.
+
+    Attributes
+    ----------
+    path : Path
+        Path of the log file the program writes to.
+    dest : Path
+        Path of the compressed log.
+    """
+
+    def __init__(self, path, compress=None, sampler=None, chunksize=2**20):
+        assert compress is not None or sampler is not None, "Nothing to do for log stream"
+        self.path = Path(path)
+        self.compress = compress
+        self.sampler = sampler
+        name = self.path.name if sampler is None else f"{self.path.stem}.sampled{self.path.suffix}"
+        if compress is not None:
+            name += COMPRESSION_SUFFIXES[compress]
+        self.dest = self.path.with_name(name)
+        self.chunksize = chunksize
+        self.error = None
+        self.thread = None
+        if hasattr(os, "mkfifo"):
+            os.mkfifo(self.path)
+            self.thread = threading.Thread(target=self._compress, daemon=True)
+            self.thread.start()
+
+    def _compress(self):
+        try:
+            if self.sampler is None:
+                with open(self.path, "rb") as src, open_log(self.dest, compress=self.compress, mode="wb") as dest:
+                    shutil.copyfileobj(src, dest, self.chunksize)
+            else:
+                with open(self.path, "r") as src, open_log(self.dest, compress=self.compress) as dest:
+                    # Chunksize is given in bytes, assume short lines
+                    while True:
+                        lines = list(islice(src, self.chunksize // 64))
+                        if len(lines) == 0:
+                            break
+                        dest.writelines(self.sampler.filter(lines))
+        except Exception as err:  # Raised in finish()
+            self.error = err
+
+    def finish(self):
+        """Wait until the log is fully processed and remove the original file (or pipe)."""
+        if self.thread is None:
+            self.path.touch(exist_ok=True)
+            self._compress()
+        else:
+            while self.thread.is_alive():
+                # Opening the pipe unblocks the reader in case the program never opened the log
+                try:
+                    os.close(os.open(self.path, os.O_WRONLY | os.O_NONBLOCK))
+                except OSError:
+                    pass
+                self.thread.join(timeout=0.1)
+        if self.path.exists():
+            self.path.unlink()
+        if self.error is not None:
+            raise self.error
+        return self.dest
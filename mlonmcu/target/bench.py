@@ -20,27 +20,10 @@
 import re
 import ast
 
+BENCH_REGEX = re.compile(r"# (.+): ([0-9.,E-]+)")
 
-def parse_bench_results(out, allow_missing=False, target_name=None):
-    lines = out.split("\n")
-    for i, line in enumerate(lines):
-        if "Program start." in line:
-            lines = lines[i:]
-            break
-    for i, line in enumerate(lines):
-        search = "Program finish."
-        if target_name and target_name == "ara_rtl":
-            search = "gram finish."
-        if search in line:
-            lines = lines[: i + 1]
-            break
-    out = "\n".join(lines)
-    matches = re.compile(r"# (.+): ([0-9.,E-]+)").findall(out)
-    ret = {}
-    for key, value in matches:
-        value = ast.literal_eval(value)
-        assert isinstance(value, (int, float))
-        ret[key] = value
+
+def _postprocess_results(ret):
     for mode in ["Setup", "Run", "Total"]:
         cycles = ret.get(f"{mode} Cycles", None)
         instructions = ret.get(f"{mode} Instructions", None)
@@ -64,8 +47,72 @@ def parse_bench_results(out, allow_missing=False, target_name=None):
     return ret
 
 
+class BenchParser:
+    """Line-oriented parser for the benchmark results printed by the target software.
+
+    The lines can be fed one by one while the simulation is still running, hence the complete output does
+    not have to be kept in memory. Only '# key: value' lines between the 'Program start.' and 'Program finish.'
+    markers are considered. Additional target-specific patterns (with a single group) can be registered via
+    add_pattern(), their first match is available via get().
+    """
+
+    def __init__(self, target_name=None):
+        self.finish_marker = "gram finish." if target_name == "ara_rtl" else "Program finish."
+        self.started = False
+        self.finished = False
+        self.values = {}
+        self.patterns = {}
+        self.matches = {}
+
+    def add_pattern(self, name, pattern):
+        self.patterns[name] = re.compile(pattern)
+
+    def get(self, name, default=None):
+        return self.matches.get(name, default)
+
+    def feed(self, line):
+        """Process a single line of output."""
+        for name, pattern in self.patterns.items():
+            if name not in self.matches:
+                match = pattern.search(line)
+                if match:
+                    self.matches[name] = match.group(1)
+        if not self.started and "Program start." in line:
+            # Everything printed before the program was started is ignored
+            self.started = True
+            self.finished = False
+            self.values = {}
+        if self.finished:
+            return
+        self.values.update(BENCH_REGEX.findall(line))
+        if self.finish_marker in line:
+            self.finished = True
+
+    def feed_text(self, out):
+        for line in out.split("\n"):
+            self.feed(line)
+
+    def results(self):
+        ret = {}
+        for key, value in self.values.items():
+            value = ast.literal_eval(value)
+            assert isinstance(value, (int, float))
+            ret[key] = value
+        return _postprocess_results(ret)
+
+    def add_metrics(self, metrics):
+        for key, value in self.results().items():
+            optional = "Total" not in key
+            metrics.add(key, value, optional)
+
+
+def parse_bench_results(out, allow_missing=False, target_name=None):
+    parser = BenchParser(target_name=target_name)
+    parser.feed_text(out)
+    return parser.results()
+
+
 def add_bench_metrics(out, metrics, allow_missing=False, target_name=None):
-    results = parse_bench_results(out, allow_missing=allow_missing, target_name=target_name)
-    for key, value in results.items():
-        optional = "Total" not in key
-        metrics.add(key, value, optional)
+    parser = BenchParser(target_name=target_name)
+    parser.feed_text(out)
+    parser.add_metrics(metrics)
@@ -0,0 +1,255 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Scheduling of executions on a farm of equivalent remote devices (i.e. SSH hosts or TVM RPC servers)."""
+import os
+import time
+import socket
+import tempfile
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+from filelock import FileLock, Timeout
+
+from mlonmcu.config import str2list
+from mlonmcu.logging import get_logger
+
+logger = get_logger()
+
+
+class Device:
+    """A remote device which can handle up to capacity executions at the same time."""
+
+    def __init__(self, hostname, port=None, capacity=1):
+        self.hostname = hostname
+        self.port = int(port) if port is not None else None
+        self.capacity = int(capacity)
+        assert self.capacity > 0, "Device capacity has to be positive"
+
+    @classmethod
+    def from_str(cls, value, default_port=None):
+        """Parse a device definition of the form 'hostname[:port][*capacity]'."""
+        value = value.strip()
+        capacity = 1
+        if "*" in value:
+            value, capacity = value.rsplit("*", 1)
+        port = default_port
+        if ":" in value:
+            value, port = value.rsplit(":", 1)
+        return cls(value, port=port, capacity=capacity)
+
+    @property
+    def name(self):
+        return self.hostname if self.port is None else f"{self.hostname}:{self.port}"
+
+    def __repr__(self):
+        return f"Device({self.name}, capacity={self.capacity})"
+
+    def __eq__(self, other):
+        return isinstance(other, Device) and (self.name, self.capacity) == (other.name, other.capacity)
+
+    def __hash__(self):
+        return hash((self.name, self.capacity))
+
+
+def parse_devices(value, default_port=None):
+    """Convert a list (or comma-separated string) of device definitions into Device objects."""
+    ret = []
+    for item in str2list(value):
+        if isinstance(item, Device):
+            ret.append(item)
+        elif isinstance(item, dict):
+            ret.append(Device(**item))
+        else:
+            ret.append(Device.from_str(str(item), default_port=default_port))
+    return ret
+
+
+def get_device_errors():
+    """Exception types indicating a lost connection to a device (instead of a failure of the executed program)."""
+    ret = [ConnectionError, socket.timeout, socket.gaierror, socket.herror, EOFError]
+    try:
+        import paramiko
+
+        ret.append(paramiko.SSHException)
+    except ImportError:
+        pass
+    return tuple(ret)
+
+
+def check_reachable(device, timeout=5):
+    """Default health check: try to open a TCP connection to the device."""
+    if device.port is None:
+        return True
+    try:
+        with socket.create_connection((device.hostname, device.port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class DeviceLease:
+    """A slot on a device which was handed out by a DevicePool."""
+
+    def __init__(self, device, slot, lock):
+        self.device = device
+        self.slot = slot
+        self.lock = lock
+
+    def release(self):
+        self.lock.release()
+
+
+class DevicePool:
+    """Hands out free slots of a list of equivalent devices.
+
+    The slots are represented by file locks, hence the capacity of each device is respected across
+    threads, worker processes and even concurrent MLonMCU sessions. Devices which failed are skipped for
+    a cooldown period and need to pass a health check before being used again.
+
+    Attributes
+    ----------
+    devices : list
+        The available devices.
+    health_check : callable
+        Function which returns False for devices which should not be used.
+    cooldown : float
+        Seconds to wait before a failed device is considered again.
+    lock_dir : Path
+        Directory for the lock files of the device slots.
+    """
+
+    def __init__(self, devices, health_check=check_reachable, cooldown=60, lock_dir=None, poll_interval=0.5):
+        assert len(devices) > 0, "DevicePool requires at least one device"
+        self.devices = list(devices)
+        self.health_check = health_check
+        self.cooldown = cooldown
+        self.lock_dir = Path(lock_dir) if lock_dir is not None else Path(tempfile.gettempdir()) / "mlonmcu_devices"
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        self.poll_interval = poll_interval
+        self.failed_until = {}
+        self.failures = {}
+        self.next_idx = 0
+        self.mutex = threading.Lock()
+
+    def _candidates(self):
+        now = time.time()
+        with self.mutex:
+            # Rotate the start index to spread the load if multiple devices are free
+            start = self.next_idx
+            self.next_idx = (self.next_idx + 1) % len(self.devices)
+            ordered = self.devices[start:] + self.devices[:start]
+            blocked = [device for device in ordered if self.failed_until.get(device, 0) > now]
+            recovering = [device for device in ordered if device in self.failed_until and device not in blocked]
+        ret = []
+        for device in ordered:
+            if device in blocked:
+                continue
+            if device in recovering:
+                if self.health_check is not None and not self.health_check(device):
+                    self.mark_failed(device)
+                    continue
+                with self.mutex:
+                    self.failed_until.pop(device, None)
+                logger.info("Device %s is available again", device.name)
+            ret.append(device)
+        return ret
+
+    def _try_lease(self, device):
+        for slot in range(device.capacity):
+            name = f"{device.hostname}_{device.port}_{slot}.lock".replace(os.sep, "_")
+            lock = FileLock(self.lock_dir / name)
+            try:
+                lock.acquire(timeout=0)
+            except Timeout:
+                continue
+            return DeviceLease(device, slot, lock)
+        return None
+
+    def acquire(self, timeout=None, exclude=None):
+        """Wait for a free slot on any healthy device."""
+        exclude = exclude if exclude is not None else []
+        start = time.time()
+        while True:
+            candidates = [device for device in self._candidates() if device not in exclude]
+            for device in candidates:
+                lease = self._try_lease(device)
+                if lease is not None:
+                    logger.debug("Leased slot %d of device %s", lease.slot, device.name)
+                    return lease
+            if len(candidates) == 0 and all(device in exclude for device in self.devices):
+                raise RuntimeError("All devices of the pool have failed")
+            if timeout is not None and time.time() - start > timeout:
+                raise RuntimeError(f"No device became available within {timeout}s")
+            time.sleep(self.poll_interval)
+
+    @contextmanager
+    def lease(self, timeout=None, exclude=None):
+        """Context manager returning a device which is exclusively used until leaving the context."""
+        lease = self.acquire(timeout=timeout, exclude=exclude)
+        try:
+            yield lease.device
+        finally:
+            lease.release()
+
+    def mark_failed(self, device):
+        with self.mutex:
+            self.failures[device] = self.failures.get(device, 0) + 1
+            self.failed_until[device] = time.time() + self.cooldown
+        logger.warning("Device %s failed, disabling it for %ss", device.name, self.cooldown)
+
+    def is_device_error(self, device, err):
+        """Decide whether an exception was caused by the device (and not by the executed program).
+
+        Other errors (i.e. local file system errors) are only attributed to the device if it does not pass
+        the health check anymore.
+        """
+        if isinstance(err, get_device_errors()):
+            return True
+        return self.health_check is not None and not self.health_check(device)
+
+    def run(self, func, retries=None, timeout=None):
+        """Call func(device) on a free device, retrying on another device if the used one dropped out."""
+        retries = retries if retries is not None else len(self.devices) - 1
+        failed = []
+        while True:
+            with self.lease(timeout=timeout, exclude=failed) as device:
+                try:
+                    return func(device)
+                except Exception as err:
+                    if not self.is_device_error(device, err) or len(failed) >= retries:
+                        raise
+                    logger.warning("Execution on device %s failed (%s), retrying on another device", device.name, err)
+                    self.mark_failed(device)
+                    failed.append(device)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_device_pool(devices, **kwargs):
+    """Return the (shared) pool for the given list of devices."""
+    key = (os.getpid(), tuple(devices))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = DevicePool(devices, **kwargs)
+            _pools[key] = pool
+    return pool
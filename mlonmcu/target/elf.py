@@ -19,13 +19,20 @@
 #
 """ELF File Tool"""
 
-# import os
-# import sys
+import os
 import csv
+import json
+import hashlib
 import argparse
+import threading
+import functools
+import concurrent.futures
+from pathlib import Path
+
 from elftools.elf import elffile
 
 from mlonmcu.logging import get_logger
+from mlonmcu.setup.utils import atomic_write
 
 logger = get_logger()
 
@@ -36,19 +43,28 @@ Script to gather metrics on static ROM and RAM usage.
 Heavility inspired by get_metrics.py found in the ETISS repository
 """
 
-
-def parseElf(inFile):
-    """Extract static memory usage details from ELF file by mapping each segment."""
-    # TODO: check if this is generic anough for multiple platforms (riscv, arm, x86)
-    # TODO: comare results with `riscv32-unknown-elf-size`
-    m = {}
-    m["rom_rodata"] = 0
-    m["rom_code"] = 0
-    m["rom_misc"] = 0
-    m["ram_data"] = 0
-    m["ram_zdata"] = 0
-
-    ignoreSections = [
+CACHE_VERSION = 1
+
+CATEGORIES = ["rom_rodata", "rom_code", "rom_misc", "ram_data", "ram_zdata"]
+IGNORE = "ignore"
+UNKNOWN = "unknown"
+
+MISC_SECTIONS = frozenset(
+    [
+        ".vectors",
+        "iram0.vectors",
+        ".iram0.vectors",
+        ".init_array",
+        ".fini_array",
+        ".fini",
+        ".init",
+        ".eh_frame",
+        ".eh_frame_hdr",
+    ]
+)
+BSS_SECTIONS = frozenset([".bss", "bss", ".sbss", ".shbss", ".bss.noinit", "noinit"])
+IGNORE_SECTIONS = frozenset(
+    [
         "",
         ".stack",
         ".comment",
@@ -81,14 +97,6 @@ def parseElf(inFile):
         "device_handles",
         "sw_isr_table",
         "device_states",
-        ".mcuboot_header",
-        ".metadata",
-        "ctors",
-        "initlevel",
-        "devices",
-        "device_handles",
-        "sw_isr_table",
-        "device_states",
         ".xt.prop",
         ".xt.lit",
         "k_heap_area",
@@ -108,78 +116,124 @@ def parseElf(inFile):
         # vicuna (ram)
         ".user_align",
     ]
-    ignorePrefixes = [
-        ".gcc_except",
-        ".sdata2",
-        ".debug_",
-        # ARM only:
-        ".ARM",
-        # The following are x86 only:
-        ".note",
-        ".gnu",
-        ".rela",
-        ".plt",
-    ]
-    ignoreSuffixes = [
-        ".table",
-        "dummy",
-        "heap_start",
-        "rom_start",
-        ".info",
-    ]
+)
+IGNORE_PREFIXES = (
+    ".gcc_except",
+    ".sdata2",
+    ".debug_",
+    # ARM only:
+    ".ARM",
+    # The following are x86 only:
+    ".note",
+    ".gnu",
+    ".rela",
+    ".plt",
+)
+IGNORE_SUFFIXES = (
+    ".table",
+    "dummy",
+    "heap_start",
+    "rom_start",
+    ".info",
+)
+
+
+@functools.lru_cache(maxsize=None)
+def classify_section(name):
+    """Map a section name to one of the CATEGORIES (or IGNORE/UNKNOWN).
+
+    The rules are checked in order, hence the result is memoized as the same section names appear in every ELF.
+    """
+    # TODO: check if this is generic anough for multiple platforms (riscv, arm, x86)
+    if name.startswith(".text") or name.endswith(".text") or name == "text":
+        return "rom_code"
+    if name.startswith(".srodata"):
+        return "rom_rodata"
+    if name.startswith(".sdata"):
+        return "ram_data"
+    if name.endswith(".rodata") or name == "rodata":
+        return "rom_rodata"
+    if name in MISC_SECTIONS:
+        return "rom_misc"
+    if name.endswith(".data"):
+        return "ram_data"
+    if name in BSS_SECTIONS or name.endswith(".bss") or name.startswith((".bss", ".sbss")):
+        return "ram_zdata"
+    if name in IGNORE_SECTIONS or name.startswith(IGNORE_PREFIXES) or name.endswith(IGNORE_SUFFIXES):
+        return IGNORE
+    return UNKNOWN
+
+
+def parseElf(inFile):
+    """Extract static memory usage details from ELF file by mapping each segment."""
+    # TODO: comare results with `riscv32-unknown-elf-size`
+    m = {category: 0 for category in CATEGORIES}
 
     with open(inFile, "rb") as f:
         e = elffile.ELFFile(f)
 
         for s in e.iter_sections():
-            if s.name.startswith(".text") or s.name.endswith(".text") or s.name == "text":
-                m["rom_code"] += s.data_size
-            elif s.name.startswith(".srodata"):
-                m["rom_rodata"] += s.data_size
-            elif s.name.startswith(".sdata"):
-                m["ram_data"] += s.data_size
-            elif s.name.endswith(".rodata") or s.name == "rodata":
-                m["rom_rodata"] += s.data_size
-            elif s.name in [
-                ".vectors",
-                "iram0.vectors",
-                ".iram0.vectors",
-                ".init_array",
-                ".fini_array",
-                ".fini",
-                ".init",
-                ".eh_frame",
-                ".eh_frame_hdr",
-            ]:
-                m["rom_misc"] += s.data_size
-            elif s.name.endswith(".data"):
-                m["ram_data"] += s.data_size
-            elif (
-                s.name == ".bss"
-                or s.name == "bss"
-                or s.name == ".sbss"
-                or s.name == ".shbss"
-                or s.name == ".bss.noinit"
-                or s.name.endswith(".bss")
-                or s.name.startswith(".bss")
-                or s.name.startswith(".sbss")
-                or s.name == "noinit"
-            ):
-                m["ram_zdata"] += s.data_size
-            elif s.name in ignoreSections:
-                pass
-            elif any(s.name.startswith(prefix) for prefix in ignorePrefixes):
-                pass
-            elif any(s.name.endswith(suffix) for suffix in ignoreSuffixes):
-                pass
-            elif s.data_size == 0:
-                pass  # No warning for empty sections
-            else:
+            category = classify_section(s.name)
+            if category in m:
+                m[category] += s.data_size
+            elif category == UNKNOWN and s.data_size > 0:  # No warning for empty sections
                 logger.warning("ignored: %s / size: %d", s.name, s.data_size)
 
     return m
 
 
+def analyze_elf(inFile, symbols=True):
+    """Return a detailed breakdown of the static memory usage of an ELF file.
+
+    Returns
+    -------
+    dict
+        The summarized results (see get_results) as well as lists of sections and (sized function and object)
+        symbols with their sizes and categories.
+    """
+    sections = []
+    symbols_ = []
+    with open(inFile, "rb") as f:
+        e = elffile.ELFFile(f)
+        names = []
+        for s in e.iter_sections():
+            names.append(s.name)
+            sections.append({"name": s.name, "category": classify_section(s.name), "size": s.data_size})
+        symtab = e.get_section_by_name(".symtab") if symbols else None
+        if symtab is not None:
+            for sym in symtab.iter_symbols():
+                shndx = sym["st_shndx"]
+                if sym["st_size"] == 0 or not isinstance(shndx, int):
+                    continue
+                if sym["st_info"]["type"] not in ["STT_FUNC", "STT_OBJECT"]:
+                    continue
+                section = names[shndx]
+                symbols_.append(
+                    {
+                        "name": sym.name,
+                        "section": section,
+                        "category": classify_section(section),
+                        "size": sym["st_size"],
+                    }
+                )
+    sizes = {category: 0 for category in CATEGORIES}
+    for section in sections:
+        if section["category"] in sizes:
+            sizes[section["category"]] += section["size"]
+    return {"file": str(inFile), "results": _summarize(sizes), "sections": sections, "symbols": symbols_}
+
+
+def analyze_elfs(files, symbols=True, num_workers=None):
+    """Analyze many ELF files in parallel using a process pool (see analyze_elf)."""
+    func = functools.partial(analyze_elf, symbols=symbols)
+    num_workers = num_workers if num_workers else os.cpu_count()
+    if num_workers == 1 or len(files) <= 1:
+        return list(map(func, files))
+    chunksize = max(1, len(files) // (4 * num_workers))
+    with concurrent.futures.ProcessPoolExecutor(num_workers) as executor:
+        return list(executor.map(func, files, chunksize=chunksize))
+
+
 def printSz(sz, unknown_msg=""):
     """Helper function for printing file sizes."""
     if sz is None:
@@ -209,10 +263,7 @@ def parse_cmdline():
     return elfFile, csvFile
 
 
-def get_results(elfFile):
-    """Converts and returns collected data."""
-    staticSizes = parseElf(elfFile)
-
+def _summarize(staticSizes):
     romSize = sum([size for key, size in staticSizes.items() if key.startswith("rom_")])
     ramSize = sum([size for key, size in staticSizes.items() if key.startswith("ram_")])
 
@@ -228,6 +279,48 @@ def get_results(elfFile):
     return results
 
 
+_results_cache = {}  # ELF content hash -> results
+_results_cache_lock = threading.Lock()
+
+
+def hash_elf(elfFile):
+    """Return the hash of an ELF file used to memoize the results."""
+    hasher = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+    with open(elfFile, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def get_results(elfFile, cache_dir=None):
+    """Converts and returns collected data.
+
+    The results are memoized based on the contents of the ELF file. If a cache_dir is given, they are
+    additionally persisted to be shared across processes and sessions.
+    """
+    key = hash_elf(elfFile)
+    with _results_cache_lock:
+        results = _results_cache.get(key)
+    if results is not None:
+        return dict(results)
+    cache_file = Path(cache_dir) / f"{key}.json" if cache_dir else None
+    if cache_file is not None and cache_file.is_file():
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                results = json.load(f)
+        except ValueError:
+            logger.warning("Ignoring invalid ELF cache entry: %s", cache_file)
+    if results is None:
+        results = _summarize(parseElf(elfFile))
+        if cache_file is not None:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with atomic_write(cache_file, "w", encoding="utf-8") as f:
+                json.dump(results, f)
+    with _results_cache_lock:
+        _results_cache[key] = results
+    return dict(results)
+
+
 def print_results(results):
     """Displaying a fancy overview."""
     print("=== Results ===")
@@ -57,6 +57,8 @@ class COREVOVPSimTarget(RISCVTarget):
 
     FEATURES = RISCVTarget.FEATURES | {"xcorev", "gdbserver", "log_instrs", "trace"}
 
+    PARALLEL_REPEAT = True
+
     DEFAULTS = {
         **RISCVTarget.DEFAULTS,
         "variant": None,
@@ -24,14 +24,13 @@ import csv
 from pathlib import Path
 
 from mlonmcu.logging import get_logger
-from mlonmcu.timeout import exec_timeout
 from mlonmcu.config import str2bool, str2list, str2dict
 from mlonmcu.artifact import Artifact, ArtifactFormat
 from mlonmcu.feature.features import SUPPORTED_TVM_BACKENDS
 from mlonmcu.setup.utils import execute
 from mlonmcu.target.common import cli
 from mlonmcu.target.metrics import Metrics
-from mlonmcu.target.bench import add_bench_metrics
+from mlonmcu.target.bench import BenchParser
 from .riscv import RISCVTarget
 
 logger = get_logger()
@@ -51,6 +50,8 @@ class EtissTarget(RISCVTarget):
         "vanilla_accelerator",
     }
 
+    PARALLEL_REPEAT = True
+
     DEFAULTS = {
         **RISCVTarget.DEFAULTS,
         "gdbserver_enable": False,
@@ -76,6 +77,7 @@ class EtissTarget(RISCVTarget):
         "elen": 32,
         "jit": None,
         "allow_error": False,
+        "max_output_lines": None,  # Limit the stdout kept in memory (metrics are parsed while running)
         "max_block_size": None,
         "enable_xcorevmac": False,
         "enable_xcorevmem": False,
@@ -337,6 +339,11 @@ class EtissTarget(RISCVTarget):
         value = self.config["allow_error"]
         return str2bool(value)
 
+    @property
+    def max_output_lines(self):
+        value = self.config["max_output_lines"]
+        return int(value) if value is not None else None
+
     @property
     def use_run_helper(self):
         value = self.config["use_run_helper"]
@@ -585,27 +592,16 @@ class EtissTarget(RISCVTarget):
         self.write_ini(etiss_ini, override=ini_override)
         etiss_script_args.append("-i" + etiss_ini)
 
-        # if self.timeout_sec > 0:
         script = self.etiss_script if self.use_run_helper else self.etiss_exe
         script = Path(script).resolve()
-        if False:
-            ret = exec_timeout(
-                self.timeout_sec,
-                execute,
-                script,
-                *etiss_script_args,
-                *args,
-                cwd=cwd,
-                **kwargs,
-            )
-        else:
-            ret = execute(
-                script,
-                *etiss_script_args,
-                *args,
-                cwd=cwd,
-                **kwargs,
-            )
+        ret = execute(
+            script,
+            *etiss_script_args,
+            *args,
+            cwd=cwd,
+            timeout=self.timeout_sec if self.timeout_sec > 0 else None,
+            **kwargs,
+        )
         return ret, []
 
     def parse_exit(self, out):
@@ -617,27 +613,34 @@ class EtissTarget(RISCVTarget):
                 exit_code = int(exit_match.group(1))
         return exit_code
 
-    def parse_stdout(self, out, metrics, exit_code=0):
-        add_bench_metrics(out, metrics, exit_code != 0, target_name=self.name)
-        error_match = re.search(r"ETISS: Error: (.*)", out)
-        if error_match:
-            error_msg = error_match.group(1)
+    def get_bench_parser(self):
+        parser = BenchParser(target_name=self.name)
+        parser.add_pattern("error", r"ETISS: Error: (.*)")
+        parser.add_pattern("sim_insns", r"CPU Cycles \(estimated\): (.*)")
+        parser.add_pattern("mips", r"MIPS \(estimated\): (.*)")
+        return parser
+
+    def parse_stdout(self, out, metrics, exit_code=0, parser=None):
+        if parser is None:
+            parser = self.get_bench_parser()
+            parser.feed_text(out)
+        parser.add_metrics(metrics)
+        error_msg = parser.get("error")
+        if error_msg is not None:
             if self.allow_error:
                 logger.error(f"An ETISS Error occured during simulation: {error_msg}")
             else:
                 raise RuntimeError(f"An ETISS Error occured during simulation: {error_msg}")
-        sim_insns = re.search(r"CPU Cycles \(estimated\): (.*)", out)
-        sim_insns = int(float(sim_insns.group(1)))
+        sim_insns = int(float(parser.get("sim_insns")))
         metrics.add("Simulated Instructions", sim_insns, True)
         mips = None  # TODO: parse mips?
-        mips_match = re.search(r"MIPS \(estimated\): (.*)", out)
-        if mips_match:
-            mips_str = mips_match.group(1)
+        mips_str = parser.get("mips")
+        if mips_str is not None:
             mips = float(mips_str)
         if mips:
             metrics.add("MIPS", mips, optional=True)
 
-    def get_metrics(self, elf, directory, *args, handle_exit=None):
+    def get_metrics(self, elf, directory, *args, handle_exit=None, line_funcs=None):
         out = ""
         if self.trace_memory:
             trace_file = os.path.join(directory, "dBusAccess.csv")
@@ -661,21 +664,47 @@ class EtissTarget(RISCVTarget):
             return temp
 
         artifacts = []
+        # The output is parsed while the simulation is running
+        parser = self.get_bench_parser()
+        line_funcs = line_funcs or []
+
+        def _feed(line):
+            parser.feed(line)
+            # Lines consumed by a feature (i.e. instruction logs) are not kept in the output
+            consumed = False
+            for func in line_funcs:
+                consumed = func(line) or consumed
+            return consumed
 
         if self.print_outputs:
-            out_, artifacts_ = self.exec(elf, *args, cwd=directory, live=True, handle_exit=_handle_exit)
+            out_, artifacts_ = self.exec(
+                elf,
+                *args,
+                cwd=directory,
+                live=True,
+                handle_exit=_handle_exit,
+                line_func=_feed,
+                max_lines=self.max_output_lines,
+            )
             out += out_
             artifacts += artifacts_
         else:
             out_, artifacts_ = self.exec(
-                elf, *args, cwd=directory, live=False, print_func=lambda *args, **kwargs: None, handle_exit=_handle_exit
+                elf,
+                *args,
+                cwd=directory,
+                live=False,
+                print_func=lambda *args, **kwargs: None,
+                handle_exit=_handle_exit,
+                line_func=_feed,
+                max_lines=self.max_output_lines,
             )
             out += out_
             artifacts += artifacts_
         # TODO: get exit code
         exit_code = 0
         metrics = Metrics()
-        self.parse_stdout(out, metrics, exit_code=exit_code)
+        self.parse_stdout(out, metrics, exit_code=exit_code, parser=parser)
 
         get_metrics_args = [elf]
         etiss_ini = os.path.join(directory, "custom.ini")
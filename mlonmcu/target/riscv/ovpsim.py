@@ -59,6 +59,8 @@ class OVPSimTarget(RVPTarget, RVVTarget):
 
     FEATURES = RVPTarget.FEATURES | RVVTarget.FEATURES | {"gdbserver", "log_instrs", "trace"}
 
+    PARALLEL_REPEAT = True
+
     DEFAULTS = {
         **RVPTarget.DEFAULTS,
         **RVVTarget.DEFAULTS,
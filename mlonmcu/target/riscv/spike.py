@@ -73,6 +73,8 @@ class SpikeTarget(RVPTarget, RVVTarget, RVBTarget):
 
     FEATURES = RVPTarget.FEATURES | RVVTarget.FEATURES | RVBTarget.FEATURES | {"cachesim", "log_instrs"}
 
+    PARALLEL_REPEAT = True
+
     DEFAULTS = {
         **RVPTarget.DEFAULTS,
         **RVVTarget.DEFAULTS,
@@ -140,9 +142,6 @@ class SpikeTarget(RVPTarget, RVVTarget, RVBTarget):
             # assert self.vlen == 0
             pass
 
-        if self.timeout_sec > 0:
-            raise NotImplementedError
-
         ret = execute(
             self.spike_exe.resolve(),
             *spike_args,
@@ -151,6 +150,7 @@ class SpikeTarget(RVPTarget, RVVTarget, RVBTarget):
             program,
             *args,
             cwd=cwd,
+            timeout=self.timeout_sec if self.timeout_sec > 0 else None,
             **kwargs,
         )
         return ret, []
@@ -0,0 +1,232 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Pool of persistent SSH connections shared by the SSH targets of all runs in a process."""
+import os
+import atexit
+import threading
+import posixpath
+from contextlib import contextmanager
+
+import paramiko
+
+from mlonmcu.logging import get_logger
+
+logger = get_logger()
+
+
+class SSHConnection:
+    """A single established SSH connection with a lazily opened (and reused) SFTP channel."""
+
+    def __init__(self, hostname, port=22, username=None, password=None, ignore_known_hosts=True, keepalive=30):
+        self.client = paramiko.SSHClient()
+        # self.client.load_host_keys(os.path.expanduser(os.path.join("~", ".ssh", "known_hosts")))
+        if ignore_known_hosts:
+            self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self.client.connect(hostname, port=port, username=username, password=password)
+        if keepalive:
+            self.client.get_transport().set_keepalive(int(keepalive))
+        self._sftp = None
+        self.known_dirs = set()
+
+    @property
+    def alive(self):
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+    @property
+    def sftp(self):
+        if self._sftp is None:
+            self._sftp = self.client.open_sftp()
+        return self._sftp
+
+    def makedirs(self, path, remember=True):
+        """Create a remote directory including its parents (without additional roundtrips for known dirs).
+
+        Short-lived directories (i.e. the working directory of a single execution) should not be remembered to
+        keep the set of known dirs bounded.
+        """
+        path = str(path)
+        leaf = path
+        missing = []
+        while path not in ("", "/") and path not in self.known_dirs:
+            try:
+                self.sftp.stat(path)
+                break
+            except FileNotFoundError:
+                missing.append(path)
+                path = posixpath.dirname(path)
+        for directory in reversed(missing):
+            self.sftp.mkdir(directory)
+        self.known_dirs.update(missing)
+        if path not in ("", "/"):
+            self.known_dirs.add(path)
+        if not remember:
+            self.known_dirs.discard(leaf)
+
+    def put(self, files):
+        """Upload a list of (src, dest) tuples using the shared SFTP channel."""
+        for src, dest in files:
+            self.sftp.put(str(src), str(dest))
+
+    def get(self, files):
+        """Download a list of (src, dest) tuples using the shared SFTP channel."""
+        for src, dest in files:
+            self.sftp.get(str(src), str(dest))
+
+    def exec_command(self, command, print_func=None):
+        """Execute a command and stream its (combined) output line by line.
+
+        Returns
+        -------
+        tuple
+            The exit status of the command and the captured output.
+        """
+        channel = self.client.get_transport().open_session()
+        try:
+            channel.set_combine_stderr(True)
+            channel.exec_command(command)
+            lines = []
+            with channel.makefile("r") as stdout:
+                for line in stdout:
+                    line = line.decode(errors="replace") if isinstance(line, bytes) else line
+                    lines.append(line)
+                    if print_func is not None:
+                        print_func(line.rstrip("\n"))
+            return channel.recv_exit_status(), "".join(lines)
+        finally:
+            channel.close()
+
+    def close(self):
+        if self._sftp is not None:
+            try:
+                self._sftp.close()
+            except Exception:  # Connection might be broken already
+                pass
+            self._sftp = None
+        self.client.close()
+
+
+class SSHConnectionPool:
+    """Pool of connections to the same host/port/user. Connections are established on demand and reused."""
+
+    def __init__(self, hostname, port=22, username=None, password=None, ignore_known_hosts=True, keepalive=30):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.ignore_known_hosts = ignore_known_hosts
+        self.keepalive = keepalive
+        self.max_connections = None
+        self.idle = []
+        self.num_connections = 0
+        self.cond = threading.Condition()
+
+    def _acquire(self):
+        with self.cond:
+            while True:
+                while len(self.idle) > 0:
+                    conn = self.idle.pop()
+                    if conn.alive:
+                        return conn
+                    self.num_connections -= 1
+                    conn.close()
+                if self.max_connections is None or self.num_connections < self.max_connections:
+                    self.num_connections += 1
+                    break
+                self.cond.wait()
+        try:
+            logger.debug("Connecting to %s@%s:%d", self.username, self.hostname, self.port)
+            return SSHConnection(
+                self.hostname,
+                port=self.port,
+                username=self.username,
+                password=self.password,
+                ignore_known_hosts=self.ignore_known_hosts,
+                keepalive=self.keepalive,
+            )
+        except Exception:
+            with self.cond:
+                self.num_connections -= 1
+                self.cond.notify()
+            raise
+
+    def _release(self, conn, broken=False):
+        with self.cond:
+            if broken:
+                self.num_connections -= 1
+            else:
+                self.idle.append(conn)
+            self.cond.notify()
+        if broken:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection from the pool (connections which raised an error are discarded)."""
+        conn = self._acquire()
+        try:
+            yield conn
+        except Exception:
+            self._release(conn, broken=True)
+            raise
+        self._release(conn)
+
+    def close(self):
+        with self.cond:
+            idle = self.idle
+            self.idle = []
+            self.num_connections -= len(idle)
+        for conn in idle:
+            conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(
+    hostname, port=22, username=None, password=None, ignore_known_hosts=True, keepalive=30, max_connections=None
+):
+    """Return the (shared) connection pool for the given host, port and user."""
+    # Connections can not be shared with forked processes
+    key = (os.getpid(), hostname, port, username)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SSHConnectionPool(
+                hostname,
+                port=port,
+                username=username,
+                password=password,
+                ignore_known_hosts=ignore_known_hosts,
+                keepalive=keepalive,
+            )
+            _pools[key] = pool
+        if max_connections is not None:
+            pool.max_connections = int(max_connections)
+    return pool
+
+
+@atexit.register
+def shutdown_connection_pools():
+    with _pools_lock:
+        pools = [pool for key, pool in _pools.items() if key[0] == os.getpid()]
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -20,15 +20,20 @@
 
 import os
 import re
+import uuid
+import shlex
 
 # import tempfile
 # import time
-from pathlib import Path
-
-import paramiko
+from pathlib import Path, PurePosixPath
 
 from mlonmcu.config import str2bool
+from mlonmcu.logging import get_logger
 from .target import Target
+from .ssh_pool import get_connection_pool
+from .device_pool import parse_devices, get_device_pool
+
+logger = get_logger()
 
 
 class SSHTarget(Target):
@@ -41,7 +46,13 @@ class SSHTarget(Target):
         "username": None,
         "password": None,
         "ignore_known_hosts": True,
-        "workdir": None,
+        "workdir": None,  # Base directory for the remote working directories of the runs (default: /tmp)
+        "cleanup_workdir": True,
+        "keepalive": 30,  # Interval for SSH keep-alive messages in seconds
+        "max_connections": None,  # Maximum number of parallel connections per host
+        "hosts": None,  # List of equivalent hosts ('hostname[:port][*capacity]') used instead of hostname/port
+        "lease_timeout": None,  # Maximum time to wait for a free host in seconds
+        "device_cooldown": 60,  # Failed hosts are skipped for this number of seconds
     }
 
     @property
@@ -82,6 +93,54 @@ class SSHTarget(Target):
             assert isinstance(value, Path)
         return value
 
+    @property
+    def cleanup_workdir(self):
+        value = self.config["cleanup_workdir"]
+        return str2bool(value)
+
+    @property
+    def keepalive(self):
+        value = self.config["keepalive"]
+        return int(value) if value is not None else None
+
+    @property
+    def max_connections(self):
+        value = self.config["max_connections"]
+        return int(value) if value is not None else None
+
+    @property
+    def hosts(self):
+        value = self.config["hosts"]
+        if value is None:
+            return None
+        return parse_devices(value, default_port=self.port)
+
+    @property
+    def lease_timeout(self):
+        value = self.config["lease_timeout"]
+        return float(value) if value is not None else None
+
+    @property
+    def device_cooldown(self):
+        value = self.config["device_cooldown"]
+        return float(value)
+
+    def get_connection_pool(self, hostname=None, port=None):
+        return get_connection_pool(
+            hostname if hostname is not None else self.hostname,
+            port=port if port is not None else self.port,
+            username=self.username,
+            password=self.password,
+            ignore_known_hosts=self.ignore_known_hosts,
+            keepalive=self.keepalive,
+            max_connections=self.max_connections,
+        )
+
+    def get_remote_workdir(self):
+        """Return a unique remote directory, so that parallel runs do not overwrite each others files."""
+        base = PurePosixPath(self.workdir) if self.workdir is not None else PurePosixPath("/tmp")
+        return base / f"mlonmcu_{uuid.uuid4().hex[:12]}"
+
     def __repr__(self):
         return f"SSHTarget({self.name})"
 
@@ -96,19 +155,14 @@ class SSHTarget(Target):
     #         return False
     #     raise NotImplementedError
 
-    def create_remote_directory(self, ssh, path):
-        command = f"mkdir -p {path}"
-        stdin, stdout, stderr = ssh.exec_command(command)
+    def create_remote_directory(self, ssh, path, remember=True):
+        ssh.makedirs(path, remember=remember)
 
     def copy_to_remote(self, ssh, src, dest):
-        sftp = ssh.open_sftp()
-        sftp.put(str(src), str(dest))
-        sftp.close()
+        ssh.put([(src, dest)])
 
     def copy_from_remote(self, ssh, src, dest):
-        sftp = ssh.open_sftp()
-        sftp.get(str(src), str(dest))
-        sftp.close()
+        ssh.get([(src, dest)])
 
     def parse_exit(self, out):
         exit_code = super().parse_exit(out)
@@ -117,32 +171,55 @@ class SSHTarget(Target):
             exit_code = int(exit_match.group(1))
         return exit_code
 
-    def exec_via_ssh(self, program: Path, *args, cwd=os.getcwd(), **kwargs):
-        # TODO: keep connection established!
-        # self.check_remote()
-        with paramiko.SSHClient() as ssh:
-            # ssh.load_host_keys(os.path.expanduser(os.path.join("~", ".ssh", "known_hosts")))
-            if self.ignore_known_hosts:
-                ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(self.hostname, port=self.port, username=self.username, password=self.password)
-            if self.workdir is None:
-                raise NotImplementedError("temp workdir")
-            else:
-                self.create_remote_directory(ssh, self.workdir)
-                workdir = self.workdir
-            remote_program = workdir / program.name
-            self.copy_to_remote(ssh, program, remote_program)
-            args_str = " ".join(args)
-            command = f"cd {workdir} && chmod +x {remote_program} && {remote_program} {args_str}; echo SSH EXIT=$?"
-            stdin, stdout, stderr = ssh.exec_command(command)
-            # print("stdin", stdin)
-            # print("stdout", stdout)
-            # print("stderr", stderr)
-            output = stderr.read().strip() + stdout.read().strip()
-            output = output.decode()
-            if self.print_outputs:
-                print("output", output)  # TODO: cleanup
-        return output
-
-
-# TODO: logger
+    def exec_via_ssh(
+        self, program: Path, *args, cwd=os.getcwd(), live=False, print_func=print, extra_files=None, **kwargs
+    ):
+        """Execute a program on the remote host using a pooled connection.
+
+        The program (and optional extra files) are uploaded to a fresh remote directory which is removed
+        afterwards. The output is streamed back while the program is running. If a list of hosts is
+        configured, the execution is scheduled on the first free host and retried on another one if the
+        used host drops out.
+        """
+        hosts = self.hosts
+        if hosts is None:
+            return self._exec_on_host(
+                None, None, program, *args, live=live, print_func=print_func, extra_files=extra_files
+            )
+        pool = get_device_pool(hosts, cooldown=self.device_cooldown)
+
+        def _exec(device):
+            return self._exec_on_host(
+                device.hostname, device.port, program, *args, live=live, print_func=print_func, extra_files=extra_files
+            )
+
+        return pool.run(_exec, timeout=self.lease_timeout)
+
+    def _exec_on_host(self, hostname, port, program, *args, live=False, print_func=print, extra_files=None):
+        program = Path(program)
+        extra_files = extra_files if extra_files is not None else []
+        workdir = self.get_remote_workdir()
+        remote_program = workdir / program.name
+        args_str = " ".join(args)
+        command = f"cd {shlex.quote(str(workdir))} && chmod +x {remote_program} && {remote_program} {args_str}"
+        command += "; ret=$?"
+        if self.cleanup_workdir:
+            command += f"; cd / && rm -rf {shlex.quote(str(workdir))}"
+        command += "; echo SSH EXIT=$ret"
+        live = live or self.print_outputs
+        with self.get_connection_pool(hostname=hostname, port=port).connection() as ssh:
+            # Only the base directory is remembered by the connection, the workdir is unique per execution
+            self.create_remote_directory(ssh, workdir, remember=False)
+            completed = False
+            try:
+                ssh.put([(program, remote_program)] + [(src, workdir / Path(src).name) for src in extra_files])
+                _, output = ssh.exec_command(command, print_func=print_func if live else None)
+                completed = True
+            finally:
+                # The workdir is removed by the command itself, unless it was never started (or interrupted)
+                if not completed and self.cleanup_workdir:
+                    try:
+                        ssh.exec_command(f"rm -rf {shlex.quote(str(workdir))}")
+                    except Exception as err:  # Do not hide the original error
+                        logger.warning("Failed to remove remote directory %s: %s", workdir, err)
+        return output.strip()
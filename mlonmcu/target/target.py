@@ -20,8 +20,10 @@
 
 import os
 import re
+import shutil
 import tempfile
 import time
+import concurrent.futures
 from pathlib import Path
 from typing import List, Tuple
 
@@ -33,12 +35,22 @@ from mlonmcu.feature.type import FeatureType
 from mlonmcu.feature.features import get_matching_features
 from mlonmcu.artifact import Artifact, ArtifactFormat
 from mlonmcu.config import str2bool
+from mlonmcu.logging import get_logger
 
 
 from mlonmcu.setup.utils import execute
 from mlonmcu.target.bench import add_bench_metrics
+from mlonmcu.stats import converged, get_bench_samples
 from .metrics import Metrics
 
+logger = get_logger()
+
+
+def _create_platform_target(platform, name):
+    """Helper to unpickle targets created by a platform (instances of local classes)."""
+    cls = platform.create_target(name)
+    return cls.__new__(cls)
+
 
 class Target:
     """Base target class
@@ -63,8 +75,16 @@ class Target:
     DEFAULTS = {
         "print_outputs": False,
         "repeat": None,
+        "repeat_workers": None,  # Maximum number of repetitions executed concurrently
+        "max_repeat": None,  # Upper limit for adaptive repetition
+        "repeat_ci_width": None,  # Repeat until the relative CI width of all benchmark metrics is below this value
+        "repeat_confidence": 0.95,
     }
 
+    # Targets whose executions are independent and only write to their working directory may
+    # process repetitions (see repeat) in parallel
+    PARALLEL_REPEAT = False
+
     REQUIRED = set()
     OPTIONAL = set()
 
@@ -85,6 +105,7 @@ class Target:
         self.env = os.environ
         self.artifacts = []
         self.dir = None
+        self.output_dir = None
 
     # def init_directory(self, path=None, context=None):
     #     # return False
@@ -101,9 +122,58 @@ class Target:
     def repeat(self):
         return self.config["repeat"]
 
+    @property
+    def repeat_workers(self):
+        value = self.config["repeat_workers"]
+        if value is None:
+            return 1
+        value = int(value)
+        if value > 1 and not self.PARALLEL_REPEAT:
+            logger.warning("Target %s does not support parallel repetitions, executing sequentially", self.name)
+            return 1
+        return max(1, value)
+
+    @property
+    def max_repeat(self):
+        value = self.config["max_repeat"]
+        return int(value) if value is not None else None
+
+    @property
+    def repeat_ci_width(self):
+        value = self.config["repeat_ci_width"]
+        return float(value) if value is not None else None
+
+    @property
+    def repeat_confidence(self):
+        value = self.config["repeat_confidence"]
+        return float(value)
+
     def __repr__(self):
         return f"Target({self.name})"
 
+    def __reduce_ex__(self, protocol):
+        if "<locals>" in type(self).__qualname__ and getattr(self, "platform", None) is not None:
+            # The class can not be pickled by reference, hence it is recreated by the platform
+            return (_create_platform_target, (self.platform, self.name), self.__getstate__())
+        return super().__reduce_ex__(protocol)
+
+    def __getstate__(self):
+        # The callbacks of the features are local functions which can not be pickled (i.e. for process pools)
+        state = self.__dict__.copy()
+        state["pre_callbacks"] = []
+        state["post_callbacks"] = []
+        # The environment of the process is used by default, which is not picklable either
+        state["env"] = None if self.env is os.environ else dict(self.env)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.env is None:
+            self.env = os.environ
+        # Only the callbacks are restored, the feature config was already applied to the target
+        for feature in self.features:
+            feature.add_target_callbacks(self.name, self.pre_callbacks, self.post_callbacks)
+
     def process_features(self, features):
         if features is None:
             return []
@@ -169,27 +239,53 @@ class Target:
 
     def generate(self, elf) -> Tuple[dict, dict]:
         artifacts = []
-        metrics = []
-        total = 1 + (self.repeat if self.repeat else 0)
+        total = 1 + (int(self.repeat) if self.repeat else 0)
+        adaptive = self.repeat_ci_width is not None
+        max_total = 1 + max(self.max_repeat if self.max_repeat is not None else 0, total - 1)
         # We only save the stdout and artifacts of the last execution
         # Collect metrics from all runs to aggregate them in a callback with high priority
-        artifacts_ = []
-        # if self.dir is None:
-        #    self.dir = Path(
         with tempfile.TemporaryDirectory() as temp_dir:
-            for n in range(total):
-                args = []
-                for callback in self.pre_callbacks:
-                    callback(temp_dir, args, directory=temp_dir)
-                if n == total - 1:
-                    temp_dir_ = temp_dir
+
+            def _execute(n):
+                # Every execution gets an isolated working directory, the last one uses temp_dir itself
+                # (unless the number of executions is determined adaptively)
+                if not adaptive and n == total - 1:
+                    temp_dir_ = Path(temp_dir)
                 else:
                     temp_dir_ = Path(temp_dir) / str(n)
                     temp_dir_.mkdir()
-                metrics_, out, artifacts_ = self.get_metrics(elf, temp_dir, *args)
-                metrics.append(metrics_)
+                args = []
+                line_funcs = []
+                for callback in self.pre_callbacks:
+                    # Callbacks may return a function processing the output of the target line by line
+                    line_func = callback(temp_dir_, args, directory=temp_dir_, elf=elf)
+                    if line_func is not None:
+                        line_funcs.append(line_func)
+                kwargs = {"line_funcs": line_funcs} if len(line_funcs) > 0 else {}
+                return (*self.get_metrics(elf, temp_dir_, *args, **kwargs), temp_dir_)
+
+            def _execute_batch(indices):
+                num_workers = min(len(indices), self.repeat_workers)
+                if num_workers > 1:
+                    with concurrent.futures.ThreadPoolExecutor(num_workers) as executor:
+                        return list(executor.map(_execute, indices))
+                return [_execute(n) for n in indices]
+
+            results = _execute_batch(range(total))
+            # Adaptive repetition: execute further batches until the (noisy) measurements are stable enough
+            while adaptive and len(results) < max_total:
+                samples = get_bench_samples([metrics_ for metrics_, _, _, _ in results[1:]])  # Skip warmup
+                if converged(samples, self.repeat_ci_width, confidence=self.repeat_confidence):
+                    break
+                num = min(max(1, self.repeat_workers), max_total - len(results))
+                results += _execute_batch(range(len(results), len(results) + num))
+            if adaptive:
+                logger.debug("%s: Executed %d repetitions", self.name, len(results) - 1)
+            metrics = [metrics_ for metrics_, _, _, _ in results]
+            _, out, artifacts_, last_dir = results[-1]
             for callback in self.post_callbacks:
-                out = callback(out, metrics, artifacts_, directory=temp_dir)
+                out = callback(out, metrics, artifacts_, directory=last_dir)
+            self.adopt_artifacts(artifacts_, temp_dir)
         artifacts.extend(artifacts_)
         if len(metrics) > 1:
             raise RuntimeError("Collected target metrics for multiple runs. Please aggregate them in a callback!")
@@ -204,6 +300,27 @@ class Target:
         artifacts_["default"].append(stdout_artifact)
         return artifacts_, metrics
 
+    def adopt_artifacts(self, artifacts, directory):
+        """Keep file-backed artifacts which reference the temporary working directory of an execution.
+
+        The files are moved to the output directory of the target if available. Otherwise their contents
+        have to be loaded into memory.
+        """
+        for artifact in artifacts:
+            if not artifact.lazy:
+                continue
+            source = Path(artifact.source)
+            if Path(directory) not in source.parents:
+                continue
+            if self.output_dir is None:
+                artifact.cache()
+                artifact.source = None
+            else:
+                dest = Path(self.output_dir) / artifact.name
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(source, dest)
+                artifact.source = dest
+
     def generate_artifacts(self, elf):
         start_time = time.time()
         artifacts, metrics = self.generate(elf)
@@ -0,0 +1,265 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Compact binary format for instruction traces with memory-mapped access.
+
+Layout of a trace file (little endian):
+    header:  magic (8 bytes), version (u32), field mask (u32), number of records (u64),
+             offset (u64) and size (u64) of the name table
+    records: packed fixed-width records with the fields selected by the mask (see TRACE_FIELDS)
+    names:   JSON list of instruction names referenced by the optional name field
+"""
+import re
+import json
+import struct
+from contextlib import nullcontext
+from pathlib import Path
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from elftools.elf.elffile import ELFFile
+
+TRACE_MAGIC = b"MLTRACE\0"
+TRACE_VERSION = 1
+TRACE_HEADER = struct.Struct("<8sIIQQQ")
+
+# Order matters: the bit of every field in the mask is given by its index
+TRACE_FIELDS = {
+    "pc": np.uint64,
+    "encoding": np.uint32,
+    "size": np.uint8,
+    "name": np.uint16,
+    "cycle": np.uint64,
+}
+REQUIRED_FIELDS = ("pc", "encoding")
+
+# Regular expressions with named groups (pc, encoding, name) and the base used for the encodings
+TEXT_TRACE_FORMATS = {
+    "spike": (re.compile(r"core\s+\d+:\s(?P<pc>0x[0-9a-f]+)\s\((?P<encoding>0x[0-9a-f]+)\)\s(?P<name>[\w.]+)"), None),
+    "etiss": (re.compile(r"(?P<pc>0x[0-9a-fA-F]+):\s(?P<name>\S+)\s#\s(?P<encoding>\S+)"), None),
+    "ovpsim": (
+        re.compile(r"riscvOVPsim\/cpu',\s(?P<pc>0x[0-9a-f]+)\(.*\):\s(?P<encoding>[0-9a-f]+)\s+(?P<name>[\w.]+)\s+"),
+        16,
+    ),
+}
+TEXT_TRACE_FORMATS["etiss_pulpino"] = TEXT_TRACE_FORMATS["etiss"]
+# Targets sharing the log format of another target
+TRACE_FORMAT_ALIASES = {"corev_ovpsim": "ovpsim"}
+TEXT_TRACE_FORMATS["corev_ovpsim"] = TEXT_TRACE_FORMATS["ovpsim"]
+
+_NIBBLES = np.zeros(256, dtype=np.uint64)
+for _i, _c in enumerate(b"0123456789abcdef"):
+    _NIBBLES[_c] = _i
+    _NIBBLES[bytes([_c]).upper()[0]] = _i
+
+
+def _parse_ints(values, base=None, bits=32):
+    values = pd.Series(values, dtype=object).str.strip()
+    dtype = np.uint32 if bits <= 32 else np.uint64
+    ret = np.zeros(len(values), dtype=dtype)
+    if len(values) == 0:
+        return ret
+    is_hex = np.ones(len(values), dtype=bool) if base == 16 else values.str.startswith("0x").to_numpy(dtype=bool)
+    if is_hex.any():
+        width = bits // 4
+        digits = values[is_hex].str.replace(r"^0x", "", regex=True).str[-width:].str.rjust(width, "0")
+        chars = np.array(digits.tolist(), dtype=f"S{width}").view(np.uint8).reshape(-1, width)
+        shifts = np.arange(bits - 4, -1, -4, dtype=np.uint64)
+        ret[is_hex] = np.bitwise_or.reduce(_NIBBLES[chars] << shifts, axis=1)
+    if not is_hex.all():
+        digits = values[~is_hex].str.replace(r"^0b", "", regex=True).str[-bits:].str.rjust(bits, "0")
+        chars = np.array(digits.tolist(), dtype=f"S{bits}").view(np.uint8).reshape(-1, bits)
+        shifts = np.arange(bits - 1, -1, -1, dtype=np.uint64)
+        ret[~is_hex] = np.bitwise_or.reduce((chars == ord("1")).astype(np.uint64) << shifts, axis=1)
+    return ret
+
+
+def parse_encodings(values, base=None):
+    """Convert encodings given as strings to an array of (the lower 32 bits of) their integer values.
+
+    Without a base, hexadecimal values need a 0x prefix and all other values are treated as binary numbers.
+    """
+    return _parse_ints(values, base=base, bits=32)
+
+
+def parse_addresses(values):
+    """Convert hexadecimal addresses (with 0x prefix) to an array of 64-bit integers."""
+    return _parse_ints(values, base=16, bits=64)
+
+
+def iter_text_chunks(handle, chunksize):
+    """Read a file handle in blocks of (at most) the given number of lines."""
+    while True:
+        lines = list(islice(handle, chunksize))
+        if len(lines) == 0:
+            break
+        yield "".join(lines)
+
+
+def get_symbol_address(elf, name):
+    """Lookup the address of a symbol (i.e. a function) in an ELF file, used to limit the traced region."""
+    with open(elf, "rb") as handle:
+        symtab = ELFFile(handle).get_section_by_name(".symtab")
+        symbols = symtab.get_symbol_by_name(name) if symtab is not None else None
+        if not symbols:
+            raise RuntimeError(f"Symbol '{name}' not found in {elf}")
+        return symbols[0]["st_value"]
+
+
+def get_trace_dtype(fields):
+    """Return the packed NumPy record type for the given trace fields."""
+    return np.dtype([(field, TRACE_FIELDS[field]) for field in TRACE_FIELDS if field in fields])
+
+
+class TraceWriter:
+    """Append chunks of instruction records to a binary trace file."""
+
+    def __init__(self, path, fields=("pc", "encoding", "size", "name")):
+        assert all(field in fields for field in REQUIRED_FIELDS)
+        unknown = set(fields) - set(TRACE_FIELDS)
+        assert len(unknown) == 0, f"Unsupported trace fields: {unknown}"
+        self.path = Path(path)
+        self.dtype = get_trace_dtype(fields)
+        self.mask = sum(1 << i for i, field in enumerate(TRACE_FIELDS) if field in fields)
+        self.names = {}
+        self.num_records = 0
+        self.handle = open(self.path, "wb")
+        self._write_header(0, 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _write_header(self, names_offset, names_size):
+        header = TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, self.mask, self.num_records, names_offset, names_size)
+        self.handle.write(header)
+
+    def encode_names(self, names):
+        codes, uniques = pd.factorize(np.asarray(names, dtype=object))
+        lookup = np.array([self.names.setdefault(name, len(self.names)) for name in uniques], dtype=np.uint16)
+        assert len(self.names) <= np.iinfo(np.uint16).max, "Too many different instruction names"
+        return lookup[codes] if len(lookup) > 0 else np.zeros(0, dtype=np.uint16)
+
+    def write(self, pc, encoding, size=None, name=None, cycle=None):
+        """Add the given columns (arrays of equal length) to the trace. Missing sizes are derived from the encodings."""
+        records = np.zeros(len(pc), dtype=self.dtype)
+        records["pc"] = pc
+        records["encoding"] = encoding
+        if "size" in self.dtype.names:
+            if size is None:
+                size = np.where(records["encoding"] & 0b11 == 0b11, 4, 2)
+            records["size"] = size
+        if "name" in self.dtype.names:
+            assert name is not None
+            records["name"] = self.encode_names(name)
+        if "cycle" in self.dtype.names:
+            assert cycle is not None
+            records["cycle"] = cycle
+        self.handle.write(records.tobytes())
+        self.num_records += len(records)
+
+    def close(self):
+        if self.handle.closed:
+            return
+        names = json.dumps(list(self.names)).encode("utf-8")
+        names_offset = self.handle.tell()
+        self.handle.write(names)
+        self.handle.seek(0)
+        self._write_header(names_offset, len(names))
+        self.handle.close()
+
+
+class InstructionTrace:
+    """Read-only view of a binary instruction trace given as a path (memory-mapped) or bytes-like object."""
+
+    def __init__(self, source):
+        if isinstance(source, (str, Path)):
+            self.path = Path(source)
+            with open(self.path, "rb") as handle:
+                header = handle.read(TRACE_HEADER.size)
+                num_records, names_offset, names_size = self._parse_header(header)
+                handle.seek(names_offset)
+                names = handle.read(names_size)
+            if num_records > 0:
+                self.records = np.memmap(
+                    self.path, dtype=self.dtype, mode="r", offset=TRACE_HEADER.size, shape=num_records
+                )
+        else:
+            self.path = None
+            buffer = memoryview(source)
+            num_records, names_offset, names_size = self._parse_header(bytes(buffer[: TRACE_HEADER.size]))
+            names = bytes(buffer[names_offset : names_offset + names_size])
+            if num_records > 0:
+                self.records = np.frombuffer(buffer, dtype=self.dtype, count=num_records, offset=TRACE_HEADER.size)
+        if num_records == 0:
+            self.records = np.zeros(0, dtype=self.dtype)
+        self.names = json.loads(names.decode("utf-8")) if names_size > 0 else []
+
+    def _parse_header(self, header):
+        if len(header) < TRACE_HEADER.size:
+            raise RuntimeError("Not a binary instruction trace")
+        magic, version, mask, num_records, names_offset, names_size = TRACE_HEADER.unpack(header)
+        if magic != TRACE_MAGIC:
+            raise RuntimeError("Not a binary instruction trace")
+        if version != TRACE_VERSION:
+            raise RuntimeError(f"Unsupported trace version: {version}")
+        self.fields = [field for i, field in enumerate(TRACE_FIELDS) if mask & (1 << i)]
+        self.dtype = get_trace_dtype(self.fields)
+        return num_records, names_offset, names_size
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, field):
+        return self.records[field]
+
+    def iter_chunks(self, chunksize):
+        """Iterate over the records in slices (views into the memory map)."""
+        for start in range(0, len(self.records), chunksize):
+            yield self.records[start : start + chunksize]
+
+    def decode_names(self, records=None):
+        """Return the instruction names of the given (or all) records."""
+        records = self.records if records is None else records
+        return np.asarray(self.names, dtype=object)[records["name"]]
+
+
+def convert_text_trace(src, dest, fmt, chunksize=2**20, fields=("pc", "encoding", "size", "name")):
+    """Convert a textual instruction log of a simulator (see TEXT_TRACE_FORMATS) to a binary trace.
+
+    The source is either a path or a file-like object. Returns the number of records.
+    """
+    assert fmt in TEXT_TRACE_FORMATS, f"Unsupported trace format: {fmt}"
+    regex, base = TEXT_TRACE_FORMATS[fmt]
+    groups = regex.groupindex
+    handle = nullcontext(src) if hasattr(src, "read") else open(src, "r")
+    with handle as handle, TraceWriter(dest, fields=fields) as writer:
+        for text in iter_text_chunks(handle, chunksize):
+            matches = regex.findall(text)
+            if len(matches) == 0:
+                continue
+            columns = list(zip(*matches))
+            writer.write(
+                parse_addresses(columns[groups["pc"] - 1]),
+                parse_encodings(columns[groups["encoding"] - 1], base=base),
+                name=columns[groups["name"] - 1] if "name" in fields else None,
+            )
+        return writer.num_records
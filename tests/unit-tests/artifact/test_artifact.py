@@ -17,6 +17,10 @@
 # limitations under the License.
 #
 """Unit tests for the artifact submodule."""
+import os
+import tarfile
+
+import pytest
 
 from mlonmcu.artifact import Artifact, ArtifactFormat, lookup_artifacts
 
@@ -36,3 +40,59 @@ def test_lookup_artifacts():
     assert lookup_artifacts(artifacts, fmt=ArtifactFormat.RAW) == [third]
     assert lookup_artifacts(artifacts, flags={"test"}) == [third, fourth]
     assert lookup_artifacts(artifacts, flags={"test", "sw"}) == [third]
+
+
+@pytest.mark.parametrize("fmt", [ArtifactFormat.TEXT, ArtifactFormat.RAW])
+def test_artifact_from_file_lazy(fmt, tmp_path):
+    src = tmp_path / "build" / "out.dump"
+    src.parent.mkdir()
+    src.write_text("foo")
+    artifact = Artifact.from_file("out.dump", src, fmt=fmt)
+    assert artifact.lazy
+    data = "foo" if fmt == ArtifactFormat.TEXT else b"foo"
+    assert (artifact.content if fmt == ArtifactFormat.TEXT else artifact.raw) == data
+    assert artifact.lazy  # Contents are not kept in memory
+    dest = tmp_path / "run"
+    dest.mkdir()
+    artifact.export(dest)
+    assert artifact.path == dest / "out.dump"
+    assert (dest / "out.dump").read_text() == "foo"
+    artifact.cache()
+    assert not artifact.lazy
+    os.remove(src)
+    assert (artifact.content if fmt == ArtifactFormat.TEXT else artifact.raw) == data
+    artifact.uncache()  # Falls back to the exported file
+    assert artifact.lazy
+    assert artifact.source == dest / "out.dump"
+
+
+def test_artifact_from_file_eager(tmp_path):
+    src = tmp_path / "out.hex"
+    src.write_bytes(b"\x00\x01")
+    artifact = Artifact.from_file("out.hex", src, lazy=False)
+    assert not artifact.lazy
+    assert artifact.raw == b"\x00\x01"
+
+
+def test_artifact_export_extracted_archive(tmp_path):
+    build_dir = tmp_path / "build"
+    (build_dir / "codegen").mkdir(parents=True)
+    (build_dir / "codegen" / "lib0.c").write_text("int x;")
+    tar_path = build_dir / "default.tar"
+    with tarfile.open(tar_path, "w") as tar:
+        tar.add(build_dir / "codegen", arcname="./codegen")
+    artifact = Artifact.from_file("default.tar", tar_path, fmt=ArtifactFormat.MLF, extracted=build_dir)
+    assert artifact.lazy
+    # Exporting to the directory where the archive was already unpacked is a no-op
+    mtime = os.stat(build_dir / "codegen" / "lib0.c").st_mtime_ns
+    artifact.export(build_dir)
+    artifact.export(build_dir, extract=True)
+    assert artifact.lazy
+    assert artifact.path == tar_path
+    assert os.stat(build_dir / "codegen" / "lib0.c").st_mtime_ns == mtime
+    # Other destinations are still populated from the archive
+    dest = tmp_path / "other"
+    dest.mkdir()
+    artifact.export(dest, extract=True)
+    assert (dest / "default.tar").is_file()
+    assert (dest / "codegen" / "lib0.c").read_text() == "int x;"
@@ -0,0 +1,90 @@
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Unit tests for the shared tuning record database."""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from mlonmcu.flow.tvm.backend.tuning_db import TuningRecordDB, parse_record
+
+TARGET = "c -keys=riscv_cpu,cpu -mcpu=rv32gc"
+
+
+def autotvm_record(args, cost, error_no=0, config=0, target=TARGET):
+    return json.dumps(
+        {
+            "input": [target, "conv2d_nchw.x86", args, {}],
+            "config": {"index": config, "code_hash": None, "entity": []},
+            "result": [[cost], error_no, 1.0, 1700000000.0 + config],
+            "version": 0.2,
+            "tvm_version": "0.12.0",
+        }
+    )
+
+
+def autoscheduler_record(workload, cost, target=TARGET):
+    return json.dumps({"i": [[workload, target, [4, 64, 64, 0, 0, 0, 0, 0], ""], [[], []]], "r": [[cost], 0, 1.0, 0]})
+
+
+def test_tuning_db_parse_record():
+    mode, target, workload, cost, _ = parse_record(autotvm_record([1, 2], 0.5))
+    assert mode == "autotvm" and target == TARGET and cost == 0.5
+    assert parse_record(autotvm_record([1, 2], 0.1, config=3))[2] == workload
+    assert parse_record(autotvm_record([1, 3], 0.1))[2] != workload
+    assert parse_record(autotvm_record([1, 2], 1e9, error_no=4))[3] is None
+    assert parse_record(autoscheduler_record('["abc", 1]', 0.2))[0] == "autoscheduler"
+    assert parse_record("") is None
+    assert parse_record("no json") is None
+
+
+def test_tuning_db_best_records(tmp_path):
+    db = TuningRecordDB(tmp_path / "db" / "tuning.db")
+    content = "\n".join(
+        [
+            autotvm_record([1, 2], 0.5, config=0),
+            autotvm_record([1, 2], 0.2, config=1),
+            autotvm_record([1, 2], 0.1, config=2, error_no=1),
+            autotvm_record([3, 4], 0.3, config=0),
+            "",
+        ]
+    )
+    assert db.add_records(content, context="ctx") == 4
+    assert db.add_records(content, context="ctx") == 0  # duplicates are ignored
+    assert db.count() == 4
+    best = db.best_records(mode="autotvm", context="ctx").splitlines()
+    assert best == [autotvm_record([1, 2], 0.2, config=1), autotvm_record([3, 4], 0.3, config=0)]
+    assert db.best_records(context="other") == ""
+    assert db.best_records(mode="autoscheduler") == ""
+    line, cost = db.lookup(("conv2d_nchw.x86", [1, 2], {}), target=TARGET)
+    assert cost == 0.2 and line == autotvm_record([1, 2], 0.2, config=1)
+    assert db.lookup(("conv2d_nchw.x86", [5, 6], {})) is None
+
+    # A second instance (e.g. in a later session) sees the same records
+    assert TuningRecordDB(tmp_path / "db" / "tuning.db").count(mode="autotvm", context="ctx") == 4
+
+
+def test_tuning_db_concurrent_writers(tmp_path):
+    db = TuningRecordDB(tmp_path / "tuning.db")
+
+    def _work(idx):
+        lines = [autoscheduler_record(f'["w{idx}", {i}]', 0.1 * (i + 1)) for i in range(20)]
+        return db.add_records("\n".join(lines))
+
+    with ThreadPoolExecutor(4) as executor:
+        added = list(executor.map(_work, range(8)))
+    assert added == [20] * 8
+    assert len(db.best_records(mode="autoscheduler").splitlines()) == 160
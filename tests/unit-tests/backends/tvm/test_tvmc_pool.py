@@ -0,0 +1,120 @@
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Unit tests for the persistent tvmc worker pool."""
+import os
+import time
+
+import pytest
+
+from mlonmcu.flow.tvm.backend import tvmc_pool
+
+DUMMY_MODULE = """
+import os
+import sys
+import time
+
+print("args:", " ".join(sys.argv[1:]))
+print("cwd:", os.getcwd())
+print("pid:", os.getppid())
+if len(sys.argv) > 1 and sys.argv[1] == "fail":
+    sys.exit(3)
+if len(sys.argv) > 1 and sys.argv[1] == "hang":
+    time.sleep(30)
+if len(sys.argv) > 1 and sys.argv[1] == "wait":
+    # Only finishes if the printed lines are received while running
+    sys.stdout.flush()
+    for _ in range(100):
+        if os.path.exists(sys.argv[2]):
+            break
+        time.sleep(0.1)
+    else:
+        sys.exit(4)
+"""
+
+
+@pytest.fixture
+def module_env(tmp_path):
+    (tmp_path / "dummy_tvmc.py").write_text(DUMMY_MODULE)
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(tmp_path)
+    yield env
+    tvmc_pool.shutdown_worker_pools()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_tvmc_pool_python_module(module_env, tmp_path):
+    out = tvmc_pool.python_module("dummy_tvmc", "compile", 42, env=module_env, cwd=tmp_path, preload=["json"])
+    lines = out.splitlines()
+    assert lines[0] == "args: compile 42"
+    assert lines[1] == f"cwd: {tmp_path}"
+    pid = lines[2]
+    out2 = tvmc_pool.python_module("dummy_tvmc", "run", env=module_env, cwd=tmp_path, preload=["json"])
+    assert out2.splitlines()[2] == pid  # Same worker is reused
+    with pytest.raises(AssertionError, match="non-zero exit code 3"):
+        tvmc_pool.python_module("dummy_tvmc", "fail", env=module_env, preload=["json"])
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_tvmc_pool_preload_failure(module_env):
+    with pytest.raises(RuntimeError, match="Failed to start TVM worker"):
+        tvmc_pool.python_module("dummy_tvmc", env=module_env, preload=["does_not_exist_module"])
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_tvmc_pool_per_process(module_env):
+    pool = tvmc_pool.get_worker_pool(env=module_env, preload=["json"], max_workers=2)
+    assert pool.max_workers == 2
+    assert tvmc_pool.get_worker_pool(env=module_env, preload=["json"]) is pool
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # Forked processes get their own pool
+        other = tvmc_pool.get_worker_pool(env=module_env, preload=["json"])
+        os.write(write_fd, b"1" if other is not pool and other.max_workers is None else b"0")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read_fd, 1) == b"1"
+    os.close(read_fd)
+    os.close(write_fd)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_tvmc_pool_live(module_env, tmp_path):
+    marker = tmp_path / "received"
+    lines = []
+
+    def _print(line):
+        lines.append(line)
+        marker.touch()
+
+    out = tvmc_pool.python_module(
+        "dummy_tvmc", "wait", marker, env=module_env, preload=["json"], live=True, print_func=_print
+    )
+    assert lines[0] == f"args: wait {marker}"
+    assert lines == out.splitlines()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_tvmc_pool_timeout(module_env):
+    pid = tvmc_pool.python_module("dummy_tvmc", env=module_env, preload=["json"]).splitlines()[2]
+    start = time.time()
+    with pytest.raises(TimeoutError):
+        tvmc_pool.python_module("dummy_tvmc", "hang", env=module_env, preload=["json"], timeout=0.5)
+    assert time.time() - start < 10
+    # The hanging worker was replaced
+    out = tvmc_pool.python_module("dummy_tvmc", env=module_env, preload=["json"], timeout=10)
+    assert out.splitlines()[2] != pid
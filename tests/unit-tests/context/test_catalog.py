@@ -0,0 +1,84 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Unit tests for the session catalog."""
+from pathlib import Path
+
+from mlonmcu.context.catalog import SessionCatalog
+from mlonmcu.context.context import MlonMcuContext
+from mlonmcu.session.session import Session
+
+
+def test_catalog_bootstrap_from_directories(tmp_path):
+    sessions_dir = tmp_path / "sessions"
+    for sid, num_runs in [(0, 2), (3, 1), (4, 0)]:
+        runs_dir = sessions_dir / str(sid) / "runs"
+        runs_dir.mkdir(parents=True)
+        for rid in range(num_runs):
+            (runs_dir / str(rid)).mkdir()
+    (sessions_dir / "3" / "report.csv").write_text("Run\n0\n")
+    (sessions_dir / "latest").symlink_to(sessions_dir / "4")
+    catalog = SessionCatalog(sessions_dir)
+    assert [entry.idx for entry in catalog.sessions()] == [0, 3, 4]
+    assert catalog.run_ids() == {0: [0, 1], 3: [0], 4: []}
+    assert catalog.get_session(3).report == str(sessions_dir / "3" / "report.csv")
+    assert catalog.last_idx() == 4
+    # Directories are only scanned once
+    (sessions_dir / "5").mkdir()
+    assert SessionCatalog(sessions_dir).last_idx() == 4
+
+
+def test_catalog_session_lifecycle(tmp_path):
+    catalog = SessionCatalog(tmp_path / "sessions")
+    assert catalog.last_idx() == -1
+    session = Session(idx=0, label="foo", dir=tmp_path / "sessions" / "0", catalog=catalog)
+    catalog.add_session(0, label="foo", dir=session.dir)
+    assert catalog.get_session(0).status == "created"
+    session.open()
+    assert catalog.get_session(0).status == "open"
+    session.create_run()
+    session.create_run()
+    session.close()
+    entry = catalog.get_session(0)
+    assert entry.status == "closed"
+    assert entry.label == "foo"
+    assert entry.closed_at is not None
+    runs = catalog.runs(0)
+    assert [run.idx for run in runs] == [0, 1]
+    assert Path(runs[1].dir) == session.runs_dir / "1"
+    catalog.remove_sessions([0])
+    assert catalog.sessions() == []
+    assert catalog.runs(0) == []
+
+
+def test_context_uses_catalog(monkeypatch, fake_environment_directory: Path, fake_config_home: Path):
+    monkeypatch.chdir(fake_environment_directory)
+    with open(fake_environment_directory / "environment.yml", "w") as f:
+        f.write(f"---\nhome: {fake_environment_directory.absolute()}")
+    with MlonMcuContext() as context:
+        session = context.create_session(label="first")
+        with session:
+            session.create_run()
+    with MlonMcuContext() as context:
+        assert context._sessions is None  # Not loaded before the first access
+        assert context.session_idx == 0
+        assert context.get_sessions_runs_idx() == {0: [0]}
+        assert context.sessions[0].label == "first"
+        assert context.sessions[0].archived
+        context.create_session()
+        assert [session.idx for session in context.sessions] == [0, 1]
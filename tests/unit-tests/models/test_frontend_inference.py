@@ -0,0 +1,69 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for the (cached) reference inference of frontends."""
+import numpy as np
+
+from mlonmcu.models.model import Model
+from mlonmcu.models.frontend import SimpleFrontend, ModelFormats
+
+
+class DoubleFrontend(SimpleFrontend):
+    """Frontend with a fake model which doubles all inputs."""
+
+    def __init__(self, config=None):
+        super().__init__("double", ModelFormats.TFLITE, config=config)
+        self.calls = 0
+
+    def inference(self, model, input_data, quant=False, dequant=False):
+        self.calls += 1
+        return {f"out_{name}": data * 2 for name, data in input_data.items()}
+
+
+def test_frontend_cached_inference(tmp_path):
+    model_file = tmp_path / "model.tflite"
+    model_file.write_bytes(b"v1")
+    model = Model("model", [model_file])
+    inputs_data = [{"a": np.arange(4, dtype="int8"), "b": np.ones(2, dtype="float32") * i} for i in range(3)]
+
+    frontend = DoubleFrontend()
+    outputs = frontend.cached_inference(model, inputs_data, dequant=True)
+    assert frontend.calls == 3
+    assert np.array_equal(outputs[2]["out_b"], np.ones(2) * 4)
+
+    cache_dir = tmp_path / "cache"
+    frontend = DoubleFrontend(config={"double.ref_data_cache_dir": cache_dir})
+    outputs = frontend.cached_inference(model, inputs_data, dequant=True)
+    assert frontend.calls == 3
+    cached = frontend.cached_inference(model, inputs_data, dequant=True)
+    assert frontend.calls == 3
+    assert len(cached) == 3
+    for output, output_ref in zip(cached, outputs):
+        assert output.keys() == output_ref.keys()
+        assert all(np.array_equal(output[name], output_ref[name]) for name in output)
+    assert len(list(cache_dir.glob("*.npy"))) == 1
+
+    # Changes of the inputs, the model or the arguments invalidate the cache
+    inputs_data[1]["a"] = inputs_data[1]["a"] + 1
+    frontend.cached_inference(model, inputs_data, dequant=True)
+    assert frontend.calls == 6
+    frontend.cached_inference(model, inputs_data, dequant=False)
+    assert frontend.calls == 9
+    model_file.write_bytes(b"v2")
+    frontend.cached_inference(model, inputs_data, dequant=True)
+    assert frontend.calls == 12
+    assert len(list(cache_dir.glob("*.npy"))) == 4
@@ -21,7 +21,8 @@ import pytest
 import yaml
 import re
 from mlonmcu.environment.environment import PathConfig
-from mlonmcu.models.lookup import print_summary
+from mlonmcu.models.index import ModelIndex
+from mlonmcu.models.lookup import print_summary, list_models, lookup_models_and_groups
 
 # def test_models_get_model_directories():
 #     pass
@@ -224,3 +225,41 @@ def test_models_print_summary(detailed, capsys, fake_context, fake_environment_d
         )
     # TODO: group name conflicts with modelname
     # TODO: duplicate groups
+
+
+def test_models_index_incremental_refresh(tmp_path):
+    models_dir = tmp_path / "models"
+    _create_fake_models(models_dir, ["model0"], with_metadata=True)
+    _create_fake_models(models_dir, ["model1"])
+    _create_fake_modelgroups(models_dir, {"mygroup": ["model0", "model1"]})
+    index_file = tmp_path / "index.json"
+    index = ModelIndex(index_file)
+    models, groups, _, _ = lookup_models_and_groups([models_dir], None, index=index)
+    assert [model.name for model in models] == ["model0", "model1"]
+    assert models[0].metadata_path == models_dir / "model0" / "metadata.yaml"
+    assert [group.name for group in groups] == ["mygroup"]
+    assert index_file.is_file()
+
+    # Restored index does not list unchanged directories again
+    index = ModelIndex(index_file)
+    lookup_models_and_groups([models_dir], None, index=index)
+    assert index.misses == 0
+    assert not index.dirty
+
+    # Only modified directories are refreshed
+    (models_dir / "model1" / "model1_alt.tflite").touch()
+    index = ModelIndex(index_file)
+    models = list_models(models_dir, index=index)
+    assert index.misses == 1
+    assert sorted(model.name for model in models) == ["model0", "model1", "model1/model1_alt"]
+
+
+def test_models_lookup_duplicates(tmp_path):
+    dirs = [tmp_path / "a", tmp_path / "b", tmp_path / "c"]
+    _create_fake_models(dirs[0], ["model0", "model1"])
+    _create_fake_models(dirs[1], ["model1", "model2"])
+    _create_fake_models(dirs[2], ["model1", "model2"])
+    models, _, duplicates, _ = lookup_models_and_groups(dirs, None)
+    assert [model.name for model in models] == ["model0", "model1", "model2"]
+    assert models[1].paths[0] == dirs[0] / "model1" / "model1.tflite"
+    assert duplicates == {"model1": 2, "model2": 1}
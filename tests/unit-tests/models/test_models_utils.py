@@ -16,10 +16,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import shutil
+import subprocess
+
 import pytest
 import numpy as np
 
-from mlonmcu.models.utils import make_hex_array, fill_data_source, lookup_data_buffers, get_data_source
+from mlonmcu.models.utils import (
+    make_hex_array,
+    bytes_to_hex_array,
+    fill_data_source,
+    lookup_data_buffers,
+    get_data_source,
+)
+from mlonmcu.platform.mlif.interfaces import get_top_rom
 
 
 def test_models_utils_make_hex_array_bin(tmp_path_factory):
@@ -51,6 +61,43 @@ def test_models_utils_make_hex_array_npy(tmp_path_factory, compressed):
     assert out.strip() == "0x00, 0x01, 0xfd, 0x05, 0x10, 0xdf, 0xb0,"
 
 
+def test_models_utils_bytes_to_hex_array():
+    data = bytes(range(256)) * 3
+    assert bytes_to_hex_array(data) == "".join("0x{:02x}, ".format(x) for x in data)
+    assert bytes_to_hex_array(np.array([-1, 2], dtype="int16").tobytes()) == "0xff, 0xff, 0x02, 0x00, "
+    assert bytes_to_hex_array(b"") == ""
+
+
+@pytest.mark.skipif(shutil.which("gcc") is None, reason="requires gcc")
+@pytest.mark.parametrize("embedding", ["array", "incbin"])
+def test_models_utils_embed_inputs(tmp_path, embedding):
+    inputs_data = [
+        {"a": np.arange(5, dtype="int8"), "b": np.array([1.5], dtype="float32")},
+        {"a": np.arange(5, 10, dtype="int8"), "b": np.array([-2.0], dtype="float32")},
+    ]
+    main = """
+#include <stdio.h>
+extern const int num_data_buffers_in;
+extern const unsigned char *const data_buffers_in[];
+extern const size_t data_size_in[];
+int main() {
+    for (int i = 0; i < num_data_buffers_in; i++) {
+        printf("%zu:", data_size_in[i]);
+        for (size_t j = 0; j < data_size_in[i]; j++) printf("%02x", data_buffers_in[i][j]);
+        printf("\\n");
+    }
+    return 0;
+}
+"""
+    (tmp_path / "main.c").write_text(main)
+    (tmp_path / "data.c").write_text(get_top_rom(inputs_data, embedding=embedding, blob_dir=tmp_path / "blobs"))
+    exe = tmp_path / "main"
+    subprocess.run(["gcc", "-o", exe, tmp_path / "main.c", tmp_path / "data.c"], check=True)
+    out = subprocess.run([exe], check=True, capture_output=True, text=True).stdout
+    expected = [f"{arr.nbytes}:{arr.tobytes().hex()}" for data in inputs_data for arr in data.values()]
+    assert out.splitlines() == expected
+
+
 def test_models_utils_make_hex_array_invalid(tmp_path_factory):
     data = [0, 1, 3, 5, 16, 33, 80]
     data = bytes(data)
@@ -0,0 +1,47 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for the MLIF platform."""
+from mlonmcu.platform.mlif import MlifPlatform
+from mlonmcu.target.metrics import Metrics
+
+
+def test_mlif_generate_lazy_artifacts(tmp_path, monkeypatch):
+    platform = MlifPlatform(config={"mlif.src_dir": tmp_path})
+    platform.init_directory(path=tmp_path / "mlif")
+    builds = []
+
+    def _compile(target, src=None, model=None):
+        # The build outputs are overwritten in place
+        builds.append(src)
+        for path in ["bin/generic_mlonmcu", "linker.map"]:
+            (platform.build_dir / path).parent.mkdir(exist_ok=True)
+            (platform.build_dir / path).write_text(src)
+        return "", []
+
+    monkeypatch.setattr(platform, "compile", _compile)
+    monkeypatch.setattr(platform, "get_metrics", lambda elf: Metrics())
+    # The build directory is reused, i.e. for every sub of a run
+    results = [platform.generate(src, None)[0]["default"] for src in ["a", "b"]]
+    for src, artifacts in zip(builds, results):
+        names = [artifact.name for artifact in artifacts]
+        assert names[:2] == ["generic_mlonmcu", "generic_mlonmcu.map"]
+        for artifact in artifacts[:2]:
+            assert artifact.lazy
+            assert platform.build_dir in artifact.source.parents
+            with open(artifact.source, "r") as handle:
+                assert handle.read() == src
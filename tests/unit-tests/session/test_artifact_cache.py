@@ -0,0 +1,71 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Unit tests for the artifact cache."""
+import os
+
+from mlonmcu.artifact import Artifact, ArtifactFormat
+from mlonmcu.session.artifact_cache import ArtifactCache, hash_artifacts
+
+
+def test_artifact_cache_hash_artifacts():
+    model = Artifact("model.tflite", raw=b"\x00\x01", fmt=ArtifactFormat.RAW, flags=["model"])
+    metrics = Artifact("load_metrics.csv", content="a,b\n1,2", fmt=ArtifactFormat.TEXT, flags=["metrics"])
+    metrics2 = Artifact("load_metrics.csv", content="a,b\n3,4", fmt=ArtifactFormat.TEXT, flags=["metrics"])
+    other = Artifact("model.tflite", raw=b"\x00\x02", fmt=ArtifactFormat.RAW, flags=["model"])
+    assert hash_artifacts([model, metrics]) == hash_artifacts([metrics2, model])
+    assert hash_artifacts([model]) != hash_artifacts([other])
+
+
+def test_artifact_cache_key():
+    key = ArtifactCache.get_key("BUILD", "abc", configs={"tvmaot": {"foo": {"b", "a"}, "bar": 1}})
+    key2 = ArtifactCache.get_key("BUILD", "abc", configs={"tvmaot": {"bar": 1, "foo": {"a", "b"}}})
+    key3 = ArtifactCache.get_key("COMPILE", "abc", configs={"tvmaot": {"bar": 1, "foo": {"a", "b"}}})
+    assert key == key2
+    assert key != key3
+
+
+def test_artifact_cache_store_lookup(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache")
+    key = cache.get_key("BUILD", "foo")
+    assert cache.lookup(key) is None
+    artifact = Artifact("code.c", content="int x;", fmt=ArtifactFormat.SOURCE)
+    artifact.export(tmp_path)
+    assert artifact.exported
+    assert cache.store(key, {"default": [artifact]})
+    restored = cache.lookup(key)
+    assert list(restored.keys()) == ["default"]
+    assert restored["default"][0].content == "int x;"
+    assert not restored["default"][0].exported
+    assert cache.hits == 1 and cache.misses == 1
+    assert not cache.store(cache.get_key("bar"), [Artifact("dir", path=tmp_path, fmt=ArtifactFormat.PATH)])
+
+
+def test_artifact_cache_evict(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache", max_entries=2)
+    keys = [cache.get_key(str(i)) for i in range(4)]
+    for i, key in enumerate(keys):
+        cache.store(key, [Artifact("out.txt", content=str(i), fmt=ArtifactFormat.TEXT)])
+        entry = tmp_path / "cache" / key[:2] / key / "artifacts.pkl"
+        os.utime(entry, (i, i))
+    assert cache.evict() == 2
+    assert len(cache.entries()) == 2
+    assert cache.lookup(keys[0]) is None
+    assert cache.lookup(keys[3]) is not None
+    cache.clear()
+    assert cache.size == 0
@@ -0,0 +1,120 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for the streaming instruction trace analysis."""
+import random
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from mlonmcu.artifact import Artifact, ArtifactFormat
+from mlonmcu.session.postprocess.instr_trace import (
+    InstructionTraceAnalyzer,
+    MAJOR_OPCODES,
+    RVC_MAJOR_OPCODES,
+    parse_encodings,
+)
+from mlonmcu.session.postprocess.postprocesses import AnalyseInstructionsPostprocess
+from mlonmcu.trace import convert_text_trace
+
+NAMES = ["addi", "lw", "sw", "c.addi", "beq", "cv.mac", "jal"]
+ENCODINGS = [0x00000297, 0x00A12023, 0x0000006F, 0x00000013, 0x0001, 0x4501, 0x8082, 0xFFFFFFFF, 0x0000007B]
+
+
+def _reference_major(enc):
+    if enc & 0b11 == 0b11:
+        return MAJOR_OPCODES.get(enc & 0b1111111, "UNKNOWN")
+    return RVC_MAJOR_OPCODES[((enc >> 13) & 0b111) << 2 | (enc & 0b11)] + " (Compressed)"
+
+
+def _reference_sequences(names, length):
+    return dict(pd.Series([";".join(names[i : i + length]) for i in range(len(names) - length + 1)]).value_counts())
+
+
+def test_parse_encodings():
+    values = ["0x00000297", "0b1010", "1111", " 0xdeadBEEF ", "0x1234567890"]
+    assert parse_encodings(values).tolist() == [0x297, 0b1010, 0b1111, 0xDEADBEEF, 0x34567890]
+    assert parse_encodings(["297", "ff"], base=16).tolist() == [0x297, 0xFF]
+    assert len(parse_encodings([])) == 0
+
+
+def test_instr_trace_analyzer_chunks():
+    rng = random.Random(42)
+    names = [rng.choice(NAMES) for _ in range(1000)]
+    encodings = [rng.choice(ENCODINGS) for _ in range(1000)]
+    analyzer = InstructionTraceAnalyzer(seq_depth=4)
+    pos = 0
+    for size in [0, 1, 2, 500, 3, 494]:  # Includes chunks shorter than the sequence depth
+        analyzer.feed_names(names[pos : pos + size])
+        analyzer.feed_encodings([hex(enc) for enc in encodings[pos : pos + size]])
+        pos += size
+    assert pos == 1000
+    for length in range(1, 5):
+        counts, probs = analyzer.get_sequence_counts(length)
+        assert counts == _reference_sequences(names, length)
+        assert np.isclose(sum(probs.values()), 1.0)
+    counts, _ = analyzer.get_major_counts()
+    assert counts == dict(pd.Series(list(map(_reference_major, encodings))).value_counts())
+    top, _ = analyzer.get_sequence_counts(2, top=3)
+    assert len(top) == 3 and list(top.values()) == sorted(top.values(), reverse=True)
+    sets, _ = analyzer.get_name_counts(mapping=lambda x: "XCV" if x.startswith("cv.") else "Other")
+    assert sets["XCV"] == names.count("cv.mac")
+
+
+def test_analyse_instructions_postprocess(tmp_path):
+    spike_lines = [
+        "core   0: 0x0000000080000000 (0x00000297) auipc   t0, 0x0",
+        "core   0: 0x0000000080000004 (0x4501) c.li    a0, 0",
+        "core   0: 0x0000000080000006 (0x00000297) auipc   t0, 0x0",
+        "core   0: 0x000000008000000a (0x4501) c.li    a0, 0",
+    ]
+    etiss_lines = [
+        "0x0000000000000080: auipc # 0b00000000000000000000001010010111 [rd=5 | imm=0]",
+        "0x0000000000000084: cli # 0x4501 [rd=10 | imm=0]",
+        "0x0000000000000086: auipc # 0x00000297 [rd=5 | imm=0]",
+        "0x000000000000008a: cli # 0b0100010100000001 [rd=10 | imm=0]",
+    ]
+    etiss_file = tmp_path / "etiss_instrs.log"
+    etiss_file.write_text("\n".join(etiss_lines) + "\n")
+    trace_file = tmp_path / "spike_instrs.trace"
+    convert_text_trace(StringIO("\n".join(spike_lines)), trace_file, "spike")
+    artifacts = [
+        Artifact(
+            "spike_instrs.log", content="\n".join(spike_lines), fmt=ArtifactFormat.TEXT, flags=["log_instrs", "spike"]
+        ),
+        Artifact.from_file("etiss_instrs.log", etiss_file, ArtifactFormat.TEXT, flags=["log_instrs", "etiss"]),
+        Artifact.from_file(
+            "spike_instrs.trace", trace_file, ArtifactFormat.RAW, flags=["log_instrs", "spike", "binary"]
+        ),
+        Artifact(
+            "spike_instrs.trace",
+            raw=trace_file.read_bytes(),
+            fmt=ArtifactFormat.RAW,
+            flags=["log_instrs", "spike", "binary"],
+        ),
+    ]
+    for artifact in artifacts:
+        postprocess = AnalyseInstructionsPostprocess(config={"analyse_instructions.chunksize": 3})
+        ret = {a.name: a.content for a in postprocess.post_run(None, [artifact])}
+        assert ret["analyse_instructions_majors.csv"].splitlines()[1:] == [
+            "AUIPC,2,0.500",
+            "OP-IMM (Compressed),2,0.500",
+        ]
+        seq2 = ret["analyse_instructions_seq2.csv"].splitlines()
+        assert seq2[1].split(",")[1:] == ["2", "0.667"]
+        assert len(seq2) == 3
@@ -16,6 +16,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import sys
+import time
+
+import pytest
+
+from mlonmcu.setup.utils import atomic_write, execute, OutputBuffer
 
 # from mlonmcu.setup.utils import (
 #     makeFlags,
@@ -51,6 +57,50 @@ def test_setup_makeDirName():
 #     pass
 #
 #
+def _script(code):
+    return [sys.executable, "-c", code]
+
+
+def test_setup_output_buffer():
+    buffer = OutputBuffer(max_lines=2, keep_pattern=r"^# ")
+    for line in ["Program start.\n", "# Total Cycles: 42\n", "foo\n", "bar\n", "baz\n"]:
+        buffer.append(line)
+    assert buffer.dropped == 3
+    assert buffer.getvalue() == "# Total Cycles: 42\nbar\nbaz\n"
+
+
+@pytest.mark.parametrize("live", [False, True])
+def test_setup_execute(live, tmp_path):
+    lines = []
+    out = execute(*_script("print('a'); print('b')"), live=live, print_func=lines.append)
+    assert out == "a\nb\n"
+    assert lines == (["a", "b"] if live else [])
+    with pytest.raises(AssertionError):
+        execute(*_script("import sys; sys.exit(3)"), live=live, err_func=lambda *args: None)
+
+
+def test_setup_execute_bounded(tmp_path):
+    log_file = tmp_path / "out.log"
+    code = "for i in range(1000): print(f'line {i}')\nprint('# Total Cycles: 7')\nprint('done')"
+    out = execute(*_script(code), log_file=log_file, max_lines=1, keep_pattern=r"^# ")
+    assert out == "# Total Cycles: 7\ndone\n"
+    assert len(log_file.read_text().splitlines()) == 1002
+    errors = []
+    with pytest.raises(AssertionError):
+        execute(*_script("print('failed'); exit(1)"), max_lines=1, err_func=errors.append)
+    assert errors == ["failed\n"]  # The output is reported like without streaming
+
+
+@pytest.mark.parametrize("live", [False, True])
+def test_setup_execute_timeout(live):
+    start = time.time()
+    with pytest.raises(TimeoutError):
+        # The child process keeps the pipe open and needs to be killed as well
+        code = "import subprocess, sys; subprocess.run([sys.executable, '-c', 'import time; time.sleep(30)'])"
+        execute(*_script(code), live=live, timeout=0.5, err_func=lambda *args: None)
+    assert time.time() - start < 10
+
+
 # def test_setup_python():
 #     pass
 
@@ -95,6 +145,22 @@ def test_setup_copy():
     pass
 
 
+def test_setup_atomic_write(tmp_path):
+    path = tmp_path / "data.txt"
+    path.write_text("old")
+    with atomic_write(path) as handle:
+        handle.write("new")
+        assert path.read_text() == "old"
+    assert path.read_text() == "new"
+    # Failed writes neither touch the file nor leave temporary files behind
+    with pytest.raises(RuntimeError):
+        with atomic_write(path, "wb") as handle:
+            handle.write(b"partial")
+            raise RuntimeError
+    assert path.read_text() == "new"
+    assert list(tmp_path.iterdir()) == [path]
+
+
 def test_setup_is_populated():
     pass
 
@@ -0,0 +1,126 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Unit tests for the device-farm scheduler."""
+import threading
+
+import pytest
+
+from mlonmcu.target.device_pool import Device, DevicePool, parse_devices
+
+
+def test_parse_devices():
+    devices = parse_devices("board0, board1:9091*2,board2*3", default_port=9090)
+    assert devices == [Device("board0", 9090), Device("board1", 9091, capacity=2), Device("board2", 9090, capacity=3)]
+    assert parse_devices(["board0"]) == [Device("board0")]
+    with pytest.raises(AssertionError):
+        Device("board0", capacity=0)
+
+
+def test_device_pool_respects_capacity(tmp_path):
+    devices = [Device("board0", capacity=2), Device("board1")]
+    pool = DevicePool(devices, health_check=None, lock_dir=tmp_path, poll_interval=0.01)
+    leases = [pool.acquire(timeout=0) for _ in range(3)]
+    assert sorted(lease.device.name for lease in leases) == ["board0", "board0", "board1"]
+    with pytest.raises(RuntimeError, match="No device became available"):
+        pool.acquire(timeout=0)
+    # Slots are shared with other pools (i.e. other processes) using the same lock directory
+    other = DevicePool(devices, health_check=None, lock_dir=tmp_path)
+    with pytest.raises(RuntimeError):
+        other.acquire(timeout=0)
+    leases[0].release()
+    with other.lease(timeout=0) as device:
+        assert device == leases[0].device
+
+
+def test_device_pool_parallel_runs(tmp_path):
+    pool = DevicePool([Device("board0"), Device("board1")], health_check=None, lock_dir=tmp_path, poll_interval=0.01)
+    active = {}
+    peak = []
+    mutex = threading.Lock()
+
+    def _exec(device):
+        with mutex:
+            active[device] = active.get(device, 0) + 1
+            peak.append(active[device])
+        threading.Event().wait(0.02)
+        with mutex:
+            active[device] -= 1
+        return device.name
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.run(_exec, timeout=10))) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 6
+    assert max(peak) == 1
+
+
+def test_device_pool_retries_on_other_device(tmp_path):
+    healthy = {"board0": False, "board1": True}
+    pool = DevicePool(
+        [Device("board0"), Device("board1")],
+        health_check=lambda device: healthy[device.name],
+        cooldown=3600,
+        lock_dir=tmp_path,
+    )
+    calls = []
+
+    def _exec(device):
+        calls.append(device.name)
+        if device.name == "board0":
+            raise ConnectionResetError("board0 dropped out")
+        return "ok"
+
+    assert pool.run(_exec) == "ok"
+    assert pool.run(_exec) == "ok"
+    # The failed device is skipped during the cooldown
+    assert calls == ["board0", "board1", "board1"]
+    assert pool.failures == {Device("board0"): 1}
+
+    # Errors of the executed program are not retried
+    def _fail(device):
+        raise RuntimeError("program failed")
+
+    with pytest.raises(RuntimeError, match="program failed"):
+        pool.run(_fail)
+
+    # Local errors (i.e. missing files) are only attributed to healthy devices
+    def _missing(device):
+        raise FileNotFoundError("model.tar")
+
+    with pytest.raises(FileNotFoundError):
+        pool.run(_missing)
+    assert pool.failures == {Device("board0"): 1}
+
+    # After the cooldown the device is used again once it passes the health check
+    pool.failed_until[Device("board0")] = 0
+    healthy["board0"] = True
+    assert Device("board0") in pool._candidates()
+
+
+def test_device_pool_all_failed(tmp_path):
+    pool = DevicePool([Device("board0")], health_check=None, lock_dir=tmp_path)
+
+    def _exec(device):
+        raise ConnectionRefusedError
+
+    with pytest.raises(ConnectionRefusedError):
+        pool.run(_exec)
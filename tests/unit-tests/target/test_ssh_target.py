@@ -0,0 +1,198 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Unit tests for the pooled SSH connections of SSH targets."""
+import io
+import posixpath
+import threading
+
+import pytest
+
+from mlonmcu.target import ssh_pool
+from mlonmcu.target.host_x86_ssh import HostX86SSHTarget
+
+
+class FakeRemote:
+    """In-memory replacement for a remote host."""
+
+    def __init__(self):
+        self.connects = 0
+        self.dirs = {"/tmp"}
+        self.files = {}
+        self.commands = []
+        self.lock = threading.Lock()
+
+
+class FakeChannel:
+    def __init__(self, remote):
+        self.remote = remote
+        self.output = ""
+
+    def set_combine_stderr(self, value):
+        assert value
+
+    def exec_command(self, command):
+        self.remote.commands.append(command)
+        self.output = "line1\nline2\nSSH EXIT=0\n"
+
+    def makefile(self, mode):
+        return io.StringIO(self.output)
+
+    def recv_exit_status(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+class FakeTransport:
+    def __init__(self, remote):
+        self.remote = remote
+
+    def is_active(self):
+        return True
+
+    def set_keepalive(self, interval):
+        assert interval > 0
+
+    def open_session(self):
+        return FakeChannel(self.remote)
+
+
+class FakeSFTP:
+    def __init__(self, remote):
+        self.remote = remote
+
+    def stat(self, path):
+        if path not in self.remote.dirs:
+            raise FileNotFoundError(path)
+
+    def mkdir(self, path):
+        assert posixpath.dirname(path) in self.remote.dirs
+        self.remote.dirs.add(path)
+
+    def put(self, src, dest):
+        assert posixpath.dirname(dest) in self.remote.dirs
+        with open(src, "rb") as handle:
+            self.remote.files[dest] = handle.read()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture()
+def fake_remote(monkeypatch):
+    remote = FakeRemote()
+
+    class FakeClient:
+        def set_missing_host_key_policy(self, policy):
+            pass
+
+        def connect(self, hostname, port=22, username=None, password=None):
+            with remote.lock:
+                remote.connects += 1
+
+        def get_transport(self):
+            return FakeTransport(remote)
+
+        def open_sftp(self):
+            return FakeSFTP(remote)
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(ssh_pool.paramiko, "SSHClient", FakeClient)
+    ssh_pool.shutdown_connection_pools()
+    yield remote
+    ssh_pool.shutdown_connection_pools()
+
+
+def test_ssh_target_reuses_connections(fake_remote, tmp_path):
+    program = tmp_path / "generic_mlonmcu"
+    program.write_bytes(b"\x7fELF")
+    config = {"host_x86_ssh.hostname": "board", "host_x86_ssh.workdir": "/tmp/work"}
+    lines = []
+    for _ in range(3):
+        target = HostX86SSHTarget(config=config)
+        output, _ = target.exec(program, "--foo", live=True, print_func=lines.append)
+        assert target.parse_exit(output) == 0
+    assert fake_remote.connects == 1
+    assert lines == ["line1", "line2", "SSH EXIT=0"] * 3
+    # Every execution uses its own remote directory
+    assert len(fake_remote.files) == 3
+    workdirs = {posixpath.dirname(path) for path in fake_remote.files}
+    assert len(workdirs) == 3
+    assert all(posixpath.dirname(workdir) == "/tmp/work" for workdir in workdirs)
+    for workdir, command in zip(sorted(workdirs), sorted(fake_remote.commands)):
+        assert f"{workdir}/generic_mlonmcu --foo" in command
+        assert f"rm -rf {workdir}" in command
+
+
+def test_ssh_connection_pool_limit(fake_remote):
+    pool = ssh_pool.get_connection_pool("board", max_connections=2)
+    assert ssh_pool.get_connection_pool("board") is pool
+    barrier = threading.Barrier(2)
+
+    def _work():
+        with pool.connection():
+            barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=_work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fake_remote.connects == 2
+    assert pool.num_connections == 2
+
+
+def test_ssh_target_remote_workdirs(fake_remote, tmp_path, monkeypatch):
+    program = tmp_path / "generic_mlonmcu"
+    program.write_bytes(b"\x7fELF")
+    config = {"host_x86_ssh.hostname": "board", "host_x86_ssh.workdir": "/tmp/work"}
+    target = HostX86SSHTarget(config=config)
+    for _ in range(3):
+        target.exec(program)
+    # The unique working directories of the executions are not remembered by the connection
+    with target.get_connection_pool().connection() as ssh:
+        assert ssh.known_dirs == {"/tmp", "/tmp/work"}
+
+    def _fail(self, src, dest):
+        raise OSError("Upload failed")
+
+    put = FakeSFTP.put
+    monkeypatch.setattr(FakeSFTP, "put", _fail)
+    with pytest.raises(OSError):
+        target.exec(program)
+    # The working directory is removed even though the program was never started
+    assert fake_remote.commands[-1].startswith("rm -rf /tmp/work/mlonmcu_")
+    monkeypatch.setattr(FakeSFTP, "put", put)
+
+    exec_command = FakeChannel.exec_command
+
+    def _interrupt(self, command):
+        exec_command(self, command)
+        if not command.startswith("rm -rf"):
+            raise EOFError("Connection lost")
+
+    monkeypatch.setattr(FakeChannel, "exec_command", _interrupt)
+    with pytest.raises(EOFError):
+        target.exec(program)
+    # Same if the command did not complete
+    assert fake_remote.commands[-1].startswith("rm -rf /tmp/work/mlonmcu_")
+    assert fake_remote.commands[-1].split()[-1] in fake_remote.commands[-2]
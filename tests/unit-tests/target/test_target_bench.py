@@ -0,0 +1,55 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import sys
+
+from mlonmcu.setup.utils import execute
+from mlonmcu.target.bench import BenchParser, parse_bench_results
+
+OUT = """# Ignored: 1
+Program start.
+# Setup Cycles: 10
+# Total Cycles: 100
+# Total Instructions: 50
+# Run Runtime [us]: 2000
+Program finish.
+# Total Cycles: 999
+CPU Cycles (estimated): 1234
+"""
+
+
+def test_target_bench_parse():
+    results = parse_bench_results(OUT)
+    assert results == {
+        "Setup Cycles": 10,
+        "Total Cycles": 100,
+        "Total Instructions": 50,
+        "Total CPI": 2.0,
+        "Run Runtime [s]": 0.002,
+    }
+
+
+def test_target_bench_parser_feed():
+    parser = BenchParser()
+    parser.add_pattern("sim_insns", r"CPU Cycles \(estimated\): (.*)")
+    code = f"print({OUT!r})"
+    out = execute(sys.executable, "-c", code, line_func=parser.feed, max_lines=1)
+    assert out == "\n"  # Only the last line was kept in memory
+    assert parser.results() == parse_bench_results(OUT)
+    assert parser.get("sim_insns") == "1234"
+    assert parser.get("mips") is None
@@ -0,0 +1,71 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import sys
+
+import pytest
+
+from mlonmcu.target import elf
+from mlonmcu.target.elf import classify_section, get_results, analyze_elfs, IGNORE, UNKNOWN
+
+# The python interpreter is used as an example ELF file
+ELF_FILE = os.path.realpath(sys.executable)
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    [
+        (".text", "rom_code"),
+        (".text.main", "rom_code"),
+        (".srodata.cst8", "rom_rodata"),
+        (".sdata2", "ram_data"),  # .sdata has a higher priority than the ignored .sdata2 prefix
+        (".eh_frame", "rom_misc"),
+        (".bss.foo", "ram_zdata"),
+        (".debug_info", IGNORE),
+        (".foo", UNKNOWN),
+    ],
+)
+def test_target_elf_classify_section(name, expected):
+    assert classify_section(name) == expected
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="requires ELF interpreter")
+def test_target_elf_get_results_cached(tmp_path, mocker):
+    elf._results_cache.clear()
+    expected = elf._summarize(elf.parseElf(ELF_FILE))
+    spy = mocker.spy(elf, "parseElf")
+    assert get_results(ELF_FILE, cache_dir=tmp_path) == expected
+    assert get_results(ELF_FILE, cache_dir=tmp_path) == expected
+    assert spy.call_count == 1
+    assert len(list(tmp_path.glob("*.json"))) == 1
+    elf._results_cache.clear()  # Results are loaded from disk
+    assert get_results(ELF_FILE, cache_dir=tmp_path) == expected
+    assert spy.call_count == 1
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="requires ELF interpreter")
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_target_elf_analyze_elfs(num_workers):
+    reports = analyze_elfs([ELF_FILE, ELF_FILE], num_workers=num_workers)
+    assert len(reports) == 2
+    report = reports[0]
+    assert report["results"] == elf._summarize(elf.parseElf(ELF_FILE))
+    code_size = sum(section["size"] for section in report["sections"] if section["category"] == "rom_code")
+    assert code_size == report["results"]["rom_code"]
+    assert all(symbol["size"] > 0 for symbol in report["symbols"])
@@ -0,0 +1,113 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Unit tests for the report submodule."""
+import json
+
+import pytest
+import pandas as pd
+
+from mlonmcu.report import Report, ReportWriter, to_columnar
+
+
+def _create_report(idx):
+    report = Report()
+    report.set(pre=[{"Run": idx}], main=[{"Cycles": idx * 10}], post=[{"Comment": "-"}])
+    return report
+
+
+def test_report_add():
+    reports = [_create_report(i) for i in range(5)]
+    merged = Report()
+    merged.add(reports[:2])
+    merged.add(reports[2])
+    merged.add(reports[3:])
+    assert list(merged.df.columns) == ["Run", "Cycles", "Comment"]
+    assert list(merged.df["Run"]) == list(range(5))
+    assert list(merged.main_df.index) == list(range(5))
+    assert Report.from_reports(reports).df.equals(merged.df)
+
+
+def test_report_append():
+    merged = Report()
+    for i in range(3):
+        merged.append(_create_report(i))
+    assert len(merged._pending) == 3
+    assert list(merged.main_df["Cycles"]) == [0, 10, 20]
+    assert len(merged._pending) == 0
+    merged.append(_create_report(3))
+    merged.post_df = merged.post_df.rename(columns={"Comment": "Note"})  # Pending reports are merged first
+    assert list(merged.df.columns) == ["Run", "Cycles", "Note"]
+    assert len(merged.df) == 4
+
+
+def test_report_to_columnar():
+    df = pd.DataFrame({"Run": [0, 1], "Config": [{"a.b": 1}, {"a.c": [1, 2]}], "Mixed": [1, "x"]})
+    df = to_columnar(df)
+    assert list(df["Run"]) == [0, 1]
+    assert json.loads(df["Config"][1]) == {"a.c": [1, 2]}
+    assert list(df["Mixed"]) == ["1", "x"]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_report_export_columnar(fmt, tmp_path):
+    pytest.importorskip("pyarrow")
+    report = _create_report(1)
+    report.pre_df["Config"] = [{"foo.bar": True}]
+    path = tmp_path / f"report.{fmt}"
+    report.export(path)
+    df = pd.read_parquet(path) if fmt == "parquet" else pd.read_feather(path)
+    assert list(df.columns) == ["Run", "Config", "Cycles", "Comment"]
+    assert df["Cycles"].dtype == "int64"
+    assert json.loads(df["Config"][0]) == {"foo.bar": True}
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_report_writer(fmt, tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / f"partial.{fmt}"
+    with ReportWriter(path) as writer:
+        writer.write(_create_report(0))
+        failed = Report()
+        failed.set(pre=[{"Run": 1}], main=[], post=[{"Comment": "failed", "Extra": 1}])
+        writer.write(failed)
+        writer.write(_create_report(2))
+        # The written rows are not copied when the schema changes
+        assert writer.parts == [path, tmp_path / f"partial.1.{fmt}"]
+        assert all(part.is_file() for part in writer.parts)
+    assert writer.num_rows == 3
+    assert list(tmp_path.iterdir()) == [path]  # Merged when closing the writer
+    df = pd.read_parquet(path) if fmt == "parquet" else pd.read_feather(path)
+    # Columns of later reports are added to the file
+    assert list(df.columns) == ["Run", "Cycles", "Comment", "Extra"]
+    assert list(df["Run"]) == [0, 1, 2]
+    assert pd.isna(df["Cycles"][1])
+    assert df["Extra"][1] == 1 and pd.isna(df["Extra"][0]) and pd.isna(df["Extra"][2])
+
+
+def test_report_writer_widen_type(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "partial.parquet"
+    with ReportWriter(path) as writer:
+        writer.write(_create_report(0))
+        report = _create_report(1)
+        report.main_df["Cycles"] = ["n/a"]
+        writer.write(report)
+        writer.write(_create_report(2))
+    df = pd.read_parquet(path)
+    assert list(df["Cycles"]) == ["0", "n/a", "20"]
@@ -16,3 +16,239 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+"""Unit tests for the session submodule."""
+import pickle
+
+import pytest
+
+from mlonmcu.artifact import Artifact, ArtifactFormat
+from mlonmcu.feature.features import Benchmark
+from mlonmcu.models.model import Model
+from mlonmcu.platform.mlif import MlifPlatform
+from mlonmcu.report import Report
+from mlonmcu.session.session import Session
+from mlonmcu.session.run import Run, RunStage
+
+
+class FakeRun(Run):
+    """Run stub which only records the processed stages."""
+
+    STAGES = [RunStage.LOAD, RunStage.BUILD, RunStage.COMPILE]
+
+    def __init__(self, *args, fail_at=None, log=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_at = fail_at
+        self.log = log
+
+    def has_stage(self, stage):
+        return stage in self.STAGES
+
+    def process(self, until=RunStage.RUN, skip=None, export=False):
+        for stage in range(self.next_stage, until + 1):
+            if not self.has_stage(stage):
+                continue
+            if stage == self.fail_at:
+                self.failing = True
+                return
+            self.log.append((self.idx, RunStage(stage)))
+            self.completed[stage] = True
+
+    def get_report(self):
+        report = Report()
+        report.set(pre=[{"Run": self.idx}], main=[{}], post=[{}])
+        return report
+
+
+class CacheRun(FakeRun):
+    """Run stub which stores an entry in the artifact cache."""
+
+    def process(self, until=RunStage.RUN, skip=None, export=False):
+        key = f"run{self.idx}"
+        if self.artifact_cache.lookup(key) is None:
+            self.artifact_cache.store(key, [Artifact("out.txt", content=key, fmt=ArtifactFormat.TEXT)])
+        super().process(until=until, skip=skip, export=export)
+
+
+BENCH_PROGRAM = """#!/bin/sh
+echo 'Program start.'
+echo '# Total Cycles: 100'
+echo 'Program finish.'
+echo 'MLONMCU EXIT: 0'
+"""
+
+
+def create_benchmark_run(session, directory, program=BENCH_PROGRAM):
+    """Create a real run for the host_x86 target using the benchmark feature (which installs target callbacks).
+
+    The stages up to COMPILE are marked as completed, the compiled program is replaced by a shell script.
+    """
+    features = [Benchmark(config={"benchmark.num_repeat": 2})]
+    platform = MlifPlatform(features=features, config={"mlif.src_dir": directory})
+    run = Run(session=session, features=features)
+    run.add_platform(platform)
+    run.add_target(platform.create_target("host_x86")(features=features))
+    run.add_model(Model("dummy", [directory / "dummy.tflite"]))
+    for stage in range(RunStage.COMPILE + 1):
+        run.completed[stage] = True
+    artifact = Artifact("generic_mlonmcu", raw=program.encode(), fmt=ArtifactFormat.BIN)
+    run.artifacts_per_stage[RunStage.COMPILE] = {"default": [artifact]}
+    return run
+
+
+def test_session_pickle_run(tmp_path):
+    session = Session(idx=42, dir=tmp_path / "session")
+    run = session.create_run()
+    session.create_run()
+    data = pickle.dumps(run)
+    session.open()
+    data2 = pickle.dumps(run)  # Session lock must not be pickled
+    session.close()
+    for data_ in [data, data2]:
+        run_ = pickle.loads(data_)
+        assert run_.idx == 0
+        assert run_.session.idx == 42
+        assert run_.session.dir == session.dir
+        assert len(run_.session.runs) == 0  # Runs are detached from the session
+    assert len(session.runs) == 2
+
+
+@pytest.mark.parametrize("num_workers", [1, 4])
+def test_session_process_runs_pipeline(tmp_path, fake_context, num_workers):
+    class FakePath:
+        path = tmp_path / "results"
+
+    fake_context.environment.paths["results"] = FakePath()
+    session = Session(dir=tmp_path / "session", config={"session.stage_limits": "{'BUILD': 1}"})
+    log = []
+    for i in range(5):
+        run = FakeRun(idx=i, session=session, log=log, fail_at=RunStage.BUILD if i == 2 else None)
+        session.runs.append(run)
+    with session:
+        assert session.get_stage_limits(num_workers)[RunStage.BUILD] == 1
+        success = session.process_runs(
+            until=RunStage.COMPILE, num_workers=num_workers, context=fake_context, pipeline=True
+        )
+    assert not success
+    assert len(log) == 5 + 4 + 4
+    for i in [0, 1, 3, 4]:
+        stages = [stage for idx, stage in log if idx == i]
+        assert stages == FakeRun.STAGES
+    assert all(stage == RunStage.LOAD for idx, stage in log if idx == 2)
+    assert len(session.report.df) == 5
+
+
+@pytest.mark.parametrize("per_stage", [False, True])
+def test_session_process_runs_partial_report(per_stage, tmp_path, fake_context):
+    pytest.importorskip("pyarrow")
+    import pandas as pd
+
+    class FakePath:
+        path = tmp_path / "results"
+
+    fake_context.environment.paths["results"] = FakePath()
+    config = {"session.report_fmt": "parquet", "session.partial_report": True}
+    session = Session(label="partial", dir=tmp_path / "session", config=config)
+
+    class LoadRun(FakeRun):
+        STAGES = [RunStage.LOAD]
+
+    for i in range(2):
+        session.runs.append(FakeRun(idx=i, session=session, log=[]))
+    # Finished after the first stage, but still scheduled for the later ones
+    session.runs.append(LoadRun(idx=2, session=session, log=[]))
+    with session:
+        assert session.process_runs(until=RunStage.COMPILE, num_workers=2, per_stage=per_stage, context=fake_context)
+    # Finished runs are only appended once
+    partial = pd.read_parquet(session.dir / "report.partial.parquet")
+    assert sorted(partial["Run"]) == [0, 1, 2]
+    results = pd.read_parquet(tmp_path / "results" / "partial.parquet")
+    assert list(results["Run"]) == [0, 1, 2]
+
+
+def test_session_process_pool_artifact_cache(tmp_path, fake_context):
+    class FakePath:
+        path = tmp_path / "results"
+
+    fake_context.environment.paths["results"] = FakePath()
+    config = {
+        "session.executor": "process_pool",
+        "session.artifact_cache": True,
+        "session.artifact_cache_dir": tmp_path / "cache",
+        "session.artifact_cache_max_entries": 2,
+    }
+    session = Session(dir=tmp_path / "session", config=config)
+    for i in range(4):
+        session.runs.append(CacheRun(idx=i, session=session, log=[]))
+    with session:
+        assert session.process_runs(until=RunStage.COMPILE, num_workers=2, context=fake_context)
+    cache = session.runs[0].artifact_cache
+    assert (cache.hits, cache.misses) == (0, 4)  # Counted in the worker processes
+    assert len(cache.entries()) == 2  # Evicted by the main process
+
+
+def test_session_process_pool_target_callbacks(tmp_path, fake_context):
+    class FakePath:
+        path = tmp_path / "results"
+
+    fake_context.environment.paths["results"] = FakePath()
+    session = Session(dir=tmp_path / "session", config={"session.executor": "process_pool"})
+    for i in range(2):
+        run = create_benchmark_run(session, tmp_path)
+        run.idx = i
+        session.runs.append(run)
+    with session:
+        assert session.process_runs(until=RunStage.RUN, num_workers=2, context=fake_context)
+    for run in session.runs:
+        assert not run.failing and run.completed[RunStage.RUN]
+        assert len(run.target.post_callbacks) == 1  # Restored after unpickling
+    df = session.report.df
+    assert list(df["Average Total Cycles"]) == [100, 100]  # Aggregated by the benchmark callback
+
+
+def test_session_restore_runs_from_checkpoints(tmp_path):
+    session = Session(idx=0, dir=tmp_path / "session", config={"session.checkpoint": True})
+    session.open()
+    marker = tmp_path / "ready"
+    # Fails until the marker is created
+    program = BENCH_PROGRAM.replace("#!/bin/sh\n", f"#!/bin/sh\ntest -f {marker} || exit 1\n")
+    run = create_benchmark_run(session, tmp_path, program=program)
+    session.runs.append(run)
+    session.enumerate_runs()
+    run.save_checkpoint(RunStage.COMPILE)
+    run.process(until=RunStage.RUN)
+    assert run.failing and run.failed_stage == "RUN"
+    session.close()
+
+    resumed = Session(idx=0, dir=tmp_path / "session", config={"session.checkpoint": True})
+    assert resumed.restore_runs() == 1
+    resumed.open()
+    run = resumed.runs[0]
+    assert run.idx == 0
+    assert run.session is resumed
+    assert run.next_stage == RunStage.RUN
+    assert len(run.target.post_callbacks) == 1  # Restored from the features
+    program_artifact = run.artifacts_per_stage[RunStage.COMPILE]["default"][0]
+    assert program_artifact.lazy  # Only a reference to the exported file was stored
+    marker.touch()
+    run.process(until=RunStage.RUN)
+    assert not run.failing
+    assert run.get_report().df["Average Total Cycles"][0] == 100  # Aggregated by the benchmark callback
+    resumed.close()
+    assert Run.from_file(resumed.runs_dir / "0" / "checkpoint.pkl").completed[RunStage.RUN]
+
+
+def test_session_checkpoint_failure(tmp_path, monkeypatch):
+    session = Session(idx=0, dir=tmp_path / "session", config={"session.checkpoint": True})
+    session.open()
+    run = create_benchmark_run(session, tmp_path)
+    session.runs.append(run)
+    session.enumerate_runs()
+
+    def _dump(*args, **kwargs):
+        raise pickle.PicklingError("Not picklable")
+
+    monkeypatch.setattr("mlonmcu.session.run.pickle.dump", _dump)
+    run.process(until=RunStage.RUN)
+    session.close()
+    assert not run.failing and run.completed[RunStage.RUN]
+    assert not (run.dir / "checkpoint.pkl").exists()
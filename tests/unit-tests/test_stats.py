@@ -0,0 +1,93 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for the statistics of repeated benchmarks."""
+import math
+
+import pytest
+
+from mlonmcu.feature.features import REGISTERED_FEATURES
+from mlonmcu.stats import confidence_interval, converged, relative_ci_width, summarize, t_quantile
+from mlonmcu.target.metrics import Metrics
+
+
+@pytest.mark.parametrize(
+    "p,dof,expected",
+    [
+        (0.975, 1, 12.706205),
+        (0.975, 2, 4.302653),
+        (0.975, 3, 3.182446),
+        (0.025, 4, -2.776445),
+        (0.975, 10, 2.228139),
+        (0.995, 3, 5.840909),
+        (0.995, 5, 4.032143),
+        (0.995, 11, 3.105807),
+        (0.95, 30, 1.697261),
+    ],
+)
+def test_t_quantile(p, dof, expected):
+    assert t_quantile(p, dof) == pytest.approx(expected, rel=1e-4)
+
+
+def test_summarize():
+    values = [10.0, 12.0, 11.0, 13.0, 9.0]
+    stats = summarize(values, percentiles=[50, 90])
+    assert stats["Average"] == 11.0
+    assert stats["Median"] == stats["P50"] == 11.0
+    assert stats["Std"] == pytest.approx(math.sqrt(2.5))
+    assert (stats["Min"], stats["Max"]) == (9.0, 13.0)
+    assert stats["P90"] == pytest.approx(12.6)
+    delta = 2.776 * math.sqrt(2.5) / math.sqrt(5)
+    assert stats["CI Low"] == pytest.approx(11.0 - delta, rel=1e-3)
+    assert stats["CI High"] == pytest.approx(11.0 + delta, rel=1e-3)
+    assert summarize([5])["Std"] == 0.0
+    assert confidence_interval([5]) == (5.0, 5.0)
+
+
+def test_converged():
+    assert relative_ci_width([1.0]) == math.inf
+    assert relative_ci_width([3, 3, 3]) == 0.0
+    assert converged({"Runtime [s]": [1.0, 1.01, 0.99], "Cycles": [100, 100]}, 0.1)
+    assert not converged({"Runtime [s]": [1.0, 2.0, 0.5]}, 0.1)
+
+
+def test_benchmark_stats_aggregate():
+    config = {"benchmark.aggregate": "stats", "benchmark.percentiles": [50], "benchmark.adaptive": True}
+    feature = REGISTERED_FEATURES["benchmark"](config=config)
+    assert feature.get_target_config("host_x86") == {
+        "host_x86.repeat": 2,
+        "host_x86.max_repeat": 20,
+        "host_x86.repeat_ci_width": 0.05,
+        "host_x86.repeat_confidence": 0.95,
+    }
+    # TVM can only aggregate using avg, min and max
+    assert feature.get_platform_config("tvm")["tvm.aggregate"] == "all"
+    _, callback = feature.get_target_callbacks("host_x86")
+    metrics = []
+    for value in [100.0, 1.0, 2.0, 3.0]:  # The first execution is a warmup
+        metrics_ = Metrics()
+        metrics_.add("Runtime [s]", value)
+        metrics_.add("Label", "foo")
+        metrics.append(metrics_)
+    callback("", metrics, [])
+    assert len(metrics) == 1
+    data = metrics[0].data
+    assert data["Median Runtime [s]"] == data["P50 Runtime [s]"] == 2.0
+    assert data["Std Runtime [s]"] == 1.0
+    assert data["CI Low Runtime [s]"] < 2.0 < data["CI High Runtime [s]"]
+    assert data["Repetitions"] == 3
+    assert "Runtime [s]" not in metrics[0].order and data["Label"] == "foo"
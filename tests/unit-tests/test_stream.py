@@ -0,0 +1,173 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for the streaming of instruction logs."""
+import gzip
+import json
+import subprocess
+import sys
+
+from mlonmcu.artifact import ArtifactFormat
+from mlonmcu.feature.features import REGISTERED_FEATURES
+from mlonmcu.session.postprocess.postprocesses import AnalyseInstructionsPostprocess
+from mlonmcu.setup.utils import execute
+from mlonmcu.stream import InstructionSampler, LogStream, read_log
+from mlonmcu.target.metrics import Metrics
+from mlonmcu.target.target import Target
+from mlonmcu.trace import TEXT_TRACE_FORMATS
+
+SPIKE_LOG = """core   0: 0x0000000080000000 (0x00000297) auipc   t0, 0x0
+core   0: 0x0000000080000004 (0x4501) c.li    a0, 0
+core   0: 0x0000000080000006 (0x00000297) auipc   t0, 0x0
+core   0: 0x000000008000000a (0x4501) c.li    a0, 0
+"""
+
+
+def test_log_stream_compresses_while_writing(tmp_path):
+    stream = LogStream(tmp_path / "instrs.txt", "gzip")
+    (tmp_path / "spike.txt").write_text(SPIKE_LOG)
+    subprocess.run("cat spike.txt spike.txt > instrs.txt", shell=True, cwd=tmp_path, check=True)
+    dest = stream.finish()
+    assert dest == tmp_path / "instrs.txt.gz"
+    assert not (tmp_path / "instrs.txt").exists()
+    assert gzip.decompress(dest.read_bytes()).decode() == SPIKE_LOG * 2
+    # Programs which do not write the log produce an empty one
+    stream = LogStream(tmp_path / "empty.txt", "gzip")
+    with read_log(stream.finish(), "gzip") as handle:
+        assert handle.read() == ""
+
+
+def test_log_instrs_file_backed(tmp_path):
+    feature = REGISTERED_FEATURES["log_instrs"](config={"log_instrs.to_file": True, "log_instrs.compress": "gzip"})
+    pre, post = feature.get_target_callbacks("spike")
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    pre(workdir, [], directory=workdir)
+    (workdir / "instrs.txt").write_text(SPIKE_LOG)  # Written by the simulator
+    artifacts = []
+    assert post("Program finished", [], artifacts, directory=workdir) == "Program finished"
+    assert len(artifacts) == 1
+    artifact = artifacts[0]
+    assert artifact.name == "spike_instrs.log.gz"
+    assert artifact.lazy and artifact.fmt == ArtifactFormat.RAW
+    assert "gzip" in artifact.flags
+    # The target moves the log out of its temporary working directory
+    target = Target("spike")
+    target.output_dir = tmp_path / "run"
+    target.adopt_artifacts(artifacts, workdir)
+    assert artifact.source == tmp_path / "run" / "spike_instrs.log.gz"
+    assert not any(workdir.iterdir())
+    postprocess = AnalyseInstructionsPostprocess(config={"analyse_instructions.chunksize": 3})
+    ret = {a.name: a.content for a in postprocess.post_run(None, artifacts)}
+    assert ret["analyse_instructions_majors.csv"].splitlines()[1:] == ["AUIPC,2,0.500", "OP-IMM (Compressed),2,0.500"]
+
+
+def test_log_instrs_etiss_stdout(tmp_path):
+    feature = REGISTERED_FEATURES["log_instrs"](config={"log_instrs.to_file": True})
+    pre, post = feature.get_target_callbacks("etiss")
+    instrs = ["0x0000000000000080: auipc # 0x00000297 [rd=5 | imm=0]", "0x0000000000000084: cli # 0x4501 [rd=10]"]
+    stdout = "\n".join(["start", *instrs, "end"])
+    line_func = pre(tmp_path, [], directory=tmp_path)
+    # Instructions are written to the log while the simulation is running, even if the output is truncated
+    out = execute(sys.executable, "-c", f"print({stdout!r})", line_func=line_func, max_lines=1)
+    assert out == "end\n"
+    out = execute(sys.executable, "-c", f"print({stdout!r})", line_func=line_func)
+    assert out == "start\nend\n"
+    artifacts = []
+    assert post(out, [], artifacts, directory=tmp_path) == out
+    assert artifacts[0].lazy
+    assert artifacts[0].content == "\n".join(instrs * 2) + "\n"
+    # Without output directory the log is kept in memory
+    target = Target("etiss")
+    target.adopt_artifacts(artifacts, tmp_path)
+    assert not artifacts[0].lazy and artifacts[0].source is None
+
+
+def _spike_log(pcs):
+    return "".join(f"core   0: 0x{pc:016x} (0x00000297) auipc   t0, 0x0\n" for pc in pcs)
+
+
+def test_instruction_sampler():
+    regex, _ = TEXT_TRACE_FORMATS["spike"]
+    lines = _spike_log(range(0x80000000, 0x80000000 + 4 * 20, 4)).splitlines(keepends=True)
+    sampler = InstructionSampler(regex, window=2, period=3)
+    kept = sampler.filter(["core   0: >>>>  _start\n"] + lines[:7]) + sampler.filter(lines[7:])
+    assert kept == [line for i, line in enumerate(lines) if (i // 2) % 3 == 0]
+    assert (sampler.total, sampler.considered, sampler.sampled) == (20, 20, 8)
+    assert sampler.scale == 2.5
+    # Sign-extended PCs of RV32 simulators match the given addresses
+    lines = _spike_log([0xFFFFFFFF80000000 + 4 * i for i in range(10)]).splitlines(keepends=True)
+    sampler = InstructionSampler(regex, start=0x80000008, stop=0x80000010)
+    assert sampler.filter(lines) == lines[2:5]
+    assert sampler.summary()["considered"] == 3
+
+
+def test_log_instrs_sampling(tmp_path):
+    config = {
+        "log_instrs.to_file": True,
+        "log_instrs.sample_start": "0x80000010",
+        "log_instrs.sample_window": 1,
+        "log_instrs.sample_period": 2,
+    }
+    pre, post = REGISTERED_FEATURES["log_instrs"](config=config).get_target_callbacks("spike")
+    pre(tmp_path, [], directory=tmp_path, elf=None)
+    pcs = [0x80000000 + 4 * i for i in range(12)]
+    (tmp_path / "instrs.txt").write_text(_spike_log(pcs))  # Written by the simulator
+    metrics = [Metrics()]
+    artifacts = []
+    post("", metrics, artifacts, directory=tmp_path)
+    log_artifact, sampling_artifact = artifacts
+    assert log_artifact.name == "spike_instrs.log"
+    assert log_artifact.content == _spike_log(pcs[4::2])
+    assert json.loads(sampling_artifact.content)["scale"] == 2.0
+    assert metrics[0].get_data() == {"Traced Instructions": 8, "Sampled Instructions": 4}
+    postprocess = AnalyseInstructionsPostprocess(config={"analyse_instructions.sequences": False})
+    ret = {a.name: a.content for a in postprocess.post_run(None, artifacts)}
+    assert ret["analyse_instructions_majors.csv"].splitlines() == [
+        "Major,Count,Probability,Estimate,Margin",
+        "AUIPC,4,1.000,8,0",
+    ]
+
+
+def test_instruction_sampler_skip_single_window():
+    regex, _ = TEXT_TRACE_FORMATS["spike"]
+    lines = _spike_log(range(0x80000000, 0x80000000 + 4 * 10, 4)).splitlines(keepends=True)
+    sampler = InstructionSampler(regex, window=3, period=None, skip=2)
+    assert sampler.filter(lines) == lines[2:5]
+    assert (sampler.total, sampler.considered, sampler.sampled) == (10, 8, 3)
+
+
+def test_log_instrs_native_sampling():
+    config = {"log_instrs.sample_skip": 100, "log_instrs.sample_window": 50}
+    feature = REGISTERED_FEATURES["log_instrs"](config=config)
+    target_config = {}
+    feature.add_target_config("ovpsim", target_config)
+    assert target_config["ovpsim.extra_args"] == ["--trace", "--traceafter", "100", "--tracecount", "50"]
+    # Handled by the simulator, hence the log does not have to be filtered
+    assert feature.get_sampler("ovpsim") is None
+    assert feature.get_target_callbacks("ovpsim")[0] is None
+    # Other simulators fall back to filtering the log
+    sampler = feature.get_sampler("spike")
+    assert (sampler.skip, sampler.window, sampler.period) == (100, 50, None)
+    # PC triggers can not be expressed as instruction counts
+    config = {"log_instrs.sample_skip": 100, "log_instrs.sample_start": "0x80000010", "log_instrs.sample_window": 50}
+    feature = REGISTERED_FEATURES["log_instrs"](config=config)
+    target_config = {}
+    feature.add_target_config("ovpsim", target_config)
+    assert target_config["ovpsim.extra_args"] == ["--trace", "--traceafter", "100"]
+    sampler = feature.get_sampler("ovpsim")
+    assert (sampler.skip, sampler.start, sampler.window) == (0, 0x80000010, 50)
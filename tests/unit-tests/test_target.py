@@ -16,11 +16,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from pathlib import Path
+
 import pytest
 import mock
 
 from mlonmcu.target.common import execute, cli
 from mlonmcu.target.target import Target
+from mlonmcu.target.metrics import Metrics
 from mlonmcu.target import EtissPulpinoTarget, HostX86Target
 
 
@@ -91,6 +94,59 @@ def test_target_base(mocked_execute, example_elf_file, capsys):
     # mocked_execute.assert_called_once_with("inspect", "program")
 
 
+class RepeatTarget(Target):
+    PARALLEL_REPEAT = True
+
+    def __init__(self, config={}):
+        super().__init__("repeat", config=config)
+        self.post_callbacks.append(self._aggregate)
+        self.directories = []
+
+    def get_metrics(self, elf, directory, *args, handle_exit=None):
+        self.directories.append(str(directory))
+        metrics = Metrics()
+        metrics.add("Cycles", 100 + int(Path(directory).name) if Path(directory).name.isdigit() else 0)
+        return metrics, f"out {directory}", []
+
+    def _aggregate(self, stdout, metrics, artifacts, directory=None):
+        assert stdout == f"out {directory}"  # Output of the last execution
+        total = sum(m.get("Cycles") for m in metrics)
+        metrics[:] = [metrics[-1]]
+        metrics[0].add("Total Cycles", total)
+        return stdout
+
+
+@pytest.mark.parametrize("workers", [None, 1, 3])
+def test_target_repeat(workers):
+    t = RepeatTarget(config={"repeat.repeat": 3, "repeat.repeat_workers": workers})
+    artifacts, metrics = t.generate("program.elf")
+    assert len(set(t.directories)) == 4  # Isolated working directories
+    assert metrics["default"].get("Total Cycles") == 100 + 101 + 102
+    assert "repeat_out.log" in [artifact.name for artifact in artifacts["default"]]
+
+
+class NoisyTarget(RepeatTarget):
+    def __init__(self, values, config={}):
+        super().__init__(config=config)
+        self.values = list(values)
+        self.post_callbacks.clear()
+
+    def get_metrics(self, elf, directory, *args, handle_exit=None):
+        self.directories.append(str(directory))
+        metrics = Metrics()
+        metrics.add("Runtime [s]", self.values[int(Path(directory).name)])
+        return metrics, f"out {directory}", []
+
+
+@pytest.mark.parametrize("values,expected", [([9, 1, 1.01, 0.99] + [1] * 6, 4), ([9] + [1, 2] * 4, 6)])
+def test_target_adaptive_repeat(values, expected):
+    config = {"repeat.repeat": 2, "repeat.max_repeat": 5, "repeat.repeat_ci_width": 0.1}
+    t = NoisyTarget(values, config=config)
+    with pytest.raises(RuntimeError, match="multiple runs"):  # Metrics are not aggregated without a callback
+        t.generate("program.elf")
+    assert len(t.directories) == expected
+
+
 def has_etiss_pulpino():
     return False
 
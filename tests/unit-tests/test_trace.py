@@ -0,0 +1,81 @@
+#
+# Copyright (c) 2022 TUM Department of Electrical and Computer Engineering.
+#
+# This file is part of MLonMCU.
+# See https://github.com/tum-ei-eda/mlonmcu.git for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for the binary instruction trace format."""
+from io import StringIO
+
+import numpy as np
+import pytest
+
+from mlonmcu.trace import InstructionTrace, TraceWriter, convert_text_trace, parse_addresses, parse_encodings
+
+SPIKE_LOG = """core   0: 0x0000000080000000 (0x00000297) auipc   t0, 0x0
+core   0: >>>>  _start
+core   0: 0x0000000080000004 (0x4501) c.li    a0, 0
+core   0: 0xffffffff80000006 (0x00a12023) sw      a0, 0(sp)
+"""
+ETISS_LOG = """0x0000000080000000: auipc # 0b00000000000000000000001010010111 [rd=5 | imm=0]
+0x0000000080000004: cli # 0b0100010100000001 [rd=10 | imm=0]
+0xffffffff80000006: sw # 0x00a12023 [rs1=2 | rs2=10 | imm=0]
+"""
+OVPSIM_LOG = """Info 'riscvOVPsim/cpu', 0x0000000080000000(_start): 00000297 auipc   t0,0x0
+Info 'riscvOVPsim/cpu', 0x0000000080000004(_start+4): 4501     c.li    a0,0
+Info 'riscvOVPsim/cpu', 0xffffffff80000006(_start+6): 00a12023 sw      a0,0(sp)
+"""
+
+
+def test_parse_addresses():
+    assert parse_addresses(["0x10", "0xffffffff80000006"]).tolist() == [0x10, 0xFFFFFFFF80000006]
+    assert parse_encodings(["0x00a12023", "0b101"]).dtype == np.uint32
+
+
+def test_trace_roundtrip(tmp_path):
+    trace_file = tmp_path / "instrs.trace"
+    with TraceWriter(trace_file, fields=("pc", "encoding", "size", "name", "cycle")) as writer:
+        writer.write([0x100, 0x104], [0x00000297, 0x4501], name=["auipc", "c.li"], cycle=[1, 2])
+        writer.write([0x106], [0x00000297], name=["auipc"], cycle=[5])
+    for source in [trace_file, trace_file.read_bytes()]:
+        trace = InstructionTrace(source)
+        assert len(trace) == 3
+        assert trace.fields == ["pc", "encoding", "size", "name", "cycle"]
+        assert trace["pc"].tolist() == [0x100, 0x104, 0x106]
+        assert trace["size"].tolist() == [4, 2, 4]
+        assert trace["cycle"].tolist() == [1, 2, 5]
+        assert trace.names == ["auipc", "c.li"]
+        assert trace.decode_names().tolist() == ["auipc", "c.li", "auipc"]
+        chunks = list(trace.iter_chunks(2))
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert isinstance(InstructionTrace(trace_file).records, np.memmap)
+    with TraceWriter(tmp_path / "empty.trace", fields=("pc", "encoding")):
+        pass
+    assert len(InstructionTrace(tmp_path / "empty.trace")) == 0
+    with pytest.raises(RuntimeError):
+        InstructionTrace(b"no trace")
+
+
+@pytest.mark.parametrize("fmt,log", [("spike", SPIKE_LOG), ("etiss", ETISS_LOG), ("ovpsim", OVPSIM_LOG)])
+def test_convert_text_trace(tmp_path, fmt, log):
+    log_file = tmp_path / "instrs.txt"
+    log_file.write_text(log)
+    for src in [log_file, StringIO(log)]:
+        assert convert_text_trace(src, tmp_path / "instrs.trace", fmt, chunksize=2) == 3
+        trace = InstructionTrace(tmp_path / "instrs.trace")
+        assert trace["pc"].tolist() == [0x80000000, 0x80000004, 0xFFFFFFFF80000006]
+        assert trace["encoding"].tolist() == [0x00000297, 0x4501, 0x00A12023]
+        assert trace["size"].tolist() == [4, 2, 4]
+        assert trace.decode_names()[[0, 2]].tolist() == ["auipc", "sw"]
+    assert (tmp_path / "instrs.trace").stat().st_size < len(log)